@@ -1,19 +1,63 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import os
+import re
+import hashlib
+import operator
 from datetime import datetime
-import logging
+import atexit
+import signal
+import sys
+import time
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from db_pool import PostgresConnectionPool
+from monitoring import (
+    MONITORING_COLUMNS, MONITORING_COLUMNS_SQL, MONITORING_METRIC_COLUMNS, MONITORING_TIME_COLUMNS,
+    MONITORING_QUERY_COLUMNS, MONITORING_QUERY_COLUMNS_SQL, METADATA_COLUMNS_SQL, build_monitoring_values,
+    build_metadata_values, build_page_query, monitoring_idempotency_key, next_page_cursor, page_etag,
+    parse_page_args, parse_range_args, range_conditions, stats_from_row
+)
+from timestamps import parse_datetime
+from validation import MONITORING_SAMPLE_SCHEMA, METADATA_SCHEMA, ValidationError
+from ingest_buffer import WriteBehindBuffer, IngestQueueFullError
+from bulk_ingest import iter_bulk_records, copy_rows, BulkFormatError
+from stats_cache import StaleWhileRevalidateCache
+from row_cache import RowCache, HotWindow
+from event_hub import EventHub, NotifyListener, TooManySubscribersError
+from downsampling import DOWNSAMPLE_METHODS, LTTBReducer, MinMaxReducer, RawReducer
+from rollups import RollupWorker, ROLLUP_BUCKETS
+from json_backends import BackendJSONProvider, get_json_backend
+from async_logging import configure_logging, parse_sample_rates
+import metrics
+
+# Configurar logging: en cola con un hilo escritor, muestreo de INFO y formato text o json
+log_control = configure_logging(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    log_format=os.getenv('LOG_FORMAT', 'text'),
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+    sample_rate=float(os.getenv('LOG_SAMPLE_RATE', 1.0)),
+    event_rates=parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', '')),  # p. ej. monitoring_insert=0.01
+    rate_limit=float(os.getenv('LOG_RATE_LIMIT', 0))  # registros INFO por segundo y evento; 0 sin límite
+)
+logger = log_control.get_logger(__name__)
 
 app = Flask(__name__)
 
+# Métricas Prometheus en /metrics (peticiones, fases de base de datos, parseo, serialización)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Serialización JSON: backend json (estándar) u orjson; fechas en formato http o iso
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'orjson')
+JSON_DATETIME_FORMAT = os.getenv('JSON_DATETIME_FORMAT', 'http')
+app.json = BackendJSONProvider(
+    app,
+    get_json_backend(JSON_BACKEND, JSON_DATETIME_FORMAT),
+    observer=metrics.JSON_SERIALIZE_SECONDS.observe if METRICS_ENABLED else None
+)
+
 # Configurar CORS de manera simple
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'ETag', 'X-Cache'])
 
 # Configuración de base de datos - GCP PostgreSQL
 DB_CONFIG = {
@@ -24,55 +68,359 @@ DB_CONFIG = {
     'port': os.getenv('DB_PORT', '5432')
 }
 
+# Configuración del pool de conexiones (por réplica)
+POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', 1)),
+    'max_size': int(os.getenv('DB_POOL_MAX', 10)),
+    'max_uses': int(os.getenv('DB_POOL_MAX_USES', 5000)),
+    'max_idle_seconds': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+    'health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK', 30)),
+    'acquire_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10))
+}
+
+db_pool = PostgresConnectionPool(
+    DB_CONFIG,
+    search_path='fase2, public',
+    # Conexión instrumentada: mide cada consulta y commit
+    connection_factory=metrics.InstrumentedConnection if METRICS_ENABLED else None,
+    on_connect=metrics.DB_CONNECT_SECONDS.observe if METRICS_ENABLED else None,
+    **POOL_CONFIG
+)
+
+if METRICS_ENABLED:
+    metrics.register_pool_metrics(db_pool)
+    metrics.REGISTRY.callback('log_records_sampled_out_total', 'Registros INFO descartados por muestreo',
+                              'counter', lambda: log_control.stats()['sampled_out'])
+    metrics.REGISTRY.callback('log_records_rate_limited_total', 'Registros INFO descartados por límite por segundo',
+                              'counter', lambda: log_control.stats()['rate_limited'])
+    metrics.REGISTRY.callback('log_records_dropped_total', 'Registros INFO descartados con la cola de logs llena',
+                              'counter', lambda: log_control.stats()['dropped_queue_full'])
+
+    def observe_parse(field, seconds):
+        metrics.PARSE_DATETIME_SECONDS.observe(seconds, (field,))
+
+    MONITORING_SAMPLE_SCHEMA.timestamp_parser.observer = observe_parse
+    METADATA_SCHEMA.timestamp_parser.observer = observe_parse
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is not None:
+            # Ruta con sus parámetros sin resolver para no multiplicar las series
+            route = request.url_rule.rule if request.url_rule else '<no encontrada>'
+            labels = (request.method, route, str(response.status_code))
+            metrics.HTTP_REQUESTS.inc(labels)
+            metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, labels)
+        return response
+
 def get_db_connection():
-    """Obtener conexión a la base de datos"""
+    """Obtener conexión a la base de datos desde el pool"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        # Establecer el schema por defecto a fase2
-        with conn.cursor() as cursor:
-            cursor.execute("SET search_path TO fase2, public")
-        conn.commit()
+        if not METRICS_ENABLED:
+            return db_pool.getconn()
+        started = time.perf_counter()
+        conn = db_pool.getconn()
+        metrics.DB_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
         return conn
     except Exception as e:
         logger.error(f"Error conectando a la base de datos: {e}")
         return None
 
-def parse_datetime(date_string):
-    """Función para parsear fechas"""
-    if not date_string or not isinstance(date_string, str):
-        raise ValueError(f"Fecha inválida: {date_string}")
-    
-    # Limpiar la fecha de espacios
-    clean_date_string = date_string.strip()
-    
+def release_db_connection(conn):
+    """Devolver la conexión al pool"""
     try:
-        # Intentar parsear directamente primero
-        return datetime.fromisoformat(clean_date_string.replace('Z', '+00:00'))
-    except:
-        pass
-    
-    # Si tiene microsegundos (más de 3 dígitos después del punto), truncar a milisegundos
-    if '.' in clean_date_string:
-        parts = clean_date_string.split('.')
-        if len(parts) == 2 and len(parts[1]) > 3:
-            # Truncar microsegundos a milisegundos
-            clean_date_string = f"{parts[0]}.{parts[1][:3]}"
-    
-    # Formatos específicos a intentar
-    formats = [
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d %H:%M:%S.%f",
-        "%Y-%m-%dT%H:%M:%S.%f"
-    ]
-    
-    for fmt in formats:
-        try:
-            return datetime.strptime(clean_date_string, fmt)
-        except:
-            continue
-    
-    raise ValueError(f"No se pudo parsear la fecha: {date_string}")
+        db_pool.putconn(conn)
+    except Exception as e:
+        logger.error(f"Error devolviendo la conexión al pool: {e}")
+
+def monitoring_insert_query(values_sql, returning=True, keyed=False):
+    """INSERT de monitoreo; con STREAM_NOTIFY emite en la misma sentencia un NOTIFY por fila
+
+    Con `keyed` cada fila lleva su clave de idempotencia al final y el índice único
+    descarta las duplicadas sin escribirlas: no aparecen entre las filas devueltas."""
+    if keyed:
+        query = (f"INSERT INTO fase2.monitoring_data ({MONITORING_COLUMNS_SQL}, idempotency_key) VALUES {values_sql}"
+                 " ON CONFLICT (idempotency_key) DO NOTHING")
+    else:
+        query = f"INSERT INTO fase2.monitoring_data ({MONITORING_COLUMNS_SQL}) VALUES {values_sql}"
+    if notify_listener is not None:
+        # El NOTIFY no agrega un viaje a la base y se entrega a todas las réplicas al confirmar
+        return (f"WITH inserted AS ({query} RETURNING *) "
+                f"SELECT inserted.*, pg_notify('{STREAM_CHANNEL}', row_to_json(inserted)::text) FROM inserted")
+    return query + (' RETURNING *' if returning else '')
+
+# Marcadores de una fila para el INSERT de un registro, sin y con clave de idempotencia
+MONITORING_VALUES_SQL = '(' + ', '.join(['%s'] * len(MONITORING_COLUMNS)) + ')'
+MONITORING_KEYED_VALUES_SQL = '(' + ', '.join(['%s'] * (len(MONITORING_COLUMNS) + 1)) + ')'
+
+_public_columns = operator.itemgetter(*range(len(MONITORING_QUERY_COLUMNS)))
+
+def inserted_rows(cursor, rows):
+    """(columnas, filas, claves) devueltas por monitoring_insert_query
+
+    Columnas y filas son solo las públicas (MONITORING_QUERY_COLUMNS, en ese orden);
+    la clave de idempotencia de cada fila va aparte (None si la tabla no la tiene) y
+    la columna del NOTIFY se descarta."""
+    names = [column[0] for column in cursor.description]
+    positions = [names.index(column) for column in MONITORING_QUERY_COLUMNS]
+    # RETURNING * trae las columnas en el orden de la tabla: id, métricas, created_at, idempotency_key
+    project = _public_columns if positions == list(range(len(positions))) else operator.itemgetter(*positions)
+    if 'idempotency_key' in names:
+        key_position = names.index('idempotency_key')
+        keys = [row[key_position] for row in rows]
+    else:
+        keys = [None] * len(rows)
+    return list(MONITORING_QUERY_COLUMNS), [project(row) for row in rows], keys
+
+def publish_local_events(columns, rows):
+    """Sin NOTIFY, publicar las filas confirmadas solo en el hub de esta réplica"""
+    if event_hub is not None and notify_listener is None and rows:
+        event_hub.publish_many(app.json.backend.dumps_lines(columns, rows).decode('utf-8').splitlines())
+
+def monitoring_event_from_notify(payload):
+    """Evento del stream a partir del NOTIFY (row_to_json) con el formato de fechas de la API"""
+    record = app.json.backend.loads(payload)
+    record.pop('idempotency_key', None)
+    for column in MONITORING_TIME_COLUMNS + ('created_at',):
+        if record.get(column):
+            record[column] = parse_datetime(record[column])
+    return app.json.backend.dumps(record).decode('utf-8')
+
+def idempotency_key(values, index=None):
+    """Clave de idempotencia de una muestra, o None si no se deduplica
+
+    El encabezado Idempotency-Key (con el índice dentro de una lista) tiene
+    prioridad; en modo payload se usa el hash de hora y métricas."""
+    header = request.headers.get('Idempotency-Key')
+    if header:
+        material = header if index is None else f'{header}:{index}'
+        return hashlib.sha256(b'header:' + material.encode('utf-8')).hexdigest()
+    if IDEMPOTENCY_MODE == 'payload':
+        return monitoring_idempotency_key(values)
+    return None
+
+def find_idempotent_ids(cursor, keys):
+    """Ids ya guardados para las claves dadas: {clave: id}"""
+    cursor.execute('SELECT idempotency_key, id FROM fase2.monitoring_data WHERE idempotency_key = ANY(%s)',
+                   (list(keys),))
+    return dict(cursor.fetchall())
+
+def count_duplicates(source, amount=1):
+    """Contar muestras duplicadas detectadas en la caché de claves o por el índice único"""
+    if METRICS_ENABLED and amount:
+        metrics.MONITORING_DUPLICATES.inc((source,), amount)
+
+def duplicate_response(original_id):
+    """Respuesta para una muestra ya guardada: el id original, sin una segunda escritura"""
+    return jsonify({
+        'message': 'Datos de monitoreo ya guardados (duplicado)',
+        'id': original_id,
+        'duplicate': True,
+        'timestamp': datetime.now().isoformat(),
+        'api': 'Python',
+        'schema': 'fase2'
+    }), 200
+
+def insert_monitoring_batch(rows, returning=False):
+    """Insertar un lote de registros con un único INSERT multi-fila
+
+    Con `returning` devuelve (ids en el orden de `rows`, filas insertadas); las
+    duplicadas por clave de idempotencia reciben el id original."""
+    # Con idempotencia cada fila trae su clave al final (None sin clave)
+    request_keys = [row[-1] for row in rows] if IDEMPOTENCY_ENABLED else None
+    conn = db_pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            keyed = (request_keys is not None and any(key is not None for key in request_keys)
+                     and idempotency_index_ready(cursor))
+            if request_keys is not None and not keyed:
+                rows = [row[:-1] for row in rows]
+            # Con la ventana de registros recientes, el stream o la idempotencia se devuelven las filas completas
+            fetch = returning or hot_window is not None or event_hub is not None or keyed
+            result = execute_values(
+                cursor,
+                monitoring_insert_query('%s', returning=fetch, keyed=keyed),
+                rows,
+                page_size=len(rows),
+                fetch=fetch
+            )
+            columns, result, keys = inserted_rows(cursor, result) if fetch else (None, result, None)
+            by_key = {}
+            if keyed:
+                by_key = {key: row[0] for row, key in zip(result, keys) if key is not None}
+                if len(result) < len(rows):
+                    count_duplicates('index', len(rows) - len(result))
+                    missing = {key for key in request_keys if key is not None} - by_key.keys()
+                    if missing:
+                        # Claves guardadas antes (otra réplica o fuera de la caché de claves)
+                        by_key.update(find_idempotent_ids(cursor, missing))
+        conn.commit()
+        if hot_window is not None:
+            hot_window.add(columns, result)
+        publish_local_events(columns, result)
+        for key, record_id in by_key.items():
+            recent_keys.put(key, record_id)
+        if not returning:
+            return None
+        if not keyed:
+            return [row[0] for row in result], len(result)
+        # Filas sin clave: en el orden del INSERT
+        unkeyed = iter([row[0] for row, key in zip(result, keys) if key is None])
+        return [by_key[key] if key is not None else next(unkeyed) for key in request_keys], len(result)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        db_pool.putconn(conn)
+
+# Carga masiva: filas por COPY, tamaño de bloque leído del cuerpo y errores reportados
+BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 1000))
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 65536))
+BULK_MAX_ERRORS = int(os.getenv('BULK_MAX_ERRORS', 100))
+
+# Filas por viaje del cursor del lado del servidor en exportaciones (stream=json|ndjson)
+STREAM_FETCH_SIZE = int(os.getenv('STREAM_FETCH_SIZE', 2000))
+
+# Caché de /stats: se sirve fresca durante STATS_CACHE_TTL y vencida (recalculando
+# en segundo plano) durante STATS_STALE_TTL adicionales
+stats_cache = StaleWhileRevalidateCache(
+    ttl=float(os.getenv('STATS_CACHE_TTL', 5)),
+    stale_ttl=float(os.getenv('STATS_STALE_TTL', 30))
+)
+
+def load_hot_window(size):
+    """Últimos `size` registros para la ventana de lectura"""
+    conn = db_pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'SELECT {MONITORING_QUERY_COLUMNS_SQL} FROM fase2.monitoring_data ORDER BY id DESC LIMIT %s',
+                           (size,))
+            rows = cursor.fetchall()
+            columns = [column[0] for column in cursor.description]
+        conn.rollback()
+    finally:
+        db_pool.putconn(conn)
+    return columns, rows
+
+# Caché de lectura: registros por id (LRU con TTL) y ventana de los últimos
+# HOT_WINDOW_SIZE registros para las primeras páginas (0 deshabilita cada una)
+ROW_CACHE_SIZE = int(os.getenv('ROW_CACHE_SIZE', 10000))
+HOT_WINDOW_SIZE = int(os.getenv('HOT_WINDOW_SIZE', 1000))
+
+row_cache = None
+if ROW_CACHE_SIZE > 0:
+    row_cache = RowCache(ROW_CACHE_SIZE, ttl=float(os.getenv('ROW_CACHE_TTL', 300)))
+
+hot_window = None
+if HOT_WINDOW_SIZE > 0:
+    hot_window = HotWindow(load_hot_window, HOT_WINDOW_SIZE, max_age=float(os.getenv('HOT_WINDOW_MAX_AGE', 1)))
+
+if METRICS_ENABLED:
+    for cache_name, cache in (('row_cache', row_cache), ('hot_window', hot_window)):
+        if cache is not None:
+            metrics.REGISTRY.callback(f'{cache_name}_hits_total', f'Lecturas servidas desde {cache_name}', 'counter',
+                                      lambda cache=cache: cache.stats()['hits'])
+            metrics.REGISTRY.callback(f'{cache_name}_misses_total', f'Lecturas no servidas desde {cache_name}',
+                                      'counter', lambda cache=cache: cache.stats()['misses'])
+
+# Stream SSE de registros nuevos (/monitoring-data/stream): cola acotada de lotes
+# pendientes por cliente y, con STREAM_NOTIFY, entrega entre réplicas con LISTEN/NOTIFY
+STREAM_ENABLED = os.getenv('STREAM_ENABLED', 'true').lower() == 'true'
+STREAM_NOTIFY = os.getenv('STREAM_NOTIFY', 'true').lower() == 'true'
+STREAM_CHANNEL = os.getenv('STREAM_CHANNEL', 'monitoring_data_new')
+if not re.fullmatch(r'[a-z_][a-z0-9_]*', STREAM_CHANNEL):
+    raise ValueError(f"STREAM_CHANNEL inválido: {STREAM_CHANNEL} (minúsculas, dígitos y _)")
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+
+event_hub = None
+notify_listener = None
+if STREAM_ENABLED:
+    event_hub = EventHub(
+        max_batches=int(os.getenv('STREAM_CLIENT_BUFFER', 100)),
+        max_subscribers=int(os.getenv('STREAM_MAX_SUBSCRIBERS', 1000))
+    )
+    if STREAM_NOTIFY:
+        notify_listener = NotifyListener(event_hub, DB_CONFIG, STREAM_CHANNEL, transform=monitoring_event_from_notify)
+        notify_listener.start()
+        atexit.register(notify_listener.stop)
+
+    if METRICS_ENABLED:
+        metrics.REGISTRY.callback('stream_subscribers', 'Suscriptores conectados a /monitoring-data/stream', 'gauge',
+                                  lambda: event_hub.stats()['subscribers'])
+        metrics.REGISTRY.callback('stream_events_published_total', 'Eventos publicados en el stream', 'counter',
+                                  lambda: event_hub.stats()['published'])
+        metrics.REGISTRY.callback('stream_subscribers_dropped_total', 'Suscriptores desconectados por lentos',
+                                  'counter', lambda: event_hub.stats()['dropped_subscribers'])
+
+# Rollups por minuto/hora mantenidos en segundo plano
+ROLLUP_ENABLED = os.getenv('ROLLUP_ENABLED', 'true').lower() == 'true'
+ROLLUP_MAX_ROWS = int(os.getenv('ROLLUP_MAX_ROWS', 10000))
+
+rollup_worker = None
+if ROLLUP_ENABLED:
+    rollup_worker = RollupWorker(
+        db_pool,
+        MONITORING_METRIC_COLUMNS,
+        interval=float(os.getenv('ROLLUP_INTERVAL', 5)),
+        settle_seconds=float(os.getenv('ROLLUP_SETTLE_SECONDS', 2))
+    )
+    rollup_worker.start()
+
+# Índice único de idempotencia: se comprueba en la primera inserción con clave (no al
+# importar, la base puede no estar disponible) y, mientras falte, cada IDEMPOTENCY_PROBE_INTERVAL
+IDEMPOTENCY_PROBE_INTERVAL = 60
+_idempotency_index = {'ready': None, 'checked_at': 0.0}
+
+def idempotency_index_ready(cursor):
+    """True si existe idx_monitoring_data_idempotency_key (consulta con el cursor de la inserción)
+
+    Si la consulta falla el error se propaga y se vuelve a comprobar en la siguiente inserción."""
+    state = _idempotency_index
+    if state['ready'] or (state['ready'] is False
+                          and time.monotonic() - state['checked_at'] < IDEMPOTENCY_PROBE_INTERVAL):
+        return state['ready']
+    cursor.execute("SELECT to_regclass('fase2.idx_monitoring_data_idempotency_key') IS NOT NULL")
+    ready = cursor.fetchone()[0]
+    if not ready:
+        # Sin la migración, ON CONFLICT (idempotency_key) fallaría: se inserta sin clave
+        logger.warning("No existe idx_monitoring_data_idempotency_key (ejecutar init.sql): se inserta sin deduplicar")
+    state['ready'], state['checked_at'] = ready, time.monotonic()
+    return ready
+
+# Ingesta idempotente: clave por encabezado Idempotency-Key o, en modo payload, hash de
+# hora y métricas; caché acotada de claves recientes respaldada por un índice único
+IDEMPOTENCY_MODE = os.getenv('IDEMPOTENCY_MODE', 'header').lower()
+if IDEMPOTENCY_MODE not in ('payload', 'header', 'off'):
+    raise ValueError(f"IDEMPOTENCY_MODE inválido: {IDEMPOTENCY_MODE} (payload, header u off)")
+IDEMPOTENCY_ENABLED = IDEMPOTENCY_MODE != 'off'
+
+recent_keys = None
+if IDEMPOTENCY_ENABLED:
+    recent_keys = RowCache(
+        int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 100000)),
+        ttl=float(os.getenv('IDEMPOTENCY_CACHE_TTL', 3600))
+    )
+
+# Ingesta diferida opcional (INGEST_MODE=buffered)
+INGEST_MODE = os.getenv('INGEST_MODE', 'direct').lower()
+
+ingest_buffer = None
+if INGEST_MODE == 'buffered':
+    ingest_buffer = WriteBehindBuffer(
+        insert_monitoring_batch,
+        batch_size=int(os.getenv('INGEST_BATCH_SIZE', 500)),
+        flush_interval=float(os.getenv('INGEST_FLUSH_MS', 50)) / 1000,
+        max_queue=int(os.getenv('INGEST_QUEUE_MAX', 10000)),
+        max_retries=int(os.getenv('INGEST_MAX_RETRIES', 3)),
+        retry_backoff=float(os.getenv('INGEST_RETRY_BACKOFF_MS', 200)) / 1000
+    )
+    ingest_buffer.start()
+    # Vaciar lo pendiente al terminar el proceso
+    atexit.register(ingest_buffer.stop)
 
 # Rutas
 
@@ -87,18 +435,115 @@ def home():
         'schema': 'fase2'
     })
 
+def create_monitoring_data_list(records):
+    """Validar una lista de muestras y guardarla (o encolarla) completa"""
+    rows, errors = MONITORING_SAMPLE_SCHEMA.validate_many(records)
+    if errors:
+        return jsonify({
+            'error': 'Datos inválidos',
+            'details': errors
+        }), 400
+
+    # Duplicados recientes por índice: se responden con el id original sin insertarlos
+    duplicates = {}
+    if IDEMPOTENCY_ENABLED:
+        rows = [row + (idempotency_key(row, index),) for index, row in enumerate(rows)]
+        for index, row in enumerate(rows):
+            original_id = recent_keys.get(row[-1]) if row[-1] is not None else None
+            if original_id is not None:
+                duplicates[index] = original_id
+        count_duplicates('cache', len(duplicates))
+    pending = [row for index, row in enumerate(rows) if index not in duplicates]
+
+    if ingest_buffer is not None:
+        sequences = []
+        try:
+            for row in pending:
+                sequences.append(ingest_buffer.submit(row))
+        except IngestQueueFullError as e:
+            return jsonify({
+                'error': 'Cola de ingesta llena, reintente más tarde',
+                'details': str(e),
+                'accepted': len(sequences),
+                'sequences': sequences
+            }), 429
+
+        return jsonify({
+            'message': 'Datos de monitoreo encolados para guardarse',
+            'sequences': sequences,
+            'duplicates': [{'index': index, 'id': original_id} for index, original_id in duplicates.items()],
+            'timestamp': datetime.now().isoformat(),
+            'api': 'Python',
+            'schema': 'fase2'
+        }), 202 if sequences else 200
+
+    inserted_ids, inserted = insert_monitoring_batch(pending, returning=True) if pending else ([], 0)
+    inserted_ids = iter(inserted_ids)
+    ids = [duplicates[index] if index in duplicates else next(inserted_ids) for index in range(len(rows))]
+    logger.info("%s registros insertados exitosamente en un solo INSERT", inserted,
+                extra={'event': 'monitoring_insert_batch', 'records': inserted})
+
+    return jsonify({
+        'message': 'Datos de monitoreo guardados exitosamente',
+        'ids': ids,
+        'duplicates': len(rows) - inserted,
+        'timestamp': datetime.now().isoformat(),
+        'api': 'Python',
+        'schema': 'fase2'
+    }), 201 if inserted else 200
+
 @app.route('/monitoring-data', methods=['POST'])
 def create_monitoring_data():
     """Recibir datos de monitoreo en tiempo real"""
     try:
         data = request.get_json()
         
+        # Una lista de muestras se valida completa y se inserta en un solo INSERT
+        if data and isinstance(data, list):
+            return create_monitoring_data_list(data)
+
         # Validar que los datos requeridos estén presentes
         if not data or not isinstance(data, dict):
             return jsonify({
                 'error': 'Datos inválidos: se esperaba un objeto JSON'
             }), 400
 
+        try:
+            values = build_monitoring_values(data)
+        except ValidationError as e:
+            return jsonify({
+                'error': 'Datos inválidos',
+                'details': e.errors
+            }), 400
+
+        key = None
+        if IDEMPOTENCY_ENABLED:
+            key = idempotency_key(values)
+            original_id = recent_keys.get(key) if key is not None else None
+            if original_id is not None:
+                # Duplicado reciente: se responde sin tocar la base
+                count_duplicates('cache')
+                return duplicate_response(original_id)
+
+        # Modo buffered: encolar y responder sin esperar a la base de datos
+        if ingest_buffer is not None:
+            try:
+                # Con idempotencia la fila lleva su clave al final (ver insert_monitoring_batch)
+                sequence = ingest_buffer.submit(values + (key,) if IDEMPOTENCY_ENABLED else values)
+            except IngestQueueFullError as e:
+                return jsonify({
+                    'error': 'Cola de ingesta llena, reintente más tarde',
+                    'details': str(e)
+                }), 429
+
+            return jsonify({
+                'message': 'Datos de monitoreo encolados para guardarse',
+                'sequence': sequence,
+                'timestamp': datetime.now().isoformat(),
+                'api': 'Python',
+                'schema': 'fase2'
+            }), 202
+
         conn = get_db_connection()
         if not conn:
             return jsonify({
@@ -107,39 +552,34 @@ def create_monitoring_data():
 
         try:
             with conn.cursor() as cursor:
-                # Insertar en la tabla fase2.monitoring_data
-                monitoring_query = """
-                    INSERT INTO fase2.monitoring_data (
-                        total_ram, ram_libre, uso_ram, porcentaje_ram, porcentaje_cpu_uso,
-                        porcentaje_cpu_libre, procesos_corriendo, total_procesos,
-                        procesos_durmiendo, procesos_zombie, procesos_parados,
-                        hora, timestamp_received, api
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """
-
-                values = (
-                    data.get('total_ram', 0),
-                    data.get('ram_libre', 0),
-                    data.get('uso_ram', 0),
-                    data.get('porcentaje_ram', 0),
-                    data.get('porcentaje_cpu_uso', 0),
-                    data.get('porcentaje_cpu_libre', 0),
-                    data.get('procesos_corriendo', 0),
-                    data.get('total_procesos', 0),
-                    data.get('procesos_durmiendo', 0),
-                    data.get('procesos_zombie', 0),
-                    data.get('procesos_parados', 0),
-                    parse_datetime(data.get('hora', datetime.now().isoformat())),
-                    parse_datetime(data.get('timestamp_received', datetime.now().isoformat())),
-                    'Python'  # Campo api con valor 'Python'
-                )
+                # Insertar en la tabla fase2.monitoring_data; con clave solo si el índice único existe
+                keyed = key is not None and idempotency_index_ready(cursor)
+                if keyed:
+                    monitoring_query = monitoring_insert_query(MONITORING_KEYED_VALUES_SQL, keyed=True)
+                    values += (key,)
+                else:
+                    monitoring_query = monitoring_insert_query(MONITORING_VALUES_SQL)
 
                 cursor.execute(monitoring_query, values)
-                result = cursor.fetchone()
+                row = cursor.fetchone()
+                if row is None:
+                    # El índice único descartó la fila: id ya guardado, sin escritura ni commit
+                    original_id = find_idempotent_ids(cursor, [key])[key]
+                    conn.rollback()
+                    recent_keys.put(key, original_id)
+                    count_duplicates('index')
+                    return duplicate_response(original_id)
+                columns, (result,), _ = inserted_rows(cursor, [row])
                 conn.commit()
+                if hot_window is not None:
+                    hot_window.add(columns, [result])
+                publish_local_events(columns, [result])
+                if keyed:
+                    recent_keys.put(key, result[0])
 
-                logger.info(f"Datos insertados exitosamente con ID: {result[0]}")
+                # Formato diferido: si el registro se descarta por muestreo no se formatea
+                logger.info("Datos insertados exitosamente con ID: %s", result[0],
+                            extra={'event': 'monitoring_insert', 'record_id': result[0]})
 
                 return jsonify({
                     'message': 'Datos de monitoreo guardados exitosamente',
@@ -150,7 +590,7 @@ def create_monitoring_data():
                 }), 201
 
         finally:
-            conn.close()
+            release_db_connection(conn)
 
     except Exception as e:
         logger.error(f"Error al guardar datos de monitoreo: {e}")
@@ -159,12 +599,172 @@ def create_monitoring_data():
             'details': str(e)
         }), 500
 
+@app.route('/monitoring-data/bulk', methods=['POST'])
+def create_monitoring_data_bulk():
+    """Carga masiva de datos de monitoreo (arreglo JSON o NDJSON) mediante COPY
+
+    Las filas se cargan sin clave de idempotencia (no se deduplican) y sin pg_notify
+    (no llegan a los suscriptores de /monitoring-data/stream)."""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({
+            'error': 'Error de conexión a la base de datos'
+        }), 500
+
+    batches = []
+    errors = []
+    total_errors = 0
+    received = 0
+    pending = []
+
+    def flush_batch():
+        with conn.cursor() as cursor:
+            copy_rows(cursor, 'fase2.monitoring_data', MONITORING_COLUMNS, pending)
+        conn.commit()
+        # COPY no devuelve las filas: la ventana se recarga en la siguiente lectura
+        if hot_window is not None:
+            hot_window.invalidate()
+        batches.append({'batch': len(batches) + 1, 'rows': len(pending)})
+        pending.clear()
+
+    def summary():
+        inserted = sum(batch['rows'] for batch in batches)
+        return {
+            'total_received': received,
+            'inserted': inserted,
+            'rejected': total_errors,
+            'batches': batches,
+            'errors': errors,
+            'api': 'Python',
+            'schema': 'fase2'
+        }
+
+    try:
+        records = iter_bulk_records(request.stream, request.content_type, BULK_CHUNK_SIZE)
+        for index, record in records:
+            received += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                pending.append(build_monitoring_values(record))
+            except Exception as e:
+                total_errors += 1
+                if len(errors) < BULK_MAX_ERRORS:
+                    errors.append({'index': index, 'error': str(e)})
+                continue
+
+            if len(pending) >= BULK_BATCH_SIZE:
+                flush_batch()
+
+        if pending:
+            flush_batch()
+
+        logger.info("Carga masiva: %s recibidos, %s lotes, %s rechazados", received, len(batches), total_errors,
+                    extra={'event': 'bulk_insert', 'received': received, 'rejected': total_errors})
+        return jsonify({
+            'message': 'Carga masiva completada',
+            **summary()
+        }), 201 if batches else 200
+
+    except BulkFormatError as e:
+        conn.rollback()
+        return jsonify({
+            'error': 'Formato inválido en la carga masiva',
+            'details': str(e),
+            **summary()
+        }), 400
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error en la carga masiva: {e}")
+        return jsonify({
+            'error': 'Error en la carga masiva de datos de monitoreo',
+            'details': str(e),
+            **summary()
+        }), 500
+
+    finally:
+        release_db_connection(conn)
+
+def stream_monitoring_rows(conn, query, params, fmt):
+    """Generar la respuesta por bloques desde un cursor del lado del servidor"""
+    try:
+        with conn.cursor(name='monitoring_data_export') as cursor:
+            cursor.execute(query, params)
+
+            backend = app.json.backend
+            columns = None
+            first = True
+            if fmt == 'json':
+                yield b'['
+            while True:
+                rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+                if not rows:
+                    break
+                if columns is None:
+                    columns = [column[0] for column in cursor.description]
+                # Cada bloque se serializa de una vez desde las tuplas
+                if fmt == 'json':
+                    encoded = backend.dumps_rows(columns, rows)[1:-1]
+                    yield encoded if first else b',' + encoded
+                else:
+                    yield backend.dumps_lines(columns, rows)
+                first = False
+            if fmt == 'json':
+                yield b']'
+    except Exception as e:
+        logger.error(f"Error durante la exportación de datos de monitoreo: {e}")
+        raise
+    finally:
+        conn.rollback()
+        release_db_connection(conn)
+
+def not_modified(etag):
+    """304 si el cliente ya tiene esta versión (If-None-Match), o None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+def monitoring_page_response(columns, results, limit, after_id, cache_status, range_time_field=None):
+    """Página con ETag (ids de la página: los registros no cambian) y cursor siguiente"""
+    etag = page_etag(columns, results)
+
+    # Tuplas + columnas: se serializan sin construir un RealDictRow por fila
+    response = not_modified(etag) or app.json.rows_response(columns, results)
+    response.set_etag(etag, weak=True)
+    response.headers['X-Cache'] = cache_status
+
+    # Cursor para la siguiente página (con rango de tiempo, el (timestamp, id) de la última fila)
+    next_cursor = next_page_cursor(columns, results, limit, after_id, range_time_field)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 @app.route('/monitoring-data', methods=['GET'])
 def get_monitoring_data():
-    """Obtener datos de monitoreo con paginación"""
+    """Obtener datos de monitoreo paginados (OFFSET, cursor o rango de tiempo) o exportarlos en streaming"""
     try:
-        skip = int(request.args.get('skip', 0))
-        limit = min(int(request.args.get('limit', 100)), 1000)  # Máximo 1000
+        try:
+            page, stream_format = parse_page_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        ranged = page['start'] is not None or page['end'] is not None
+
+        if stream_format:
+            # La exportación no tiene tope de filas salvo que se indique limit
+            limit = request.args.get('limit', type=int)
+        else:
+            limit = min(int(request.args.get('limit', 100)), 1000)  # Máximo 1000
+
+        # Primeras páginas desde la ventana de registros recientes, sin consultar la base
+        if (hot_window is not None and not stream_format and not ranged and page['skip'] >= 0 and limit > 0
+                and all(page[name] is None for name in ('before_id', 'after_id', 'api', 'fields'))):
+            cached = hot_window.page(page['skip'], limit)
+            if cached is not None:
+                columns, results, cache_status = cached
+                return monitoring_page_response(columns, results, limit, None, cache_status)
 
         conn = get_db_connection()
         if not conn:
@@ -172,22 +772,27 @@ def get_monitoring_data():
                 'error': 'Error de conexión a la base de datos'
             }), 500
 
+        query, params = build_page_query(limit=limit, **page)
+
+        if stream_format:
+            # La conexión se devuelve al pool cuando termina el generador
+            mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+            return Response(
+                stream_with_context(stream_monitoring_rows(conn, query, params, stream_format)),
+                mimetype=mimetype
+            )
+
         try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                query = """
-                    SELECT * FROM fase2.monitoring_data
-                    ORDER BY id DESC
-                    OFFSET %s LIMIT %s
-                """
-                cursor.execute(query, (skip, limit))
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
                 results = cursor.fetchall()
-                
-                # Convertir a lista de diccionarios
-                data = [dict(row) for row in results]
-                return jsonify(data)
+                columns = [column[0] for column in cursor.description]
+
+            return monitoring_page_response(columns, results, limit, page['after_id'], 'miss',
+                                            page['time_field'] if ranged else None)
 
         finally:
-            conn.close()
+            release_db_connection(conn)
 
     except Exception as e:
         logger.error(f"Error al obtener datos de monitoreo: {e}")
@@ -196,10 +801,51 @@ def get_monitoring_data():
             'details': str(e)
         }), 500
 
-@app.route('/monitoring-data/<int:data_id>', methods=['GET'])
-def get_monitoring_data_by_id(data_id):
-    """Obtener un registro específico de monitoreo"""
+@app.route('/monitoring-data/rollup', methods=['GET'])
+def get_monitoring_rollup():
+    """Obtener rollups por minuto u hora (count, sum, min, max, last por columna)"""
     try:
+        bucket = request.args.get('bucket', '1m')
+        if bucket not in ROLLUP_BUCKETS:
+            return jsonify({
+                'error': f"bucket debe ser uno de: {', '.join(ROLLUP_BUCKETS)}"
+            }), 400
+        try:
+            start = parse_datetime(request.args['from']) if request.args.get('from') else None
+            end = parse_datetime(request.args['to']) if request.args.get('to') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        api = request.args.get('api') or None
+        limit = request.args.get('limit', type=int)
+        if 'limit' not in request.args:
+            limit = 1440
+        elif limit is None or limit < 1:
+            return jsonify({
+                'error': 'limit debe ser un entero positivo'
+            }), 400
+        limit = min(limit, ROLLUP_MAX_ROWS)
+
+        conditions, params = ['bucket = %s'], [bucket]
+        if start is not None:
+            conditions.append('bucket_start >= %s')
+            params.append(start)
+        if end is not None:
+            conditions.append('bucket_start <= %s')
+            params.append(end)
+        if api is not None:
+            conditions.append('api = %s')
+            params.append(api)
+
+        # Sin 'from' se devuelven los buckets más recientes
+        order = 'ASC' if start is not None else 'DESC'
+        query = f"""
+            SELECT * FROM fase2.monitoring_rollup
+            WHERE {' AND '.join(conditions)}
+            ORDER BY bucket_start {order}, api
+            LIMIT %s
+        """
+        params.append(limit)
+
         conn = get_db_connection()
         if not conn:
             return jsonify({
@@ -207,18 +853,219 @@ def get_monitoring_data_by_id(data_id):
             }), 500
 
         try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                query = 'SELECT * FROM fase2.monitoring_data WHERE id = %s'
-                cursor.execute(query, (data_id,))
-                result = cursor.fetchone()
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                results = cursor.fetchall()
+                if order == 'DESC':
+                    results.reverse()
+                return app.json.rows_response([column[0] for column in cursor.description], results)
+
+        finally:
+            release_db_connection(conn)
+
+    except Exception as e:
+        logger.error(f"Error al obtener rollups: {e}")
+        return jsonify({
+            'error': 'Error al obtener rollups',
+            'details': str(e)
+        }), 500
+
+# Reducción de series: máximo de puntos por petición
+DOWNSAMPLE_MAX_POINTS = int(os.getenv('DOWNSAMPLE_MAX_POINTS', 5000))
+DOWNSAMPLE_DEFAULT_FIELDS = ('porcentaje_cpu_uso', 'porcentaje_ram')
+
+def downsample_series(conn, columns, method, points, time_field, start, end, api):
+    """Reducir las columnas del rango a ~`points` puntos recorriendo las filas con un cursor del lado del servidor"""
+    conditions, params = range_conditions(time_field, start, end, api)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    epoch = f"extract(epoch from {time_field})::float8"
+    values_sql = ', '.join(columns)
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT MIN({epoch}), MAX({epoch}), COUNT(*) FROM fase2.monitoring_data {where}", params)
+        low, high, total = cursor.fetchone()
+
+        if total <= points:
+            method, buckets = 'raw', 0
+            reducer = RawReducer(columns)
+        else:
+            # Buckets de igual duración entre la primera y la última muestra del rango
+            buckets = points - 2 if method == 'lttb' else points // 2
+            high = max(high, low + 1e-3)
+            if method == 'lttb':
+                # Promedio por bucket (en SQL) para el "siguiente" de cada bucket
+                cursor.execute(
+                    f"SELECT LEAST(width_bucket({epoch}, %s, %s, %s), %s) AS bucket, AVG({epoch}), "
+                    f"{', '.join(f'AVG({column})::float8' for column in columns)} "
+                    f"FROM fase2.monitoring_data {where} GROUP BY bucket ORDER BY bucket",
+                    [low, high, buckets, buckets] + params
+                )
+                averages = cursor.fetchall()
+                cursor.execute(
+                    f"SELECT {epoch}, {values_sql} FROM fase2.monitoring_data {where} "
+                    f"ORDER BY {time_field} DESC, id DESC LIMIT 1",
+                    params
+                )
+                reducer = LTTBReducer(columns, averages, cursor.fetchone())
+            else:
+                reducer = MinMaxReducer(columns)
+
+    if buckets:
+        bucket_sql, bucket_params = f"LEAST(width_bucket({epoch}, %s, %s, %s), %s)", [low, high, buckets, buckets]
+    else:
+        bucket_sql, bucket_params = '0', []
+
+    if total:
+        with conn.cursor(name='monitoring_downsample') as cursor:
+            cursor.execute(
+                f"SELECT {bucket_sql}, {epoch}, {values_sql} FROM fase2.monitoring_data {where} "
+                f"ORDER BY {time_field}, id",
+                bucket_params + params
+            )
+            while True:
+                rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+                if not rows:
+                    break
+                reducer.feed(rows)
+
+    return {
+        'method': method,
+        'time_field': time_field,
+        'input_rows': int(total),
+        'buckets': buckets,
+        'series': reducer.result()
+    }
+
+@app.route('/monitoring-data/downsample', methods=['GET'])
+def get_monitoring_downsample():
+    """Series reducidas (LTTB o mínimo/máximo por bucket) de columnas métricas en un rango de tiempo"""
+    try:
+        try:
+            time_field, start, end, api, fields = parse_range_args(request.args)
+            columns = fields[1:] if fields else list(DOWNSAMPLE_DEFAULT_FIELDS)
+            invalid = [column for column in columns if column not in MONITORING_METRIC_COLUMNS]
+            if invalid or not columns:
+                raise ValueError(f"fields debe contener columnas numéricas: {', '.join(invalid)}")
+            method = request.args.get('method', 'lttb')
+            if method not in DOWNSAMPLE_METHODS:
+                raise ValueError('method debe ser lttb o minmax')
+            points = int(request.args.get('points', 500))
+            if not 3 <= points <= DOWNSAMPLE_MAX_POINTS:
+                raise ValueError(f"points debe estar entre 3 y {DOWNSAMPLE_MAX_POINTS}")
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({
+                'error': 'Error de conexión a la base de datos'
+            }), 500
+
+        try:
+            result = downsample_series(conn, columns, method, points, time_field, start, end, api)
+        finally:
+            conn.rollback()
+            release_db_connection(conn)
+
+        return jsonify({
+            **result,
+            'points': max(len(series['t']) for series in result['series'].values()),
+            'filters': {
+                'from': start.isoformat() if start else None,
+                'to': end.isoformat() if end else None,
+                'api': api
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"Error al reducir datos de monitoreo: {e}")
+        return jsonify({
+            'error': 'Error al reducir datos de monitoreo',
+            'details': str(e)
+        }), 500
+
+@app.route('/monitoring-data/stream', methods=['GET'])
+def stream_monitoring_data():
+    """Server-sent events con cada registro insertado (evento monitoring-data)"""
+    if event_hub is None:
+        return jsonify({
+            'error': 'Stream deshabilitado (STREAM_ENABLED=false)'
+        }), 404
+    try:
+        subscription = event_hub.subscribe()
+    except TooManySubscribersError as e:
+        return jsonify({
+            'error': 'Demasiados suscriptores, reintente más tarde',
+            'details': str(e)
+        }), 503
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                batch = subscription.get(STREAM_HEARTBEAT)
+                if subscription.dropped:
+                    # Cliente lento: se cierra el stream y EventSource reconecta
+                    yield 'event: dropped\ndata: {"error": "Cliente demasiado lento, reconecte"}\n\n'
+                    return
+                if batch is None:
+                    # Comentario periódico: mantiene proxies abiertos y detecta clientes caídos
+                    yield ': keep-alive\n\n'
+                    continue
+                first_id, events = batch
+                # Un lote se escribe en un solo bloque
+                yield ''.join(
+                    f'id: {event_id}\nevent: monitoring-data\ndata: {data}\n\n'
+                    for event_id, data in enumerate(events, first_id)
+                )
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/monitoring-data/<int:data_id>', methods=['GET'])
+def get_monitoring_data_by_id(data_id):
+    """Obtener un registro específico de monitoreo"""
+    try:
+        # Los registros no cambian: se sirven desde la caché por id o la ventana reciente
+        record = row_cache.get(data_id) if row_cache is not None else None
+        cache_status = 'hit'
+        if record is None:
+            found = hot_window.find(data_id) if hot_window is not None else None
+            if found is not None:
+                columns, row = found
+                record = dict(zip(columns, row))
+            else:
+                cache_status = 'miss'
+                conn = get_db_connection()
+                if not conn:
+                    return jsonify({
+                        'error': 'Error de conexión a la base de datos'
+                    }), 500
+
+                try:
+                    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                        query = f'SELECT {MONITORING_QUERY_COLUMNS_SQL} FROM fase2.monitoring_data WHERE id = %s'
+                        cursor.execute(query, (data_id,))
+                        result = cursor.fetchone()
+                finally:
+                    release_db_connection(conn)
 
                 if not result:
                     return jsonify({'error': 'Registro no encontrado'}), 404
+                record = dict(result)
 
-                return jsonify(dict(result))
+            if row_cache is not None:
+                row_cache.put(data_id, record)
 
-        finally:
-            conn.close()
+        etag = str(data_id)
+        response = not_modified(etag) or jsonify(record)
+        response.set_etag(etag, weak=True)
+        response.headers['X-Cache'] = cache_status
+        return response
 
     except Exception as e:
         logger.error(f"Error al obtener registro: {e}")
@@ -238,6 +1085,14 @@ def create_metadata():
                 'error': 'Datos inválidos: se esperaba un objeto JSON'
             }), 400
 
+        try:
+            values = build_metadata_values(data)
+        except ValidationError as e:
+            return jsonify({
+                'error': 'Datos inválidos',
+                'details': e.errors
+            }), 400
+
         conn = get_db_connection()
         if not conn:
             return jsonify({
@@ -246,26 +1101,12 @@ def create_metadata():
 
         try:
             with conn.cursor() as cursor:
-                metadata_query = """
-                    INSERT INTO fase2.metadata (
-                        total_records, collection_start, collection_end, duration_minutes,
-                        users, generated_at, phase, description, api
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                metadata_query = f"""
+                    INSERT INTO fase2.metadata ({METADATA_COLUMNS_SQL})
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                     RETURNING id
                 """
 
-                values = (
-                    data.get('total_records', 0),
-                    parse_datetime(data.get('collection_start', datetime.now().isoformat())),
-                    parse_datetime(data.get('collection_end', datetime.now().isoformat())),
-                    data.get('duration_minutes', 0),
-                    data.get('users', 0),
-                    parse_datetime(data.get('generated_at', datetime.now().isoformat())),
-                    data.get('phase', 2),
-                    data.get('description', ''),
-                    'Python'  # Campo api con valor 'Python'
-                )
-
                 cursor.execute(metadata_query, values)
                 result = cursor.fetchone()
                 conn.commit()
@@ -277,7 +1118,7 @@ def create_metadata():
                 }), 201
 
         finally:
-            conn.close()
+            release_db_connection(conn)
 
     except Exception as e:
         logger.error(f"Error al guardar metadata: {e}")
@@ -297,16 +1138,15 @@ def get_metadata():
             }), 500
 
         try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            with conn.cursor() as cursor:
                 query = 'SELECT * FROM fase2.metadata ORDER BY id'
                 cursor.execute(query)
                 results = cursor.fetchall()
-                
-                data = [dict(row) for row in results]
-                return jsonify(data)
+
+                return app.json.rows_response([column[0] for column in cursor.description], results)
 
         finally:
-            conn.close()
+            release_db_connection(conn)
 
     except Exception as e:
         logger.error(f"Error al obtener metadata: {e}")
@@ -315,52 +1155,68 @@ def get_metadata():
             'details': str(e)
         }), 500
 
+def compute_stats(start, end, api):
+    """Calcular todas las estadísticas en una sola pasada sobre monitoring_data"""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append('hora >= %s')
+        params.append(start)
+    if end is not None:
+        conditions.append('hora <= %s')
+        params.append(end)
+    if api is not None:
+        conditions.append('api = %s')
+        params.append(api)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    query = f"""
+        SELECT
+            COUNT(*),
+            (SELECT COUNT(*) FROM fase2.metadata),
+            AVG(porcentaje_cpu_uso),
+            AVG(porcentaje_ram),
+            MAX(porcentaje_cpu_uso),
+            MAX(porcentaje_ram),
+            COUNT(*) FILTER (WHERE api = 'Python')
+        FROM fase2.monitoring_data
+        {where}
+    """
+
+    conn = db_pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            results = cursor.fetchone()
+        conn.rollback()
+    finally:
+        db_pool.putconn(conn)
+
+    return stats_from_row(results)
+
 @app.route('/stats', methods=['GET'])
 def get_stats():
-    """Obtener estadísticas básicas"""
+    """Obtener estadísticas básicas (una sola consulta, servida desde caché)"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({
-                'error': 'Error de conexión a la base de datos'
-            }), 500
-
         try:
-            with conn.cursor() as cursor:
-                queries = [
-                    'SELECT COUNT(*) FROM fase2.monitoring_data',
-                    'SELECT COUNT(*) FROM fase2.metadata',
-                    'SELECT AVG(porcentaje_cpu_uso) FROM fase2.monitoring_data',
-                    'SELECT AVG(porcentaje_ram) FROM fase2.monitoring_data',
-                    'SELECT MAX(porcentaje_cpu_uso) FROM fase2.monitoring_data',
-                    'SELECT MAX(porcentaje_ram) FROM fase2.monitoring_data',
-                    'SELECT COUNT(*) FROM fase2.monitoring_data WHERE api = %s'
-                ]
-
-                results = []
-                for i, query in enumerate(queries):
-                    if i == len(queries) - 1:  # Última query con parámetro
-                        cursor.execute(query, ('Python',))
-                    else:
-                        cursor.execute(query)
-                    results.append(cursor.fetchone()[0])
-
-                stats = {
-                    'total_monitoring_records': int(results[0] or 0),
-                    'total_metadata_records': int(results[1] or 0),
-                    'average_cpu_usage': round(float(results[2] or 0), 2),
-                    'average_ram_usage': round(float(results[3] or 0), 2),
-                    'max_cpu_usage': int(results[4] or 0),
-                    'max_ram_usage': int(results[5] or 0),
-                    'python_api_records': int(results[6] or 0),
-                    'api': 'Python',
-                    'schema': 'fase2'
-                }
+            start = parse_datetime(request.args['from']) if request.args.get('from') else None
+            end = parse_datetime(request.args['to']) if request.args.get('to') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        api = request.args.get('api') or None
 
-                return jsonify(stats)
+        key = (start, end, api)
+        stats, age, cache_status = stats_cache.get(key, lambda: compute_stats(start, end, api))
 
-        finally:
-            conn.close()
+        return jsonify({
+            **stats,
+            'filters': {
+                'from': start.isoformat() if start else None,
+                'to': end.isoformat() if end else None,
+                'api': api
+            },
+            'cache_age_seconds': round(age, 3),
+            'cache_status': cache_status
+        })
 
     except Exception as e:
         logger.error(f"Error al obtener estadísticas: {e}")
@@ -390,8 +1246,20 @@ def delete_all_monitoring_data():
             # Eliminar datos
             cursor.execute('DELETE FROM fase2.monitoring_data')
             cursor.execute('DELETE FROM fase2.metadata')
+
+            # Los rollups derivan de monitoring_data: se limpian con ella
+            cursor.execute("SELECT to_regclass('fase2.monitoring_rollup')")
+            if cursor.fetchone()[0]:
+                cursor.execute('DELETE FROM fase2.monitoring_rollup')
             
             conn.commit()
+            stats_cache.clear()
+            if row_cache is not None:
+                row_cache.clear()
+            if hot_window is not None:
+                hot_window.invalidate()
+            if recent_keys is not None:
+                recent_keys.clear()
 
             return jsonify({
                 'message': 'Datos eliminados exitosamente',
@@ -408,7 +1276,7 @@ def delete_all_monitoring_data():
             'details': str(e)
         }), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/test-connection', methods=['GET'])
 def test_connection():
@@ -444,7 +1312,7 @@ def test_connection():
             })
 
         finally:
-            conn.close()
+            release_db_connection(conn)
 
     except Exception as e:
         logger.error(f"Error al probar conexión: {e}")
@@ -453,6 +1321,56 @@ def test_connection():
             'details': str(e)
         }), 500
 
+@app.route('/pool-stats', methods=['GET'])
+def get_pool_stats():
+    """Estadísticas del pool de conexiones de esta réplica"""
+    return jsonify({
+        'pool': db_pool.stats(),
+        'api': 'Python'
+    })
+
+@app.route('/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Aciertos y fallos de las cachés de lectura de esta réplica"""
+    return jsonify({
+        'row_cache': row_cache.stats() if row_cache is not None else None,
+        'hot_window': hot_window.stats() if hot_window is not None else None,
+        'stats_cache': stats_cache.stats(),
+        'idempotency_keys': recent_keys.stats() if recent_keys is not None else None,
+        'api': 'Python'
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    if not METRICS_ENABLED:
+        return jsonify({
+            'error': 'Métricas deshabilitadas (METRICS_ENABLED=false)'
+        }), 404
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/ingest-status', methods=['GET'])
+def get_ingest_status():
+    """Estado de la ingesta diferida (secuencias encoladas y guardadas)"""
+    return jsonify({
+        'mode': INGEST_MODE,
+        'buffer': ingest_buffer.stats() if ingest_buffer is not None else None,
+        'api': 'Python'
+    })
+
+@app.route('/stream-status', methods=['GET'])
+def get_stream_status():
+    """Suscriptores y eventos del stream SSE de esta réplica"""
+    return jsonify({
+        'enabled': STREAM_ENABLED,
+        'notify': {
+            'channel': STREAM_CHANNEL,
+            'listening': notify_listener.connected
+        } if notify_listener is not None else None,
+        'hub': event_hub.stats() if event_hub is not None else None,
+        'api': 'Python'
+    })
+
 @app.errorhandler(404)
 def not_found(error):
     """Middleware para manejar rutas no encontradas"""
@@ -477,5 +1395,26 @@ if __name__ == '__main__':
     print(f"📊 Endpoint para datos: POST http://localhost:{port}/monitoring-data")
     print(f"🔗 Base de datos: PostgreSQL en GCP (fase2 schema)")
     print(f"🧪 Test de conexión: GET http://localhost:{port}/test-connection")
+    print(f"📥 Modo de ingesta: {INGEST_MODE} (GET /ingest-status)")
+    print(f"🏊 Pool de conexiones: min={POOL_CONFIG['min_size']} max={POOL_CONFIG['max_size']} (GET /pool-stats)")
+    print(f"🗂️  Caché de lectura: {ROW_CACHE_SIZE} registros por id, ventana de {HOT_WINDOW_SIZE} recientes (GET /cache-stats)")
+    print(f"🔁 Idempotencia: {IDEMPOTENCY_MODE} " + {
+        'payload': '(encabezado Idempotency-Key o hash de hora y métricas)',
+        'header': '(solo encabezado Idempotency-Key)',
+        'off': '(cada POST crea un registro)'
+    }[IDEMPOTENCY_MODE])
+    if STREAM_ENABLED:
+        print(f"📡 Stream SSE: GET http://localhost:{port}/monitoring-data/stream"
+              f" ({'LISTEN/NOTIFY ' + STREAM_CHANNEL if STREAM_NOTIFY else 'solo esta réplica'}, GET /stream-status)")
+    if METRICS_ENABLED:
+        print(f"📈 Métricas Prometheus: GET http://localhost:{port}/metrics")
+
+    # SIGTERM (Kubernetes) termina vía sys.exit para que atexit vacíe el buffer
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        db_pool.warmup()
+    except Exception as e:
+        logger.error(f"No se pudo precalentar el pool de conexiones: {e}")
     
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
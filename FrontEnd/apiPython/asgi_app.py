@@ -0,0 +1,686 @@
+"""
+Variante asíncrona (ASGI) de la API de persistencia
+
+Expone las mismas rutas y el mismo contrato JSON que app.py para
+/monitoring-data (GET, POST y DELETE), /metadata, /stats y /test-connection, usando asyncpg con su
+propio pool de conexiones. Un solo proceso atiende cientos de inserciones
+concurrentes mientras espera a Cloud SQL sin bloquear hilos.
+
+Los parámetros, la consulta, el ETag y el cursor de GET /monitoring-data son los
+de monitoring.py, compartidos con app.py (filtros from/to/api/fields, cursores,
+exportación con stream y 304 con If-None-Match). POST acepta un objeto o una
+lista de muestras.
+
+No soportado (responde 501):
+- Encabezado Idempotency-Key (ni IDEMPOTENCY_MODE=payload: no se deduplica)
+- /monitoring-data/bulk, /monitoring-data/rollup, /monitoring-data/downsample
+  y /monitoring-data/stream
+- /pool-stats, /cache-stats, /metrics, /ingest-status y /stream-status
+
+Tampoco hay ingesta diferida (INGEST_MODE) ni ventana de registros recientes:
+X-Cache es siempre miss.
+
+Ejecutar con:
+    python asgi_app.py
+    uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+"""
+
+import os
+import re
+import itertools
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import asyncpg
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from monitoring import (
+    MONITORING_COLUMNS, MONITORING_COLUMNS_SQL, MONITORING_QUERY_COLUMNS_SQL, METADATA_COLUMNS_SQL,
+    build_monitoring_values, build_metadata_values, build_page_query, next_page_cursor, page_etag,
+    parse_page_args, range_conditions, stats_from_row
+)
+from timestamps import parse_datetime
+from validation import MONITORING_SAMPLE_SCHEMA, ValidationError
+from stats_cache import AsyncStaleWhileRevalidateCache
+from json_backends import get_json_backend
+from async_logging import configure_logging, parse_sample_rates
+
+# Configurar logging: mismas variables LOG_* que app.py
+log_control = configure_logging(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    log_format=os.getenv('LOG_FORMAT', 'text'),
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', 10000)),
+    sample_rate=float(os.getenv('LOG_SAMPLE_RATE', 1.0)),
+    event_rates=parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', '')),
+    rate_limit=float(os.getenv('LOG_RATE_LIMIT', 0))
+)
+logger = log_control.get_logger(__name__)
+
+# Configuración de base de datos - GCP PostgreSQL
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', '34.56.148.15'),
+    'database': os.getenv('DB_NAME', 'monitoring-metrics'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', '12345678'),
+    'port': int(os.getenv('DB_PORT', '5432'))
+}
+
+# Mismas variables que el pool de app.py; asyncpg recicla tras max_queries usos
+POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', 1)),
+    'max_size': int(os.getenv('DB_POOL_MAX', 10)),
+    'max_queries': int(os.getenv('DB_POOL_MAX_USES', 5000)),
+    'max_inactive_connection_lifetime': float(os.getenv('DB_POOL_MAX_IDLE', 300))
+}
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+
+STREAM_FETCH_SIZE = int(os.getenv('STREAM_FETCH_SIZE', 2000))
+
+# Filas por INSERT multi-fila de una lista (asyncpg admite hasta 32767 parámetros)
+INSERT_BATCH_ROWS = 1000
+
+stats_cache = AsyncStaleWhileRevalidateCache(
+    ttl=float(os.getenv('STATS_CACHE_TTL', 5)),
+    stale_ttl=float(os.getenv('STATS_STALE_TTL', 30))
+)
+
+db_pool = None
+
+
+# Mismo backend JSON que app.py (JSON_BACKEND / JSON_DATETIME_FORMAT)
+json_backend = get_json_backend(
+    os.getenv('JSON_BACKEND', 'orjson'),
+    os.getenv('JSON_DATETIME_FORMAT', 'http')
+)
+
+
+class FlaskJSONResponse(JSONResponse):
+    """Respuesta JSON con el mismo formato que jsonify de Flask"""
+
+    def render(self, content):
+        return json_backend.dumps(content)
+
+
+def records_response(records):
+    """Respuesta con un arreglo JSON construido desde los Record de asyncpg"""
+    if not records:
+        return FlaskJSONResponse([])
+    return Response(json_backend.dumps_rows(list(records[0].keys()), records), media_type='application/json')
+
+
+def db_error():
+    return FlaskJSONResponse({
+        'error': 'Error de conexión a la base de datos'
+    }, status_code=500)
+
+
+async def acquire():
+    """Obtener una conexión del pool asyncpg o None si no es posible"""
+    try:
+        return await db_pool.acquire(timeout=POOL_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Error conectando a la base de datos: {e}")
+        return None
+
+
+def numbered_params(query):
+    """Pasar los marcadores %s de psycopg2 (consultas de monitoring.py) a $1, $2, ... de asyncpg"""
+    counter = itertools.count(1)
+    return re.sub(r'%s', lambda match: f'${next(counter)}', query)
+
+
+def etag_matches(if_none_match, etag):
+    """Comparación débil de If-None-Match con el ETag de la página (como werkzeug)"""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')}
+    return '*' in tags or etag in tags
+
+
+def not_implemented():
+    """Funcionalidad de app.py que este servidor no implementa"""
+    return FlaskJSONResponse({
+        'error': 'No implementado en el servidor ASGI (usar app.py)',
+        'api': 'Python'
+    }, status_code=501)
+
+
+async def not_implemented_route(request):
+    """Rutas de app.py sin equivalente en este servidor"""
+    return not_implemented()
+
+
+def naive_utc(values):
+    """asyncpg no codifica fechas con zona horaria en columnas TIMESTAMP: se pasan a UTC sin zona"""
+    return tuple(
+        value.astimezone(timezone.utc).replace(tzinfo=None)
+        if isinstance(value, datetime) and value.tzinfo is not None else value
+        for value in values
+    )
+
+
+async def read_json_object(request):
+    """Leer el cuerpo como objeto JSON o devolver None si no lo es"""
+    try:
+        data = await request.json()
+    except Exception:
+        return None
+    return data if data and isinstance(data, dict) else None
+
+
+# Rutas
+
+async def home(request):
+    """Ruta raíz"""
+    return FlaskJSONResponse({
+        'message': 'Monitoring Data API - Python/ASGI',
+        'version': '1.0.0',
+        'api_type': 'Python',
+        'database': 'PostgreSQL GCP',
+        'schema': 'fase2'
+    })
+
+
+async def create_monitoring_data_list(records):
+    """Validar una lista de muestras y guardarla en INSERT multi-fila dentro de una transacción"""
+    rows, errors = MONITORING_SAMPLE_SCHEMA.validate_many(records)
+    if errors:
+        return FlaskJSONResponse({
+            'error': 'Datos inválidos',
+            'details': errors
+        }, status_code=400)
+
+    conn = await acquire()
+    if not conn:
+        return db_error()
+
+    ids = []
+    try:
+        async with conn.transaction():
+            for offset in range(0, len(rows), INSERT_BATCH_ROWS):
+                batch = rows[offset:offset + INSERT_BATCH_ROWS]
+                width = len(MONITORING_COLUMNS)
+                values_sql = ', '.join(
+                    '(' + ', '.join(f'${row * width + column + 1}' for column in range(width)) + ')'
+                    for row in range(len(batch))
+                )
+                records = await conn.fetch(
+                    f"INSERT INTO fase2.monitoring_data ({MONITORING_COLUMNS_SQL}) VALUES {values_sql} RETURNING id",
+                    *itertools.chain.from_iterable(naive_utc(row) for row in batch)
+                )
+                ids.extend(record['id'] for record in records)
+    finally:
+        await db_pool.release(conn)
+
+    logger.info("%s registros insertados exitosamente en un solo INSERT", len(ids),
+                extra={'event': 'monitoring_insert_batch', 'records': len(ids)})
+
+    return FlaskJSONResponse({
+        'message': 'Datos de monitoreo guardados exitosamente',
+        'ids': ids,
+        'duplicates': 0,
+        'timestamp': datetime.now().isoformat(),
+        'api': 'Python',
+        'schema': 'fase2'
+    }, status_code=201)
+
+
+async def create_monitoring_data(request):
+    """Recibir datos de monitoreo en tiempo real"""
+    try:
+        # Sin deduplicación: un reintento con Idempotency-Key no debe guardarse dos veces
+        if request.headers.get('Idempotency-Key'):
+            return not_implemented()
+
+        try:
+            data = await request.json()
+        except Exception:
+            data = None
+
+        # Una lista de muestras se valida completa y se inserta en INSERT multi-fila
+        if data and isinstance(data, list):
+            return await create_monitoring_data_list(data)
+
+        if not data or not isinstance(data, dict):
+            return FlaskJSONResponse({
+                'error': 'Datos inválidos: se esperaba un objeto JSON'
+            }, status_code=400)
+
+        try:
+            values = build_monitoring_values(data)
+        except ValidationError as e:
+            return FlaskJSONResponse({
+                'error': 'Datos inválidos',
+                'details': e.errors
+            }, status_code=400)
+
+        conn = await acquire()
+        if not conn:
+            return db_error()
+
+        try:
+            record_id = await conn.fetchval(f"""
+                INSERT INTO fase2.monitoring_data ({MONITORING_COLUMNS_SQL})
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+                RETURNING id
+            """, *naive_utc(values))
+        finally:
+            await db_pool.release(conn)
+
+        logger.info("Datos insertados exitosamente con ID: %s", record_id,
+                    extra={'event': 'monitoring_insert', 'record_id': record_id})
+
+        return FlaskJSONResponse({
+            'message': 'Datos de monitoreo guardados exitosamente',
+            'id': record_id,
+            'timestamp': datetime.now().isoformat(),
+            'api': 'Python',
+            'schema': 'fase2'
+        }, status_code=201)
+
+    except Exception as e:
+        logger.error(f"Error al guardar datos de monitoreo: {e}")
+        return FlaskJSONResponse({
+            'error': 'Error al guardar datos de monitoreo',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def stream_monitoring_rows(conn, query, params, fmt):
+    """Generar la exportación por bloques desde un cursor del lado del servidor"""
+    try:
+        async with conn.transaction():
+            cursor = await conn.cursor(query, *params)
+            columns = None
+            first = True
+            if fmt == 'json':
+                yield b'['
+            while True:
+                records = await cursor.fetch(STREAM_FETCH_SIZE)
+                if not records:
+                    break
+                if columns is None:
+                    columns = list(records[0].keys())
+                # Cada bloque se serializa de una vez desde los Record
+                if fmt == 'json':
+                    encoded = json_backend.dumps_rows(columns, records)[1:-1]
+                    yield encoded if first else b',' + encoded
+                else:
+                    yield json_backend.dumps_lines(columns, records)
+                first = False
+            if fmt == 'json':
+                yield b']'
+    finally:
+        await db_pool.release(conn)
+
+
+async def get_monitoring_data(request):
+    """Obtener datos de monitoreo paginados (OFFSET, cursor o rango de tiempo) o exportarlos en streaming"""
+    try:
+        args = request.query_params
+        try:
+            page, stream_format = parse_page_args(args)
+        except ValueError as e:
+            return FlaskJSONResponse({'error': str(e)}, status_code=400)
+        ranged = page['start'] is not None or page['end'] is not None
+
+        if stream_format:
+            limit = int(args['limit']) if 'limit' in args else None
+        else:
+            limit = min(int(args.get('limit', 100)), 1000)  # Máximo 1000
+
+        # Misma consulta que app.py con los marcadores de asyncpg
+        query, params = build_page_query(limit=limit, **page)
+        query, params = numbered_params(query), naive_utc(params)
+
+        conn = await acquire()
+        if not conn:
+            return db_error()
+
+        if stream_format:
+            # La conexión se devuelve al pool cuando termina el generador
+            media_type = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+            return StreamingResponse(
+                stream_monitoring_rows(conn, query, params, stream_format),
+                media_type=media_type
+            )
+
+        try:
+            records = await conn.fetch(query, *params)
+        finally:
+            await db_pool.release(conn)
+
+        columns = list(records[0].keys()) if records else []
+        etag = page_etag(columns, records)
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            response = Response(status_code=304)
+        else:
+            response = records_response(records)
+        response.headers['ETag'] = f'W/"{etag}"'
+        response.headers['X-Cache'] = 'miss'
+
+        next_cursor = next_page_cursor(columns, records, limit, page['after_id'],
+                                       page['time_field'] if ranged else None)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    except Exception as e:
+        logger.error(f"Error al obtener datos de monitoreo: {e}")
+        return FlaskJSONResponse({
+            'error': 'Error al obtener datos de monitoreo',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def get_monitoring_data_by_id(request):
+    """Obtener un registro específico de monitoreo"""
+    try:
+        conn = await acquire()
+        if not conn:
+            return db_error()
+
+        try:
+            record = await conn.fetchrow(
+                f'SELECT {MONITORING_QUERY_COLUMNS_SQL} FROM fase2.monitoring_data WHERE id = $1',
+                request.path_params['data_id']
+            )
+        finally:
+            await db_pool.release(conn)
+
+        if not record:
+            return FlaskJSONResponse({'error': 'Registro no encontrado'}, status_code=404)
+
+        # Los registros no cambian: el id sirve de ETag, como en app.py
+        etag = str(request.path_params['data_id'])
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            response = Response(status_code=304)
+        else:
+            response = FlaskJSONResponse(dict(record))
+        response.headers['ETag'] = f'W/"{etag}"'
+        response.headers['X-Cache'] = 'miss'
+        return response
+
+    except Exception as e:
+        logger.error(f"Error al obtener registro: {e}")
+        return FlaskJSONResponse({
+            'error': 'Error al obtener registro',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def create_metadata(request):
+    """Crear registro de metadata"""
+    try:
+        data = await read_json_object(request)
+        if data is None:
+            return FlaskJSONResponse({
+                'error': 'Datos inválidos: se esperaba un objeto JSON'
+            }, status_code=400)
+
+        try:
+            values = build_metadata_values(data)
+        except ValidationError as e:
+            return FlaskJSONResponse({
+                'error': 'Datos inválidos',
+                'details': e.errors
+            }, status_code=400)
+
+        conn = await acquire()
+        if not conn:
+            return db_error()
+
+        try:
+            record_id = await conn.fetchval(f"""
+                INSERT INTO fase2.metadata ({METADATA_COLUMNS_SQL})
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                RETURNING id
+            """, *naive_utc(values))
+        finally:
+            await db_pool.release(conn)
+
+        return FlaskJSONResponse({
+            'message': 'Metadata guardada exitosamente',
+            'id': record_id,
+            'api': 'Python'
+        }, status_code=201)
+
+    except Exception as e:
+        logger.error(f"Error al guardar metadata: {e}")
+        return FlaskJSONResponse({
+            'error': 'Error al guardar metadata',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def get_metadata(request):
+    """Obtener todos los metadatos"""
+    try:
+        conn = await acquire()
+        if not conn:
+            return db_error()
+
+        try:
+            records = await conn.fetch('SELECT * FROM fase2.metadata ORDER BY id')
+        finally:
+            await db_pool.release(conn)
+
+        return records_response(records)
+
+    except Exception as e:
+        logger.error(f"Error al obtener metadata: {e}")
+        return FlaskJSONResponse({
+            'error': 'Error al obtener metadata',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def compute_stats(start, end, api):
+    """Calcular todas las estadísticas en una sola pasada sobre monitoring_data"""
+    conditions, params = range_conditions('hora', start, end, api)
+    where = numbered_params(f"WHERE {' AND '.join(conditions)}") if conditions else ''
+
+    async with db_pool.acquire(timeout=POOL_TIMEOUT) as conn:
+        results = await conn.fetchrow(f"""
+            SELECT
+                COUNT(*),
+                (SELECT COUNT(*) FROM fase2.metadata),
+                AVG(porcentaje_cpu_uso),
+                AVG(porcentaje_ram),
+                MAX(porcentaje_cpu_uso),
+                MAX(porcentaje_ram),
+                COUNT(*) FILTER (WHERE api = 'Python')
+            FROM fase2.monitoring_data
+            {where}
+        """, *naive_utc(params))
+
+    return stats_from_row(results)
+
+
+async def get_stats(request):
+    """Obtener estadísticas básicas (una sola consulta, servida desde caché)"""
+    try:
+        args = request.query_params
+        try:
+            start = parse_datetime(args['from']) if args.get('from') else None
+            end = parse_datetime(args['to']) if args.get('to') else None
+        except ValueError as e:
+            return FlaskJSONResponse({'error': str(e)}, status_code=400)
+        api = args.get('api') or None
+
+        stats, age, cache_status = await stats_cache.get(
+            (start, end, api), lambda: compute_stats(start, end, api)
+        )
+
+        return FlaskJSONResponse({
+            **stats,
+            'filters': {
+                'from': start.isoformat() if start else None,
+                'to': end.isoformat() if end else None,
+                'api': api
+            },
+            'cache_age_seconds': round(age, 3),
+            'cache_status': cache_status
+        })
+
+    except Exception as e:
+        logger.error(f"Error al obtener estadísticas: {e}")
+        return FlaskJSONResponse({
+            'error': 'Error al obtener estadísticas',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def delete_all_monitoring_data(request):
+    """Limpiar todos los datos"""
+    try:
+        conn = await acquire()
+        if not conn:
+            return db_error()
+
+        try:
+            async with conn.transaction():
+                # Contar registros antes de eliminar
+                deleted_monitoring = await conn.fetchval('SELECT COUNT(*) FROM fase2.monitoring_data')
+                deleted_metadata = await conn.fetchval('SELECT COUNT(*) FROM fase2.metadata')
+
+                # Eliminar datos
+                await conn.execute('DELETE FROM fase2.monitoring_data')
+                await conn.execute('DELETE FROM fase2.metadata')
+
+                # Los rollups derivan de monitoring_data: se limpian con ella
+                if await conn.fetchval("SELECT to_regclass('fase2.monitoring_rollup')"):
+                    await conn.execute('DELETE FROM fase2.monitoring_rollup')
+        finally:
+            await db_pool.release(conn)
+
+        stats_cache.clear()
+
+        return FlaskJSONResponse({
+            'message': 'Datos eliminados exitosamente',
+            'deleted_monitoring_records': int(deleted_monitoring),
+            'deleted_metadata_records': int(deleted_metadata),
+            'api': 'Python'
+        })
+
+    except Exception as e:
+        logger.error(f"Error al eliminar datos: {e}")
+        return FlaskJSONResponse({
+            'error': 'Error al eliminar datos',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def test_connection(request):
+    """Probar conexión a la base de datos"""
+    try:
+        conn = await acquire()
+        if not conn:
+            return FlaskJSONResponse({
+                'error': 'No se pudo conectar a la base de datos'
+            }, status_code=500)
+
+        try:
+            version = await conn.fetchval('SELECT version()')
+            schema = await conn.fetchval('SELECT current_schema()')
+            tables = await conn.fetch('''
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = 'fase2'
+            ''')
+        finally:
+            await db_pool.release(conn)
+
+        return FlaskJSONResponse({
+            'message': 'Conexión exitosa',
+            'database_version': version,
+            'current_schema': schema,
+            'fase2_tables': [record['table_name'] for record in tables],
+            'api': 'Python'
+        })
+
+    except Exception as e:
+        logger.error(f"Error al probar conexión: {e}")
+        return FlaskJSONResponse({
+            'error': 'Error al probar conexión',
+            'details': str(e)
+        }, status_code=500)
+
+
+async def not_found(request, exc):
+    """Manejar rutas no encontradas"""
+    if exc.status_code == 405:
+        return FlaskJSONResponse({'error': 'Método no permitido', 'api': 'Python'}, status_code=405)
+    return FlaskJSONResponse({
+        'error': 'Endpoint no encontrado',
+        'api': 'Python'
+    }, status_code=404)
+
+
+async def internal_error(request, exc):
+    """Manejo de errores no controlados"""
+    logger.error(f'Error no manejado: {exc}')
+    return FlaskJSONResponse({
+        'error': 'Error interno del servidor',
+        'api': 'Python'
+    }, status_code=500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Crear el pool asyncpg al iniciar y cerrarlo al terminar"""
+    global db_pool
+    db_pool = await asyncpg.create_pool(
+        **DB_CONFIG,
+        **POOL_CONFIG,
+        # search_path se fija una vez por conexión al abrirla
+        server_settings={'search_path': 'fase2, public'}
+    )
+    try:
+        yield
+    finally:
+        await db_pool.close()
+
+
+routes = [
+    Route('/', home, methods=['GET']),
+    Route('/monitoring-data', create_monitoring_data, methods=['POST']),
+    Route('/monitoring-data', get_monitoring_data, methods=['GET']),
+    Route('/monitoring-data', delete_all_monitoring_data, methods=['DELETE']),
+    Route('/monitoring-data/{data_id:int}', get_monitoring_data_by_id, methods=['GET']),
+    Route('/monitoring-data/bulk', not_implemented_route, methods=['POST']),
+    Route('/monitoring-data/rollup', not_implemented_route, methods=['GET']),
+    Route('/monitoring-data/downsample', not_implemented_route, methods=['GET']),
+    Route('/monitoring-data/stream', not_implemented_route, methods=['GET']),
+    Route('/metadata', create_metadata, methods=['POST']),
+    Route('/metadata', get_metadata, methods=['GET']),
+    Route('/stats', get_stats, methods=['GET']),
+    Route('/test-connection', test_connection, methods=['GET']),
+    *(Route(path, not_implemented_route, methods=['GET'])
+      for path in ('/pool-stats', '/cache-stats', '/metrics', '/ingest-status', '/stream-status')),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'],
+                   allow_headers=['*'], expose_headers=['X-Next-Cursor', 'ETag', 'X-Cache'])
+    ],
+    exception_handlers={HTTPException: not_found, 500: internal_error},
+    lifespan=lifespan
+)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 8000))
+    print(f"🚀 Servidor ASGI (uvicorn) ejecutándose en puerto {port}")
+    print(f"📖 API disponible en: http://localhost:{port}")
+    print(f"🏊 Pool asyncpg: min={POOL_CONFIG['min_size']} max={POOL_CONFIG['max_size']}")
+
+    uvicorn.run(app, host='0.0.0.0', port=port, log_level='warning')
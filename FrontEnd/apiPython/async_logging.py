@@ -0,0 +1,217 @@
+"""
+Logging asíncrono, muestreado y opcionalmente en JSON
+
+Los handlers de la petición solo encolan el registro en una cola acotada; un
+hilo (QueueListener) lo formatea y lo escribe en stderr. Antes de encolar,
+los registros INFO/DEBUG pasan por muestreo y por un límite de registros por
+segundo por evento (el campo `event` de `extra`, o el nombre del logger).
+WARNING y superiores nunca se muestrean ni se descartan. configure_logging
+detiene el listener al salir del proceso (atexit), después de los demás
+handlers de salida, para escribir lo que quede en la cola.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(levelname)s:%(name)s:%(message)s'
+
+# Atributos estándar de LogRecord; el resto proviene de `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def parse_sample_rates(value):
+    """Leer 'evento=tasa,evento=tasa' (p. ej. 'monitoring_insert=0.01')"""
+    rates = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        event, _, rate = item.partition('=')
+        rates[event.strip()] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Muestreo y límite por segundo de los registros por debajo de WARNING"""
+
+    def __init__(self, sample_rate=1.0, event_rates=None, rate_limit=0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.event_rates = dict(event_rates or {})
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        # evento -> [tokens disponibles, último llenado]
+        self._buckets = {}
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+    def filter(self, record):
+        # Los registros de SampledLogger ya se muestrearon antes de crearse
+        if record.levelno >= logging.WARNING or getattr(record, '_sampled', False):
+            return True
+        return self.allow(getattr(record, 'event', None) or record.name)
+
+    def allow(self, event):
+        """Decidir si se conserva un registro INFO/DEBUG del evento"""
+        rate = self.event_rates.get(event, self.sample_rate)
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+
+        if self.rate_limit > 0:
+            now = time.monotonic()
+            with self._lock:
+                bucket = self._buckets.get(event)
+                if bucket is None:
+                    bucket = self._buckets[event] = [float(self.rate_limit), now]
+                bucket[0] = min(self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    self.rate_limited += 1
+                    return False
+                bucket[0] -= 1
+        return True
+
+
+class JSONLogFormatter(logging.Formatter):
+    """Una línea JSON por registro con los campos de `extra`"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Logger que decide el muestreo antes de crear el LogRecord (el paso más costoso)"""
+
+    def __init__(self, logger, sampling):
+        super().__init__(logger, {})
+        self.sampling = sampling
+
+    def process(self, msg, kwargs):
+        return msg, kwargs
+
+    def log(self, level, msg, *args, **kwargs):
+        if level < logging.WARNING:
+            if not self.isEnabledFor(level):
+                return
+            extra = kwargs.get('extra') or {}
+            if not self.sampling.allow(extra.get('event') or self.logger.name):
+                return
+            kwargs['extra'] = {**extra, '_sampled': True}
+        self.logger.log(level, msg, *args, **kwargs)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Encola el registro sin formatearlo; si la cola está llena descarta INFO/DEBUG"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # El formateo ocurre en el hilo del listener; solo se fija el traceback
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+    def enqueue(self, record):
+        if record.levelno >= logging.WARNING:
+            # Los errores no se pierden: se espera a que haya espacio
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Con la cola llena put_nowait fallaría y el hilo no terminaría
+        self.queue.put(self._sentinel)
+
+
+class AsyncLogging:
+    """Handler en cola, listener en segundo plano y contadores de descartes"""
+
+    def __init__(self, level='INFO', log_format='text', queue_size=10000,
+                 sample_rate=1.0, event_rates=None, rate_limit=0, stream=None):
+        if log_format not in ('text', 'json'):
+            raise ValueError(f"Formato de log no soportado: {log_format}")
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JSONLogFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.sampling = SamplingFilter(sample_rate, event_rates, rate_limit)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(self.sampling)
+        self.listener = _Listener(self.queue, output, respect_handler_level=False)
+        self.level = level
+        self.log_format = log_format
+        self._started = False
+
+    def start(self):
+        """Reemplazar los handlers del logger raíz e iniciar el hilo escritor"""
+        # Ningún formato usa archivo/línea ni datos de proceso: evitar calcularlos
+        # por registro (optimizaciones descritas en la documentación de logging)
+        logging._srcfile = None
+        logging.logMultiprocessing = False
+        logging.logProcesses = False
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.listener.start()
+        self._started = True
+        return self
+
+    def stop(self):
+        """Escribir lo pendiente y detener el hilo escritor"""
+        if self._started:
+            self._started = False
+            self.listener.stop()
+
+    def get_logger(self, name):
+        """Logger con muestreo previo a la creación del registro"""
+        return SampledLogger(logging.getLogger(name), self.sampling)
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'sampled_out': self.sampling.sampled_out,
+            'rate_limited': self.sampling.rate_limited,
+            'dropped_queue_full': self.handler.dropped,
+        }
+
+
+def configure_logging(level='INFO', log_format='text', queue_size=10000,
+                      sample_rate=1.0, event_rates=None, rate_limit=0):
+    """Configurar el logging asíncrono del proceso y devolver su controlador"""
+    control = AsyncLogging(level, log_format, queue_size, sample_rate, event_rates, rate_limit).start()
+    # atexit ejecuta en orden inverso: los handlers registrados después (vaciar el
+    # buffer de ingesta, detener el listener de NOTIFY) todavía pueden registrar
+    atexit.register(control.stop)
+    return control
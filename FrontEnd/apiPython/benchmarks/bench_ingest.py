@@ -0,0 +1,465 @@
+"""
+Benchmark de ingesta y consulta de app.py contra PostgreSQL local
+
+Levanta la API (python app.py) en un subproceso contra una base local, crea
+el esquema fase2 con init.sql si falta, carga `--rows` registros sintéticos
+y recorre cada escenario con varios niveles de concurrencia (hilos con
+conexiones HTTP persistentes):
+
+- post: POST /monitoring-data con una muestra por petición
+- get: GET /monitoring-data paginado (limit/skip sobre las primeras páginas)
+- stats: GET /stats
+
+Por escenario y concurrencia reporta throughput, latencia (p50/p90/p99),
+errores, CPU de la API por petición y viajes a la base por petición (execute,
+COPY y commits contados en /metrics, que debe estar habilitado). Los
+resultados se guardan en JSON junto al commit y la configuración para
+comparar ejecuciones con --baseline.
+
+Con --temp-db se usa una instancia desechable de PostgreSQL creada con
+pgserver (pip install pgserver); sin ella se usan las variables DB_* con
+localhost por defecto. Los registros se insertan en la base configurada:
+no apuntar a la base de producción.
+
+Uso:
+    python benchmarks/bench_ingest.py --temp-db [--concurrency 1,8,32] [--duration 10]
+    python benchmarks/bench_ingest.py --env INGEST_MODE=buffered --baseline benchmarks/results/<anterior>.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SCENARIOS = ('post', 'get', 'stats')
+PAGE_SIZE = 100
+
+COLUMNS = (
+    'total_ram', 'ram_libre', 'uso_ram', 'porcentaje_ram', 'porcentaje_cpu_uso', 'porcentaje_cpu_libre',
+    'procesos_corriendo', 'total_procesos', 'procesos_durmiendo', 'procesos_zombie', 'procesos_parados',
+    'hora', 'timestamp_received', 'api',
+)
+
+# Variables de la API durante el benchmark (se pueden reemplazar con --env)
+API_ENV_DEFAULTS = {
+    'METRICS_ENABLED': 'true',
+    # Los rollups consultan la base en segundo plano y ensucian el conteo de viajes
+    'ROLLUP_ENABLED': 'false',
+}
+
+_COUNT_RE = re.compile(r'^(db_query_duration_seconds_count|db_commit_duration_seconds_count)(?:\{operation="(\w+)"\})? (\S+)$')
+
+
+def sample_record(rng, when):
+    """Muestra sintética con la forma de la captura de la fase 1"""
+    total = 16 * 1024 * 1024
+    uso = int(total * rng.uniform(0.2, 0.9))
+    cpu = round(rng.uniform(0, 100))
+    corriendo, zombie, parados = rng.randint(1, 8), rng.randint(0, 2), rng.randint(0, 2)
+    total_procesos = rng.randint(250, 400)
+    return {
+        'total_ram': total,
+        'ram_libre': total - uso,
+        'uso_ram': uso,
+        'porcentaje_ram': round(uso * 100 / total),
+        'porcentaje_cpu_uso': cpu,
+        'porcentaje_cpu_libre': 100 - cpu,
+        'procesos_corriendo': corriendo,
+        'total_procesos': total_procesos,
+        'procesos_durmiendo': total_procesos - corriendo - zombie - parados,
+        'procesos_zombie': zombie,
+        'procesos_parados': parados,
+        'hora': when.strftime('%Y-%m-%d %H:%M:%S'),
+        'timestamp_received': when.isoformat(),
+    }
+
+
+# Base de datos
+
+def db_config():
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'database': os.getenv('DB_NAME', 'monitoring-metrics'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'port': os.getenv('DB_PORT', '5432'),
+    }
+
+
+def start_temp_db(directory):
+    """Instancia desechable de PostgreSQL; devuelve (servidor, configuración)"""
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("--temp-db requiere pgserver (pip install pgserver)")
+    server = pgserver.get_server(directory, cleanup_mode='delete')
+    config = {'host': directory, 'database': 'postgres', 'user': 'postgres', 'password': '', 'port': '5432'}
+    return server, config
+
+
+def prepare_database(config, rows, reset, seed):
+    """Crear el esquema con init.sql y completar `rows` registros"""
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            if reset:
+                cursor.execute('DROP SCHEMA IF EXISTS fase2 CASCADE')
+            cursor.execute('CREATE SCHEMA IF NOT EXISTS fase2')
+            cursor.execute('SET search_path TO fase2')
+            with open(os.path.join(API_DIR, 'init.sql'), 'r', encoding='utf-8') as f:
+                cursor.execute(f.read())
+            cursor.execute('SELECT COUNT(*) FROM monitoring_data')
+            missing = rows - cursor.fetchone()[0]
+            if missing > 0:
+                rng = random.Random(seed)
+                started = datetime.now() - timedelta(seconds=missing)
+                values = []
+                for i in range(missing):
+                    record = sample_record(rng, started + timedelta(seconds=i))
+                    values.append(tuple(record[column] for column in COLUMNS[:-1]) + ('Python',))
+                execute_values(
+                    cursor,
+                    f"INSERT INTO monitoring_data ({', '.join(COLUMNS)}) VALUES %s",
+                    values, page_size=1000
+                )
+            cursor.execute('SELECT COUNT(*) FROM monitoring_data')
+            total = cursor.fetchone()[0]
+        conn.commit()
+        return total
+    finally:
+        conn.close()
+
+
+# API
+
+def start_api(port, config, overrides, log_path):
+    """Ejecutar app.py en un subproceso y esperar a que responda"""
+    env = dict(os.environ)
+    env.update(API_ENV_DEFAULTS)
+    env.update({
+        'PORT': str(port),
+        'DB_HOST': config['host'],
+        'DB_NAME': config['database'],
+        'DB_USER': config['user'],
+        'DB_PASSWORD': config['password'],
+        'DB_PORT': str(config['port']),
+    })
+    env.update(overrides)
+    log = open(log_path, 'ab') if log_path else subprocess.DEVNULL
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=API_DIR, env=env, stdout=log, stderr=log)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"La API terminó al iniciar (código {process.returncode}); usar --api-log para ver el error")
+        try:
+            status, _ = request('127.0.0.1', port, 'GET', '/')
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    sys.exit("La API no respondió en 30 s")
+
+
+def stop_api(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def request(host, port, method, path, body=None):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        conn.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def db_round_trips(host, port):
+    """Conteo acumulado de execute/COPY por operación y de commits según /metrics"""
+    status, body = request(host, port, 'GET', '/metrics')
+    if status != 200:
+        return None
+    counts = {}
+    for line in body.decode('utf-8').splitlines():
+        match = _COUNT_RE.match(line)
+        if match:
+            key = 'COMMIT' if match.group(1).startswith('db_commit') else match.group(2)
+            counts[key] = counts.get(key, 0) + float(match.group(3))
+    return counts
+
+
+def process_cpu_seconds(pid):
+    """CPU (usuario + sistema) de un proceso según /proc; None si no está disponible"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+# Carga
+
+def request_factory(scenario, rows, pages, seed):
+    """Función (rng) -> (método, ruta, cuerpo) de cada escenario"""
+    if scenario == 'post':
+        return lambda rng: ('POST', '/monitoring-data', json.dumps(sample_record(rng, datetime.now())).encode())
+    if scenario == 'get':
+        pages = max(1, min(pages, rows // PAGE_SIZE))
+        return lambda rng: ('GET', f"/monitoring-data?limit={PAGE_SIZE}&skip={rng.randrange(pages) * PAGE_SIZE}", None)
+    return lambda rng: ('GET', '/stats', None)
+
+
+def drive(host, port, make_request, concurrency, duration, seed):
+    """Enviar peticiones desde `concurrency` hilos durante `duration` segundos"""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        own = latencies[index]
+        while time.perf_counter() < deadline:
+            method, path, body = make_request(rng)
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body,
+                             headers={'Content-Type': 'application/json'} if body else {})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors[index] += 1
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                conn.close()
+            own.append(time.perf_counter() - started)
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return sorted(value for own in latencies for value in own), sum(errors), elapsed
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_level(host, port, api_pid, scenario, make_request, concurrency, args):
+    """Medir un escenario con una concurrencia (después de un calentamiento)"""
+    if args.warmup > 0:
+        drive(host, port, make_request, concurrency, args.warmup, args.seed)
+
+    trips_before = db_round_trips(host, port)
+    cpu_before = process_cpu_seconds(api_pid) if api_pid else None
+    latencies, errors, elapsed = drive(host, port, make_request, concurrency, args.duration, args.seed)
+    cpu_after = process_cpu_seconds(api_pid) if api_pid else None
+    trips_after = db_round_trips(host, port)
+
+    total = len(latencies)
+    result = {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / total * 1000, 3) if total else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 3) if total else None,
+            'p90': round(percentile(latencies, 0.90) * 1000, 3) if total else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 3) if total else None,
+            'max': round(latencies[-1] * 1000, 3) if total else None,
+        },
+        'db_round_trips_per_request': None,
+        'db_operations_per_request': None,
+        'api_cpu_ms_per_request': None,
+    }
+    if trips_before is not None and trips_after is not None and total:
+        operations = {key: round((trips_after.get(key, 0) - trips_before.get(key, 0)) / total, 4)
+                      for key in sorted(set(trips_before) | set(trips_after))}
+        result['db_operations_per_request'] = {key: value for key, value in operations.items() if value}
+        result['db_round_trips_per_request'] = round(sum(operations.values()), 4)
+    if cpu_before is not None and cpu_after is not None and total:
+        result['api_cpu_ms_per_request'] = round((cpu_after - cpu_before) * 1000 / total, 3)
+    return result
+
+
+def print_result(result):
+    latency = result['latency_ms']
+    trips = result['db_round_trips_per_request']
+    cpu = result['api_cpu_ms_per_request']
+    print(f"{result['scenario']:<6} c={result['concurrency']:<4} {result['throughput_rps']:>9.1f} req/s  "
+          f"p50 {latency['p50'] or 0:8.2f} ms  p99 {latency['p99'] or 0:8.2f} ms  "
+          f"errores {result['errors']:<5} "
+          f"viajes/pet {trips if trips is not None else '-':<7} "
+          f"CPU API {cpu if cpu is not None else '-'} ms/pet")
+
+
+def compare(results, baseline_path):
+    """Cambio de throughput y p99 frente a un JSON anterior"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(item['scenario'], item['concurrency']): item for item in baseline.get('results', [])}
+    print(f"\nComparación con {baseline_path} (commit {baseline.get('commit')}):")
+    for result in results:
+        before = previous.get((result['scenario'], result['concurrency']))
+        if before is None:
+            continue
+
+        def change(new, old):
+            return f"{(new - old) / old * 100:+.1f}%" if new is not None and old else '-'
+
+        print(f"{result['scenario']:<6} c={result['concurrency']:<4} "
+              f"throughput {change(result['throughput_rps'], before['throughput_rps']):>8}  "
+              f"p99 {change(result['latency_ms']['p99'], before['latency_ms']['p99']):>8}  "
+              f"viajes/pet {before.get('db_round_trips_per_request')} -> {result['db_round_trips_per_request']}")
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=API_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no', '.'], cwd=API_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def parse_env(values):
+    overrides = {}
+    for value in values:
+        key, sep, val = value.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--env espera CLAVE=VALOR: {value}")
+        overrides[key] = val
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='Escenarios separados por comas: post, get, stats')
+    parser.add_argument('--concurrency', default='1,8,32', help='Niveles de concurrencia separados por comas')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos medidos por escenario y nivel')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Segundos de calentamiento descartados')
+    parser.add_argument('--rows', type=int, default=10000, help='Registros mínimos en la tabla antes de medir')
+    parser.add_argument('--pages', type=int, default=10, help='Páginas distintas que recorre el escenario get')
+    parser.add_argument('--seed', type=int, default=202201947)
+    parser.add_argument('--env', action='append', default=[], metavar='CLAVE=VALOR',
+                        help='Variable de entorno de la API (p. ej. INGEST_MODE=buffered); repetible')
+    parser.add_argument('--port', type=int, default=18000, help='Puerto de la API levantada por el benchmark')
+    parser.add_argument('--api-url', default=None,
+                        help='Usar una API ya levantada (sin CPU de la API) en vez de iniciar app.py')
+    parser.add_argument('--api-log', default=None, help='Archivo donde guardar la salida de la API')
+    parser.add_argument('--temp-db', action='store_true', help='Usar una instancia desechable de PostgreSQL (pgserver)')
+    parser.add_argument('--reset', action='store_true', help='Borrar y recrear el esquema fase2 antes de cargar')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados (por defecto benchmarks/results/)')
+    parser.add_argument('--baseline', default=None, help='JSON de una ejecución anterior para comparar')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+    overrides = parse_env(args.env)
+
+    temp_dir = server = process = None
+    try:
+        if args.temp_db:
+            temp_dir = tempfile.mkdtemp(prefix='bench_ingest_pg_')
+            server, config = start_temp_db(temp_dir)
+        else:
+            config = db_config()
+
+        rows = prepare_database(config, args.rows, args.reset or args.temp_db, args.seed)
+        print(f"Base: {config['host']}/{config['database']} con {rows} registros en fase2.monitoring_data")
+
+        if args.api_url:
+            url = urlsplit(args.api_url)
+            host, port, api_pid = url.hostname, url.port or 80, None
+        else:
+            process = start_api(args.port, config, overrides, args.api_log)
+            host, port, api_pid = '127.0.0.1', args.port, process.pid
+        if db_round_trips(host, port) is None:
+            print("⚠️  /metrics no está disponible (METRICS_ENABLED=false): no se cuentan los viajes a la base")
+
+        results = []
+        for scenario in scenarios:
+            make_request = request_factory(scenario, rows, args.pages, args.seed)
+            for concurrency in levels:
+                result = run_level(host, port, api_pid, scenario, make_request, concurrency, args)
+                print_result(result)
+                results.append(result)
+    finally:
+        if process is not None:
+            stop_api(process)
+        if server is not None:
+            server.cleanup()
+
+    commit, dirty = git_commit()
+    report = {
+        'benchmark': 'ingest',
+        'commit': commit,
+        'dirty': dirty,
+        'generated_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'config': {
+            'scenarios': scenarios,
+            'concurrency': levels,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'rows': rows,
+            'pages': args.pages,
+            'page_size': PAGE_SIZE,
+            'api_url': args.api_url,
+            'api_env': {**API_ENV_DEFAULTS, **overrides} if not args.api_url else overrides,
+            'temp_db': args.temp_db,
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"ingest_{commit or 'sin_commit'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark de serialización JSON de GET /monitoring-data?limit=1000
+
+Ejecuta la petición dentro del proceso (cliente de pruebas de Flask) con cada
+backend de json_backends.py y con la implementación anterior (RealDictCursor +
+jsonify de Flask), y reporta la latencia (p50/p95) y el CPU de la API por
+petición. El CPU de PostgreSQL no se cuenta porque corre en otro proceso.
+
+Requiere la base de datos configurada con las variables DB_* y al menos
+`limit` registros en fase2.monitoring_data (p. ej. cargados con
+POST /monitoring-data/bulk).
+
+Uso:
+    python benchmarks/bench_json.py [--requests N] [--limit 1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import jsonify  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from psycopg2.extras import RealDictCursor  # noqa: E402
+
+import app as api  # noqa: E402
+from json_backends import BackendJSONProvider, get_json_backend  # noqa: E402
+
+BACKENDS = [
+    ('json', 'http'),
+    ('orjson', 'http'),
+    ('orjson', 'iso'),
+]
+
+
+@api.app.route('/bench/realdict', methods=['GET'])
+def previous_implementation():
+    """Implementación anterior del handler: RealDictCursor + jsonify"""
+    conn = api.get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(
+                'SELECT * FROM fase2.monitoring_data ORDER BY id DESC LIMIT %s',
+                (int(api.request.args.get('limit', 100)),)
+            )
+            return jsonify(cursor.fetchall())
+    finally:
+        api.release_db_connection(conn)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(name, client, url, requests):
+    """Latencia y CPU por petición (se descarta una petición de calentamiento)"""
+    response = client.get(url)
+    assert response.status_code == 200, response.data[:200]
+    size = len(response.data)
+
+    latencies = []
+    cpu_started = time.process_time()
+    for _ in range(requests):
+        started = time.perf_counter()
+        client.get(url)
+        latencies.append(time.perf_counter() - started)
+    cpu = (time.process_time() - cpu_started) / requests
+
+    print(f"{name:<28} p50 {percentile(latencies, 0.5) * 1e3:7.2f} ms  "
+          f"p95 {percentile(latencies, 0.95) * 1e3:7.2f} ms  "
+          f"CPU {cpu * 1e3:7.2f} ms/petición  {size / 1024:8.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    client = api.app.test_client()
+    url = f"/monitoring-data?limit={args.limit}"
+
+    api.app.json = DefaultJSONProvider(api.app)
+    measure('anterior (RealDictCursor)', client, f"/bench/realdict?limit={args.limit}", args.requests)
+
+    for backend, datetime_format in BACKENDS:
+        api.app.json = BackendJSONProvider(api.app, get_json_backend(backend, datetime_format))
+        measure(f"{backend} (fechas {datetime_format})", client, url, args.requests)
+
+
+if __name__ == '__main__':
+    main()
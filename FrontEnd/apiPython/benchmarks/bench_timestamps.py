@@ -0,0 +1,74 @@
+"""
+Micro-benchmark del parseo de fechas de las muestras
+
+Compara parse_datetime (función general) con TimestampParser sobre las fechas
+`hora` y `timestamp_received` de la captura de la fase 1 y reporta parseos
+por segundo.
+
+Uso:
+    python benchmarks/bench_timestamps.py [ruta_captura.json] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from timestamps import TimestampParser, parse_datetime  # noqa: E402
+
+DEFAULT_CAPTURE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'Locust', 'locust_output_202201947.json'
+)
+
+
+def load_samples(path):
+    """Pares (campo, valor) en el orden en que llegan a la API"""
+    with open(path, 'r', encoding='utf-8') as f:
+        records = json.load(f)['data']
+    return [(field, record[field]) for record in records for field in ('hora', 'timestamp_received')]
+
+
+def run(name, parse, samples, repeat):
+    """Medir el mejor de `repeat` recorridos completos sobre las muestras"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for field, value in samples:
+            parse(value, field)
+        best = min(best, time.perf_counter() - started)
+    rate = len(samples) / best
+    print(f"{name:<28} {rate:>14,.0f} parseos/s  {best / len(samples) * 1e9:>8.1f} ns/parseo")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('capture', nargs='?', default=DEFAULT_CAPTURE)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    samples = load_samples(args.capture)
+    print(f"Muestras: {len(samples)} fechas de {args.capture}")
+
+    # Verificar que ambos parsers producen los mismos valores
+    fast = TimestampParser()
+    for field, value in samples:
+        assert fast.parse(value, field) == parse_datetime(value), value
+
+    baseline = run('parse_datetime', lambda value, field: parse_datetime(value), samples, args.repeat)
+    cached = run('TimestampParser', TimestampParser().parse, samples, args.repeat)
+
+    # timestamp_received no se repite entre muestras: solo actúa la caché de forma
+    received = [(field, value) for field, value in samples if field == 'timestamp_received']
+    baseline_unique = run('parse_datetime (únicos)', lambda value, field: parse_datetime(value), received, args.repeat)
+    shape_only = run('TimestampParser (únicos)', TimestampParser().parse, received, args.repeat)
+
+    print(f"Aceleración: {cached / baseline:.1f}x con valores repetidos, "
+          f"{shape_only / baseline_unique:.1f}x con valores únicos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark del costo por registro de la validación de muestras
+
+Compara la construcción anterior de la tupla (once data.get(..., 0) sin
+verificar tipos más parse_datetime) con el esquema compilado de
+validation.py, registro por registro y con validate_many sobre la lista.
+
+Uso:
+    python benchmarks/bench_validation.py [ruta_captura.json] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from timestamps import parse_datetime  # noqa: E402
+from validation import MONITORING_SAMPLE_SCHEMA  # noqa: E402
+
+DEFAULT_CAPTURE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'Locust', 'locust_output_202201947.json'
+)
+
+
+def legacy_values(data):
+    """Construcción previa de los valores, sin validación"""
+    return (
+        data.get('total_ram', 0),
+        data.get('ram_libre', 0),
+        data.get('uso_ram', 0),
+        data.get('porcentaje_ram', 0),
+        data.get('porcentaje_cpu_uso', 0),
+        data.get('porcentaje_cpu_libre', 0),
+        data.get('procesos_corriendo', 0),
+        data.get('total_procesos', 0),
+        data.get('procesos_durmiendo', 0),
+        data.get('procesos_zombie', 0),
+        data.get('procesos_parados', 0),
+        parse_datetime(data.get('hora', datetime.now().isoformat())),
+        parse_datetime(data.get('timestamp_received', datetime.now().isoformat())),
+        'Python'
+    )
+
+
+def measure(name, fn, repeat, count):
+    """Mejor de `repeat` ejecuciones de fn(); imprime ns y registros por segundo"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"{name:<34} {best / count * 1e9:>8.0f} ns/registro  {count / best:>12,.0f} registros/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('capture', nargs='?', default=DEFAULT_CAPTURE)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.capture, 'r', encoding='utf-8') as f:
+        records = json.load(f)['data']
+    print(f"Registros: {len(records)} de {args.capture}")
+
+    # El esquema produce los mismos valores que la construcción anterior
+    for record in records:
+        assert MONITORING_SAMPLE_SCHEMA(record) == legacy_values(record), record
+
+    validate = MONITORING_SAMPLE_SCHEMA
+    legacy = measure('anterior (sin validación)',
+                     lambda: [legacy_values(r) for r in records], args.repeat, len(records))
+    single = measure('esquema compilado (por registro)',
+                     lambda: [validate(r) for r in records], args.repeat, len(records))
+    many = measure('esquema compilado (validate_many)',
+                   lambda: validate.validate_many(records), args.repeat, len(records))
+
+    # Registros que requieren coerción (strings numéricos y floats)
+    coerced = [
+        {**r, 'porcentaje_ram': str(r['porcentaje_ram']), 'total_ram': float(r['total_ram'])}
+        for r in records
+    ]
+    measure('esquema compilado (con coerción)',
+            lambda: [validate(r) for r in coerced], args.repeat, len(coerced))
+
+    print(f"Relación esquema/anterior: {single / legacy:.2f}x por registro, {many / legacy:.2f}x en lista")
+
+
+if __name__ == '__main__':
+    main()
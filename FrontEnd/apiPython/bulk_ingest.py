@@ -0,0 +1,214 @@
+"""
+Ingesta masiva de registros de monitoreo
+
+Lee el cuerpo de la petición por bloques, sin cargarlo completo en memoria,
+y entrega los registros uno a uno. Se aceptan tres formatos:
+
+- Arreglo JSON: [{...}, {...}]
+- Archivo de la fase 1: {"metadata": {...}, "data": [{...}, ...]}
+- NDJSON (Content-Type application/x-ndjson): un objeto JSON por línea
+
+Las filas válidas se cargan con COPY en lotes. COPY no pasa por el INSERT de
+POST /monitoring-data: las filas no reciben clave de idempotencia (no se
+deduplican) ni se publican en /monitoring-data/stream.
+"""
+
+import codecs
+import csv
+import io
+import json
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+_WHITESPACE = ' \t\n\r'
+
+# Un literal o número cortado por el fin del bloque da un error en sus últimos
+# caracteres que desaparece al leer el siguiente; antes de esa holgura el error es definitivo
+_TRUNCATION_MARGIN = 16
+
+# Bloques (de al menos 64 KiB) que puede ocupar un solo elemento antes de darlo por inválido
+MAX_VALUE_CHUNKS = 16
+
+
+class BulkFormatError(ValueError):
+    """El cuerpo no tiene un formato JSON/NDJSON válido"""
+
+
+class _StreamReader:
+    """Buffer de texto incremental sobre un stream binario"""
+
+    def __init__(self, stream, chunk_size=65536):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_value_size = max(chunk_size, 65536) * MAX_VALUE_CHUNKS
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Leer otro bloque del stream; devuelve False al llegar al final"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self.decoder.decode(b'', final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Primer carácter no blanco sin consumirlo ('' al final del stream)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        """Consumir el carácter esperado o fallar"""
+        found = self.peek()
+        if found != char:
+            raise BulkFormatError(f"Se esperaba '{char}' y se encontró '{found or 'EOF'}'")
+        self.pos += 1
+
+    def value(self, decoder=json.JSONDecoder()):
+        """Decodificar el siguiente valor JSON completo
+
+        Falla sin leer el resto del cuerpo si el error está antes del final del
+        buffer (más bloques no lo corrigen) o si el valor supera max_value_size."""
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.buf, self.pos)
+                # Un número al final del buffer podría continuar en el siguiente bloque
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError as e:
+                # Una cadena sin cerrar señala su inicio: puede cerrarse en otro bloque
+                truncated = e.pos >= len(self.buf) - _TRUNCATION_MARGIN or e.msg.startswith('Unterminated string')
+                if self.eof or not truncated:
+                    raise BulkFormatError(f"JSON inválido: {e}")
+            if len(self.buf) - self.pos > self.max_value_size:
+                raise BulkFormatError(f"Elemento de más de {self.max_value_size} caracteres")
+            self.fill()
+
+    def lines(self):
+        """Iterar líneas completas del stream
+
+        Una línea sin '\n' de más de max_value_size falla sin leer el resto del cuerpo."""
+        while True:
+            newline = self.buf.find('\n', self.pos)
+            if newline >= 0:
+                line = self.buf[self.pos:newline]
+                self.pos = newline + 1
+                yield line
+            elif len(self.buf) - self.pos > self.max_value_size:
+                raise BulkFormatError(f"Línea de más de {self.max_value_size} caracteres")
+            elif not self.fill():
+                if self.pos < len(self.buf):
+                    line = self.buf[self.pos:]
+                    self.pos = len(self.buf)
+                    yield line
+                return
+
+
+def _iter_array(reader):
+    """Iterar los elementos de un arreglo JSON ya posicionado en '['"""
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+    while True:
+        try:
+            element = reader.value()
+        except BulkFormatError as e:
+            # Se reporta como error del elemento; el resto del arreglo no se puede delimitar
+            yield e
+            raise
+        yield element
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise BulkFormatError(f"Se esperaba ',' o ']' y se encontró '{separator or 'EOF'}'")
+
+
+def _iter_wrapper(reader):
+    """Iterar el arreglo 'data' de un objeto con el formato de la fase 1"""
+    reader.expect('{')
+    found_data = False
+    while reader.peek() != '}':
+        key = reader.value()
+        reader.expect(':')
+        if key == 'data' and reader.peek() == '[':
+            found_data = True
+            yield from _iter_array(reader)
+        else:
+            # metadata u otros campos: se descartan
+            reader.value()
+        if reader.peek() == ',':
+            reader.pos += 1
+    reader.expect('}')
+    if not found_data:
+        raise BulkFormatError("El objeto no contiene un arreglo 'data'")
+
+
+def iter_bulk_records(stream, content_type='', chunk_size=65536):
+    """
+    Iterar (índice, registro) del cuerpo de la petición.
+
+    En NDJSON una línea inválida se entrega como (índice, BulkFormatError) y la
+    lectura continúa; en JSON un elemento inválido se entrega igual y luego la
+    lectura se detiene con BulkFormatError.
+    """
+    reader = _StreamReader(stream, chunk_size)
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+
+    if mimetype in NDJSON_CONTENT_TYPES:
+        index = 0
+        for line in reader.lines():
+            if not line.strip():
+                continue
+            try:
+                yield index, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield index, BulkFormatError(f"JSON inválido: {e}")
+            index += 1
+        return
+
+    first = reader.peek()
+    if first == '[':
+        records = _iter_array(reader)
+    elif first == '{':
+        records = _iter_wrapper(reader)
+    else:
+        raise BulkFormatError('Se esperaba un arreglo JSON, un objeto con "data" o NDJSON')
+
+    for index, record in enumerate(records):
+        yield index, record
+
+    if reader.peek() != '':
+        raise BulkFormatError('Contenido adicional después del JSON')
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Cargar filas con COPY ... FROM STDIN en formato CSV"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row
+        )
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
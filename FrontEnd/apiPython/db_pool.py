@@ -0,0 +1,300 @@
+"""
+Pool de conexiones PostgreSQL para la API de persistencia (Python/Flask)
+
+Reutiliza conexiones entre peticiones en lugar de abrir una nueva por cada
+request: el search_path se establece una sola vez por conexión, las conexiones
+se verifican periódicamente y se reciclan después de N usos o de un tiempo
+de inactividad. Al devolver una conexión también se cierran las inactivas
+vencidas: con reutilización LIFO las más antiguas podrían no volver a tomarse.
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """No se obtuvo una conexión libre dentro del tiempo de espera"""
+
+
+class _PooledEntry:
+    """Conexión física junto con sus datos de uso"""
+
+    __slots__ = ('conn', 'created_at', 'last_used', 'last_checked', 'uses')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.last_checked = now
+        self.uses = 0
+
+
+class PostgresConnectionPool:
+    """Pool de conexiones thread-safe con reciclaje y health checks"""
+
+    def __init__(self, db_config, min_size=1, max_size=10, max_uses=5000,
+                 max_idle_seconds=300, health_check_interval=30,
+                 acquire_timeout=10, search_path='fase2, public',
+                 connection_factory=None, on_connect=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Tamaño de pool inválido: min={min_size}, max={max_size}")
+
+        self.db_config = dict(db_config)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.search_path = search_path
+        # connection_factory de psycopg2 (p. ej. una conexión instrumentada) y
+        # callback con los segundos que tardó abrir cada conexión física
+        self.connection_factory = connection_factory
+        self.on_connect = on_connect
+
+        self._lock = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._opening = 0
+        self._closed = False
+
+        # Contadores para dimensionar el pool por réplica
+        self._counters = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'connections_recycled': 0,
+            'health_check_failures': 0,
+            'acquired': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # Ciclo de vida de conexiones físicas
+
+    def _connect(self):
+        """Abrir una conexión física y establecer el search_path una sola vez"""
+        started = time.perf_counter()
+        if self.connection_factory is not None:
+            conn = psycopg2.connect(connection_factory=self.connection_factory, **self.db_config)
+        else:
+            conn = psycopg2.connect(**self.db_config)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SET search_path TO {self.search_path}")
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if self.on_connect is not None:
+            self.on_connect(time.perf_counter() - started)
+        return _PooledEntry(conn)
+
+    def _discard(self, entry, recycled=False):
+        """Cerrar una conexión física sin propagar errores"""
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._counters['connections_closed'] += 1
+            if recycled:
+                self._counters['connections_recycled'] += 1
+            self._lock.notify()
+
+    def _is_expired(self, entry, now):
+        """Indica si la conexión debe reciclarse por usos o inactividad"""
+        if self.max_uses and entry.uses >= self.max_uses:
+            return True
+        if self.max_idle_seconds and now - entry.last_used > self.max_idle_seconds:
+            return True
+        return False
+
+    def _take_expired_idle(self, now):
+        """Quitar de la cola las inactivas vencidas sin bajar de min_size (con el lock tomado)"""
+        expired = []
+        if not self.max_idle_seconds:
+            return expired
+        total = len(self._idle) + len(self._in_use) + self._opening
+        # Las más antiguas están al principio de la cola
+        while self._idle and total - len(expired) > self.min_size:
+            if now - self._idle[0].last_used <= self.max_idle_seconds:
+                break
+            expired.append(self._idle.popleft())
+        return expired
+
+    def _is_healthy(self, entry, now):
+        """Verificar la conexión con SELECT 1 si pasó el intervalo de chequeo"""
+        if entry.conn.closed:
+            return False
+        if now - entry.last_checked < self.health_check_interval:
+            return True
+        try:
+            with entry.conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            entry.conn.rollback()
+            entry.last_checked = now
+            return True
+        except Exception as e:
+            logger.warning(f"Conexión del pool descartada por health check: {e}")
+            with self._lock:
+                self._counters['health_check_failures'] += 1
+            return False
+
+    # API pública
+
+    def warmup(self):
+        """Abrir conexiones hasta alcanzar el tamaño mínimo del pool"""
+        while True:
+            with self._lock:
+                total = len(self._idle) + len(self._in_use) + self._opening
+                if self._closed or total >= self.min_size:
+                    return
+                self._opening += 1
+            try:
+                entry = self._connect()
+            except Exception:
+                with self._lock:
+                    self._opening -= 1
+                raise
+            with self._lock:
+                self._opening -= 1
+                self._counters['connections_opened'] += 1
+                self._idle.append(entry)
+                self._lock.notify()
+
+    def getconn(self, timeout=None):
+        """Obtener una conexión del pool, esperando hasta `timeout` segundos"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            entry = None
+            must_open = False
+
+            with self._lock:
+                if self._closed:
+                    raise psycopg2.InterfaceError('El pool de conexiones está cerrado')
+
+                if self._idle:
+                    # LIFO: reutilizar primero la conexión más reciente
+                    entry = self._idle.pop()
+                elif len(self._in_use) + self._opening < self.max_size:
+                    self._opening += 1
+                    must_open = True
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"Sin conexiones libres tras {timeout}s (max={self.max_size})"
+                        )
+                    if not waited:
+                        waited = True
+                        self._counters['waits'] += 1
+                    self._lock.wait(remaining)
+                    continue
+
+            if must_open:
+                try:
+                    entry = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opening -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._opening -= 1
+                    self._counters['connections_opened'] += 1
+            else:
+                now = time.monotonic()
+                if self._is_expired(entry, now):
+                    self._discard(entry, recycled=True)
+                    continue
+                if not self._is_healthy(entry, now):
+                    self._discard(entry)
+                    continue
+
+            with self._lock:
+                entry.uses += 1
+                self._in_use[id(entry.conn)] = entry
+                self._counters['acquired'] += 1
+                wait_time = time.monotonic() - started
+                if waited:
+                    self._wait_total += wait_time
+                    self._wait_max = max(self._wait_max, wait_time)
+            return entry.conn
+
+    def putconn(self, conn, discard=False):
+        """Devolver una conexión al pool; se descarta si quedó en mal estado"""
+        with self._lock:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            # Conexión ajena al pool: simplemente cerrarla
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+
+        if discard or self._closed or conn.closed:
+            self._discard(entry)
+            return
+
+        try:
+            # No dejar transacciones abiertas entre peticiones
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+
+        entry.last_used = time.monotonic()
+        if self._is_expired(entry, entry.last_used):
+            self._discard(entry, recycled=True)
+            return
+
+        with self._lock:
+            self._idle.append(entry)
+            expired = self._take_expired_idle(entry.last_used)
+            self._lock.notify()
+        for stale in expired:
+            self._discard(stale, recycled=True)
+
+    def closeall(self):
+        """Cerrar todas las conexiones inactivas y marcar el pool como cerrado"""
+        with self._lock:
+            self._closed = True
+            entries = list(self._idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for entry in entries:
+            self._discard(entry)
+
+    def stats(self):
+        """Estadísticas del pool: conexiones en uso, inactivas y tiempos de espera"""
+        with self._lock:
+            waits = self._counters['waits']
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'opening': self._opening,
+                'total': len(self._in_use) + len(self._idle) + self._opening,
+                'avg_wait_ms': round(self._wait_total / waits * 1000, 3) if waits else 0.0,
+                'max_wait_ms': round(self._wait_max * 1000, 3),
+                **self._counters,
+            }
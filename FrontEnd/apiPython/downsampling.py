@@ -0,0 +1,196 @@
+"""
+Reducción de series de monitoreo para gráficas (LTTB y mínimo/máximo por bucket)
+
+Las filas llegan ordenadas por tiempo y por bloques desde un cursor del lado
+del servidor como (bucket, epoch, valor1, valor2, ...). Cada bloque se procesa
+con numpy sobre arreglos por columna y solo se conserva la serie reducida, así
+la memoria depende de los puntos pedidos y no de las filas del rango.
+
+- LTTB (Largest-Triangle-Three-Buckets): en cada bucket se elige, por columna,
+  el punto que forma el triángulo de mayor área con el punto elegido en el
+  bucket anterior y el promedio del bucket siguiente (calculado antes en SQL).
+- minmax: el mínimo y el máximo de cada columna por bucket, en orden temporal.
+- raw: todas las filas, cuando el rango tiene menos filas que puntos pedidos.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+
+class _Reducer(ABC):
+    """Separar cada bloque por bucket y acumular la serie de salida por columna"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.rows = 0
+        self._times = [[] for _ in self.columns]
+        self._values = [[] for _ in self.columns]
+
+    def feed(self, rows):
+        """Procesar un bloque de filas (bucket, epoch, valores...)"""
+        if not rows:
+            return
+        block = np.asarray(rows, dtype=np.float64)
+        self.rows += len(block)
+        buckets = block[:, 0]
+        # Las filas vienen ordenadas por tiempo: cada bucket es un tramo contiguo
+        bounds = np.flatnonzero(np.diff(buckets)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(block)]))
+        for start, end in zip(starts, ends):
+            self._segment(int(buckets[start]), block[start:end, 1], block[start:end, 2:])
+
+    @abstractmethod
+    def _segment(self, bucket, times, values):
+        """Procesar las filas de un bucket (tiempos y matriz de valores por columna)"""
+
+    def _finish(self):
+        pass
+
+    def _emit(self, column, time, value):
+        self._times[column].append(time)
+        self._values[column].append(value)
+
+    def result(self):
+        """Serie por columna: tiempos en milisegundos desde epoch y valores"""
+        self._finish()
+        return {
+            column: {
+                't': [int(round(time * 1000)) for time in self._times[index]],
+                'v': self._values[index]
+            }
+            for index, column in enumerate(self.columns)
+        }
+
+
+class RawReducer(_Reducer):
+    """Todas las filas, sin reducir"""
+
+    def _segment(self, bucket, times, values):
+        times = times.tolist()
+        for index in range(len(self.columns)):
+            self._times[index].extend(times)
+            self._values[index].extend(values[:, index].tolist())
+
+
+class LTTBReducer(_Reducer):
+    """LTTB por columna con buckets de tiempo
+
+    `averages` son filas (bucket, epoch_promedio, promedio1, ...) de los buckets
+    con datos y `last` la última fila del rango (epoch, valor1, ...), que cierra
+    la serie y hace de "siguiente" para el último bucket."""
+
+    def __init__(self, columns, averages, last):
+        super().__init__(columns)
+        self._last = (float(last[0]), np.asarray(last[1:], dtype=np.float64))
+        # Promedio del siguiente bucket con datos para cada bucket
+        self._next = {}
+        following = self._last
+        for row in reversed(averages):
+            self._next[int(row[0])] = following
+            following = (float(row[1]), np.asarray(row[2:], dtype=np.float64))
+        self._bucket = None
+        self._prev_time = None
+        self._prev_value = None
+        self._best_area = None
+        self._best_time = None
+        self._best_value = None
+
+    def _close_bucket(self):
+        if self._bucket is None:
+            return
+        for index in range(len(self.columns)):
+            self._emit(index, float(self._best_time[index]), float(self._best_value[index]))
+        self._prev_time = self._best_time
+        self._prev_value = self._best_value
+
+    def _segment(self, bucket, times, values):
+        count = len(self.columns)
+        if self._prev_time is None:
+            # La primera fila del rango abre la serie
+            self._prev_time = np.full(count, times[0])
+            self._prev_value = values[0].copy()
+            for index in range(count):
+                self._emit(index, float(times[0]), float(values[0, index]))
+            times, values = times[1:], values[1:]
+            if not len(times):
+                return
+
+        if bucket != self._bucket:
+            self._close_bucket()
+            self._bucket = bucket
+            self._best_area = np.full(count, -1.0)
+            self._best_time = np.zeros(count)
+            self._best_value = np.zeros(count)
+
+        next_time, next_value = self._next.get(bucket, self._last)
+        # Doble del área del triángulo (anterior, punto, siguiente) para cada punto y columna
+        area = np.abs(
+            (self._prev_time - next_time)[None, :] * (values - self._prev_value[None, :])
+            - (self._prev_time[None, :] - times[:, None]) * (next_value - self._prev_value)[None, :]
+        )
+        best = np.argmax(area, axis=0)
+        columns = np.arange(count)
+        candidate = area[best, columns]
+        better = candidate > self._best_area
+        self._best_area[better] = candidate[better]
+        self._best_time[better] = times[best][better]
+        self._best_value[better] = values[best, columns][better]
+
+    def _finish(self):
+        self._close_bucket()
+        self._bucket = None
+        if self._prev_time is None:
+            return
+        last_time, last_value = self._last
+        for index in range(len(self.columns)):
+            # La última fila puede ser la elegida en el último bucket
+            if self._times[index][-1] != last_time:
+                self._emit(index, last_time, float(last_value[index]))
+
+
+class MinMaxReducer(_Reducer):
+    """Mínimo y máximo de cada columna por bucket, en el orden en que ocurren"""
+
+    def __init__(self, columns):
+        super().__init__(columns)
+        self._bucket = None
+
+    def _close_bucket(self):
+        if self._bucket is None:
+            return
+        for index in range(len(self.columns)):
+            low = (float(self._min_time[index]), float(self._min_value[index]))
+            high = (float(self._max_time[index]), float(self._max_value[index]))
+            if low[0] == high[0]:
+                points = (low,)
+            else:
+                points = (low, high) if low[0] < high[0] else (high, low)
+            for time, value in points:
+                self._emit(index, time, value)
+
+    def _segment(self, bucket, times, values):
+        columns = np.arange(len(self.columns))
+        low = np.argmin(values, axis=0)
+        high = np.argmax(values, axis=0)
+        if bucket != self._bucket:
+            self._close_bucket()
+            self._bucket = bucket
+            self._min_time, self._min_value = times[low], values[low, columns]
+            self._max_time, self._max_value = times[high], values[high, columns]
+            return
+
+        # Ante empates se conserva el primero en el tiempo
+        lower = values[low, columns] < self._min_value
+        self._min_time = np.where(lower, times[low], self._min_time)
+        self._min_value = np.where(lower, values[low, columns], self._min_value)
+        higher = values[high, columns] > self._max_value
+        self._max_time = np.where(higher, times[high], self._max_time)
+        self._max_value = np.where(higher, values[high, columns], self._max_value)
+
+    def _finish(self):
+        self._close_bucket()
+        self._bucket = None
@@ -0,0 +1,172 @@
+"""
+Difusión de registros recién insertados a suscriptores SSE
+
+- EventHub: reparte cada lote de eventos (las filas de una inserción) a todos
+  los suscriptores del proceso; el lote se comparte, no se copia por cliente.
+  Cada suscriptor tiene una cola acotada de lotes pendientes; si se llena
+  (cliente lento) se le desconecta en lugar de bloquear la publicación o
+  acumular memoria sin límite.
+- NotifyListener: hilo con una conexión dedicada que hace LISTEN sobre un canal
+  de PostgreSQL y publica en el hub cada NOTIFY recibido. Como las inserciones
+  emiten el NOTIFY dentro de su transacción, todas las réplicas (incluida la
+  que insertó) reciben el registro solo cuando queda confirmado.
+"""
+
+import threading
+import select
+import logging
+import queue
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+
+class TooManySubscribersError(Exception):
+    """Se alcanzó el máximo de suscriptores simultáneos"""
+
+
+class Subscription:
+    """Cola acotada de un suscriptor; `dropped` indica que se quedó atrás"""
+
+    def __init__(self, max_batches):
+        self._queue = queue.Queue(maxsize=max_batches)
+        self.dropped = False
+
+    def get(self, timeout):
+        """Siguiente lote (primer id, [datos...]) o None si no llegó nada en `timeout` segundos"""
+        if self.dropped:
+            return None
+        try:
+            batch = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return None if self.dropped else batch
+
+
+class EventHub:
+    """Reparto en proceso de lotes de eventos a suscriptores con colas acotadas"""
+
+    def __init__(self, max_batches=100, max_subscribers=1000):
+        self.max_batches = max_batches
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._sequence = 0
+        self._counters = {'published': 0, 'delivered': 0, 'dropped_subscribers': 0}
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribersError(
+                    f"Máximo de {self.max_subscribers} suscriptores alcanzado"
+                )
+            subscription = Subscription(self.max_batches)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, data):
+        """Entregar `data` (texto JSON) a cada suscriptor sin bloquear"""
+        self.publish_many([data])
+
+    def publish_many(self, events):
+        """Entregar una lista de eventos como un solo lote; ids consecutivos"""
+        if not events:
+            return
+        with self._lock:
+            batch = (self._sequence + 1, list(events))
+            self._sequence += len(events)
+            self._counters['published'] += len(events)
+            for subscription in list(self._subscribers):
+                try:
+                    subscription._queue.put_nowait(batch)
+                    self._counters['delivered'] += len(events)
+                except queue.Full:
+                    # Cliente lento: se desconecta y reconecta por su cuenta
+                    subscription.dropped = True
+                    self._subscribers.discard(subscription)
+                    self._counters['dropped_subscribers'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'batches_per_subscriber': self.max_batches,
+                'last_event_id': self._sequence,
+                **self._counters
+            }
+
+
+class NotifyListener:
+    """Hilo que escucha un canal de PostgreSQL y publica cada NOTIFY en el hub"""
+
+    def __init__(self, hub, db_config, channel, transform=None, poll_interval=1.0, retry_interval=5.0):
+        self.hub = hub
+        self.db_config = db_config
+        self.channel = channel
+        # Convierte el payload del NOTIFY en el texto del evento
+        self.transform = transform
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.connected = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _listen(self):
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+            self.connected = True
+            logger.info(f"Escuchando NOTIFY en el canal {self.channel}")
+            while not self._stop_event.is_set():
+                if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    payloads = [notify.payload for notify in conn.notifies]
+                    conn.notifies.clear()
+                    self.hub.publish_many(self._events(payloads))
+        finally:
+            self.connected = False
+            conn.close()
+
+    def _events(self, payloads):
+        if self.transform is None:
+            return payloads
+        events = []
+        for payload in payloads:
+            try:
+                events.append(self.transform(payload))
+            except Exception as e:
+                logger.warning(f"NOTIFY ignorado en {self.channel}: {e}")
+        return events
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                # Los NOTIFY emitidos mientras no hay conexión se pierden
+                logger.error(f"Error escuchando NOTIFY en {self.channel}: {e}")
+                self._stop_event.wait(self.retry_interval)
+
+    def start(self):
+        """Iniciar el hilo de escucha si aún no está corriendo"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='notify-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
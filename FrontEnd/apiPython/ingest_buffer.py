@@ -0,0 +1,183 @@
+"""
+Buffer de escritura diferida (write-behind) para la ingesta de monitoreo
+
+Las muestras validadas se encolan en memoria y un hilo en segundo plano las
+inserta por lotes cuando se alcanza el tamaño máximo del lote o el tiempo
+máximo de espera. La cola es acotada: cuando está llena se rechazan nuevas
+muestras para no agotar la memoria.
+
+Un lote que falla se reintenta con espera exponencial; si se agotan los
+reintentos sus secuencias quedan registradas como fallidas. La última
+secuencia guardada solo avanza cuando el lote se confirmó.
+"""
+
+import threading
+import time
+import logging
+import queue
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFullError(Exception):
+    """La cola de ingesta alcanzó su capacidad máxima"""
+
+
+class WriteBehindBuffer:
+    """Cola acotada con un hilo que vacía lotes mediante `flush_fn(rows)`"""
+
+    def __init__(self, flush_fn, batch_size=500, flush_interval=0.05, max_queue=10000,
+                 max_retries=3, retry_backoff=0.2, max_failed_ranges=100):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._seq_lock = threading.Lock()
+        self._sequence = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._stats_lock = threading.Lock()
+        self._last_flushed_sequence = 0
+        self._flushed_rows = 0
+        self._failed_rows = 0
+        self._rejected_rows = 0
+        self._batches = 0
+        self._retries = 0
+        self._in_flight = 0
+        # Rangos [primera, última] de secuencias descartadas, los más recientes
+        self._failed_sequences = deque(maxlen=max_failed_ranges)
+
+    def start(self):
+        """Iniciar el hilo de vaciado si aún no está corriendo"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Encolar una fila y devolver su número de secuencia"""
+        if self._stop_event.is_set():
+            raise IngestQueueFullError('El buffer de ingesta se está deteniendo')
+        with self._seq_lock:
+            try:
+                self._queue.put_nowait((self._sequence + 1, row))
+            except queue.Full:
+                with self._stats_lock:
+                    self._rejected_rows += 1
+                raise IngestQueueFullError(
+                    f"Cola de ingesta llena ({self.max_queue} registros pendientes)"
+                )
+            self._sequence += 1
+            return self._sequence
+
+    def _collect_batch(self, first):
+        """Reunir un lote a partir del primer elemento hasta tamaño o tiempo límite"""
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        """Escribir un lote (con reintentos) y actualizar los contadores"""
+        rows = [row for _, row in batch]
+        first_sequence, last_sequence = batch[0][0], batch[-1][0]
+        with self._stats_lock:
+            self._in_flight = len(rows)
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self.flush_fn(rows)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Lote descartado tras {attempt + 1} intentos "
+                                     f"(secuencias {first_sequence}-{last_sequence}): {e}")
+                        with self._stats_lock:
+                            self._failed_rows += len(rows)
+                            self._failed_sequences.append([first_sequence, last_sequence])
+                        return
+                    delay = self.retry_backoff * 2 ** attempt
+                    logger.warning(f"Error al vaciar lote de {len(rows)} registros, reintento en {delay:.2f} s: {e}")
+                    with self._stats_lock:
+                        self._retries += 1
+                    time.sleep(delay)
+            with self._stats_lock:
+                self._flushed_rows += len(rows)
+                self._batches += 1
+                self._last_flushed_sequence = last_sequence
+        finally:
+            with self._stats_lock:
+                self._in_flight = 0
+
+    def _run(self):
+        """Bucle del hilo de vaciado"""
+        while not self._stop_event.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._flush(self._collect_batch(first))
+        self._drain()
+
+    def _drain(self):
+        """Vaciar todo lo pendiente en la cola"""
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return
+            self._flush(batch)
+
+    def stop(self, timeout=10):
+        """Detener el hilo vaciando antes los registros pendientes
+
+        Si el vaciado no termina en `timeout` segundos (base caída o lenta) se
+        registra cuántos registros quedan sin guardar."""
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        else:
+            self._drain()
+        stats = self.stats()
+        if self._thread and self._thread.is_alive():
+            logger.error(f"Buffer de ingesta detenido sin terminar de vaciar: "
+                         f"{stats['pending'] + stats['in_flight']} registros sin guardar")
+        logger.info(f"Buffer de ingesta detenido: {stats}")
+
+    def stats(self):
+        """Estado de la cola y contadores de vaciado"""
+        with self._stats_lock:
+            return {
+                'pending': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'batch_size': self.batch_size,
+                'flush_interval_ms': round(self.flush_interval * 1000, 3),
+                'last_sequence': self._sequence,
+                'last_flushed_sequence': self._last_flushed_sequence,
+                'in_flight': self._in_flight,
+                'flushed_rows': self._flushed_rows,
+                'failed_rows': self._failed_rows,
+                'failed_sequences': list(self._failed_sequences),
+                'rejected_rows': self._rejected_rows,
+                'batches': self._batches,
+                'retries': self._retries,
+            }
@@ -15,9 +15,13 @@ CREATE TABLE IF NOT EXISTS monitoring_data (
     hora TIMESTAMP NOT NULL,
     timestamp_received TIMESTAMP NOT NULL,
     api VARCHAR(50) DEFAULT 'Python',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    idempotency_key VARCHAR(64)
 );
 
+-- Tablas creadas antes de la ingesta idempotente
+ALTER TABLE monitoring_data ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+
 -- Crear tabla para metadata
 CREATE TABLE IF NOT EXISTS metadata (
     id SERIAL PRIMARY KEY,
@@ -33,7 +37,70 @@ CREATE TABLE IF NOT EXISTS metadata (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Rollups por minuto ('1m') y por hora ('1h') de monitoring_data, por api
+-- Para cada columna numérica: suma, mínimo, máximo y último valor del bucket
+CREATE TABLE IF NOT EXISTS monitoring_rollup (
+    bucket VARCHAR(4) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    api VARCHAR(50) NOT NULL,
+    sample_count INTEGER NOT NULL,
+    last_hora TIMESTAMP NOT NULL,
+    total_ram_sum BIGINT NOT NULL,
+    total_ram_min INTEGER NOT NULL,
+    total_ram_max INTEGER NOT NULL,
+    total_ram_last INTEGER NOT NULL,
+    ram_libre_sum BIGINT NOT NULL,
+    ram_libre_min INTEGER NOT NULL,
+    ram_libre_max INTEGER NOT NULL,
+    ram_libre_last INTEGER NOT NULL,
+    uso_ram_sum BIGINT NOT NULL,
+    uso_ram_min INTEGER NOT NULL,
+    uso_ram_max INTEGER NOT NULL,
+    uso_ram_last INTEGER NOT NULL,
+    porcentaje_ram_sum BIGINT NOT NULL,
+    porcentaje_ram_min INTEGER NOT NULL,
+    porcentaje_ram_max INTEGER NOT NULL,
+    porcentaje_ram_last INTEGER NOT NULL,
+    porcentaje_cpu_uso_sum BIGINT NOT NULL,
+    porcentaje_cpu_uso_min INTEGER NOT NULL,
+    porcentaje_cpu_uso_max INTEGER NOT NULL,
+    porcentaje_cpu_uso_last INTEGER NOT NULL,
+    porcentaje_cpu_libre_sum BIGINT NOT NULL,
+    porcentaje_cpu_libre_min INTEGER NOT NULL,
+    porcentaje_cpu_libre_max INTEGER NOT NULL,
+    porcentaje_cpu_libre_last INTEGER NOT NULL,
+    procesos_corriendo_sum BIGINT NOT NULL,
+    procesos_corriendo_min INTEGER NOT NULL,
+    procesos_corriendo_max INTEGER NOT NULL,
+    procesos_corriendo_last INTEGER NOT NULL,
+    total_procesos_sum BIGINT NOT NULL,
+    total_procesos_min INTEGER NOT NULL,
+    total_procesos_max INTEGER NOT NULL,
+    total_procesos_last INTEGER NOT NULL,
+    procesos_durmiendo_sum BIGINT NOT NULL,
+    procesos_durmiendo_min INTEGER NOT NULL,
+    procesos_durmiendo_max INTEGER NOT NULL,
+    procesos_durmiendo_last INTEGER NOT NULL,
+    procesos_zombie_sum BIGINT NOT NULL,
+    procesos_zombie_min INTEGER NOT NULL,
+    procesos_zombie_max INTEGER NOT NULL,
+    procesos_zombie_last INTEGER NOT NULL,
+    procesos_parados_sum BIGINT NOT NULL,
+    procesos_parados_min INTEGER NOT NULL,
+    procesos_parados_max INTEGER NOT NULL,
+    procesos_parados_last INTEGER NOT NULL,
+    PRIMARY KEY (bucket, bucket_start, api)
+);
+
+-- Último id de monitoring_data ya agregado en los rollups
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name VARCHAR(50) PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0
+);
+
 -- Crear índices para mejorar consultas
 CREATE INDEX IF NOT EXISTS idx_monitoring_data_hora ON monitoring_data(hora);
 CREATE INDEX IF NOT EXISTS idx_monitoring_data_timestamp ON monitoring_data(timestamp_received);
+-- Un registro por clave de idempotencia (las filas sin clave no se deduplican)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_monitoring_data_idempotency_key ON monitoring_data(idempotency_key);
 CREATE INDEX IF NOT EXISTS idx_metadata_collection_start ON metadata(collection_start);
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Serialización JSON de las respuestas de la API
+
+Dos backends intercambiables con la variable JSON_BACKEND:
+
+- json: módulo estándar, mismo formato que jsonify de Flask (claves ordenadas,
+  fechas en formato HTTP, ASCII).
+- orjson: serializador en C; con JSON_DATETIME_FORMAT=iso serializa las
+  fechas de forma nativa. Escapa lo que no es ASCII como jsonify; solo difiere
+  en los float con exponente (1e-07 frente a 1e-7), que la API no produce: las
+  columnas son INTEGER y los promedios de /stats se redondean a 2 decimales.
+
+Las listas de registros se serializan a partir de las tuplas del cursor y la
+lista de columnas (dumps_rows / dumps_lines), sin pasar por RealDictCursor.
+"""
+
+import dataclasses
+import json
+import logging
+import re
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from operator import itemgetter
+from uuid import UUID
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa el backend json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSON_BACKENDS = ('json', 'orjson')
+DATETIME_FORMATS = ('http', 'iso')
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = (None, 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+# Las páginas repiten muchas fechas (hora, timestamp_received y created_at)
+_http_date_cache = {}
+_HTTP_DATE_CACHE_SIZE = 8192
+
+
+def format_http_date(value):
+    """Fecha en formato HTTP (RFC 7231), igual que werkzeug.http.http_date"""
+    text = _http_date_cache.get(value)
+    if text is None:
+        moment = value
+        if isinstance(moment, datetime) and moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc)
+        if isinstance(moment, datetime):
+            clock = f"{moment.hour:02d}:{moment.minute:02d}:{moment.second:02d}"
+        else:
+            clock = '00:00:00'
+        text = (f"{_DAYS[moment.weekday()]}, {moment.day:02d} {_MONTHS[moment.month]} "
+                f"{moment.year:04d} {clock} GMT")
+        if len(_http_date_cache) >= _HTTP_DATE_CACHE_SIZE:
+            _http_date_cache.clear()
+        _http_date_cache[value] = text
+    return text
+
+
+_NON_ASCII = re.compile('[^\x00-\x7f]')
+
+
+def _escape_char(match):
+    code = ord(match.group())
+    if code < 0x10000:
+        return f'\\u{code:04x}'
+    # Fuera del plano básico: par sustituto, como json.dumps
+    code -= 0x10000
+    return f'\\u{0xd800 | code >> 10:04x}\\u{0xdc00 | code & 0x3ff:04x}'
+
+
+def escape_non_ascii(data):
+    """Escapar como \\uXXXX lo que no es ASCII (ensure_ascii de jsonify) en JSON UTF-8"""
+    if data.isascii():
+        return data
+    # Fuera de las cadenas JSON todo es ASCII: se puede reemplazar en todo el texto
+    return _NON_ASCII.sub(_escape_char, data.decode('utf-8')).encode('ascii')
+
+
+def row_mapper(columns):
+    """Función que convierte una tupla del cursor en dict con las claves ordenadas"""
+    keys = sorted(columns)
+    indexes = [list(columns).index(key) for key in keys]
+    if not indexes:
+        return lambda row: {}
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda row: {keys[0]: row[index]}
+    getter = itemgetter(*indexes)
+    return lambda row: dict(zip(keys, getter(row)))
+
+
+class JSONBackend:
+    """Backend con el módulo json estándar, compatible con jsonify de Flask"""
+
+    name = 'json'
+
+    def __init__(self, datetime_format='http'):
+        if datetime_format not in DATETIME_FORMATS:
+            raise ValueError(f"Formato de fecha no soportado: {datetime_format}")
+        self.datetime_format = datetime_format
+
+    def default(self, value):
+        """Tipos que el serializador no conoce (fechas de PostgreSQL, Decimal, UUID)"""
+        if isinstance(value, date):
+            if self.datetime_format == 'http':
+                return format_http_date(value)
+            return value.isoformat()
+        if isinstance(value, (Decimal, UUID)):
+            return str(value)
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            return dataclasses.asdict(value)
+        if hasattr(value, '__html__'):
+            return str(value.__html__())
+        raise TypeError(f"Objeto de tipo {type(value).__name__} no serializable a JSON")
+
+    def dumps(self, obj):
+        """Serializar a bytes (JSON compacto con claves ordenadas)"""
+        return json.dumps(obj, default=self.default, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps_rows(self, columns, rows):
+        """Serializar tuplas del cursor como arreglo JSON de objetos"""
+        to_dict = row_mapper(columns)
+        return self.dumps([to_dict(row) for row in rows])
+
+    def dumps_lines(self, columns, rows):
+        """Serializar tuplas del cursor como NDJSON (una línea por fila)"""
+        to_dict = row_mapper(columns)
+        dumps = self.dumps
+        return b''.join(dumps(to_dict(row)) + b'\n' for row in rows)
+
+
+class OrjsonBackend(JSONBackend):
+    """Backend con orjson"""
+
+    name = 'orjson'
+
+    def __init__(self, datetime_format='http'):
+        super().__init__(datetime_format)
+        self.option = orjson.OPT_SORT_KEYS
+        if datetime_format == 'http':
+            # orjson entrega las fechas a default() en lugar de escribirlas en ISO
+            self.option |= orjson.OPT_PASSTHROUGH_DATETIME
+        self._default = self._http_default if datetime_format == 'http' else self.default
+
+    def _http_default(self, value):
+        if type(value) is datetime:
+            return format_http_date(value)
+        return self.default(value)
+
+    def dumps(self, obj):
+        return escape_non_ascii(orjson.dumps(obj, default=self._default, option=self.option))
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps_rows(self, columns, rows):
+        # row_mapper ya ordena las claves: no hace falta OPT_SORT_KEYS
+        to_dict = row_mapper(columns)
+        return escape_non_ascii(orjson.dumps(
+            [to_dict(row) for row in rows],
+            default=self._default,
+            option=self.option & ~orjson.OPT_SORT_KEYS
+        ))
+
+    def dumps_lines(self, columns, rows):
+        to_dict = row_mapper(columns)
+        option = (self.option & ~orjson.OPT_SORT_KEYS) | orjson.OPT_APPEND_NEWLINE
+        default = self._default
+        return escape_non_ascii(b''.join(orjson.dumps(to_dict(row), default=default, option=option) for row in rows))
+
+
+class BackendJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que delega en un backend; jsonify y get_json lo usan"""
+
+    def __init__(self, app, backend, observer=None):
+        super().__init__(app)
+        self.backend = backend
+        # Callback opcional observer(segundos) con el tiempo de serialización
+        self.observer = observer
+
+    def _encode(self, encode, *args):
+        if self.observer is None:
+            return encode(*args)
+        started = time.perf_counter()
+        try:
+            return encode(*args)
+        finally:
+            self.observer(time.perf_counter() - started)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Opciones explícitas (p. ej. la sesión de Flask): se respeta el formato estándar
+            return super().dumps(obj, **kwargs)
+        return self.backend.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self.backend.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Misma línea final que jsonify
+        return self._app.response_class(self._encode(self.backend.dumps, obj) + b'\n', mimetype=self.mimetype)
+
+    def rows_response(self, columns, rows, status=200):
+        """Respuesta con un arreglo JSON construido desde tuplas del cursor"""
+        return self._app.response_class(
+            self._encode(self.backend.dumps_rows, columns, rows) + b'\n', status=status, mimetype=self.mimetype
+        )
+
+
+def get_json_backend(name='orjson', datetime_format='http'):
+    """Crear el backend solicitado; sin orjson instalado se usa json"""
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"Backend JSON no soportado: {name}")
+    if name == 'orjson' and orjson is None:
+        logger.warning('orjson no está instalado, se usa el backend json')
+        name = 'json'
+    if name == 'orjson':
+        return OrjsonBackend(datetime_format)
+    return JSONBackend(datetime_format)
@@ -0,0 +1,297 @@
+"""
+Métricas de la API en el formato de texto de Prometheus (/metrics)
+
+Registro mínimo de contadores e histogramas con etiquetas, sin dependencias.
+Cada observación es una búsqueda binaria sobre los límites del histograma y
+una suma bajo un lock, por lo que puede quedar activo con la carga de la fase 2.
+Las métricas del pool se leen de sus contadores al momento de la consulta.
+
+Las consultas y los commits se miden con InstrumentedConnection, que el pool
+usa como connection_factory de psycopg2.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from psycopg2 import extensions
+
+# Límites en segundos: peticiones y fases de base de datos
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Parseo de fechas: microsegundos
+PARSE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=''):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # etiquetas -> [conteo por bucket (+Inf al final), suma, total]
+        self._series = {}
+
+    def observe(self, value, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, labels=()):
+        """Context manager que observa la duración del bloque"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            snapshot = {labels: (list(s[0]), s[1], s[2]) for labels, s in self._series.items()}
+        for labels, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}"
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, self.labels)
+        return False
+
+
+class CallbackMetric:
+    """Métrica cuyo valor se lee al momento de la consulta (p. ej. contadores del pool)"""
+
+    def __init__(self, name, documentation, metric_type, callback):
+        self.name = name
+        self.documentation = documentation
+        self.type = metric_type
+        self.callback = callback
+
+    def samples(self):
+        yield f"{self.name} {_format_value(self.callback())}"
+
+
+class MetricsRegistry:
+    """Conjunto de métricas que se exportan juntas"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, metric_type, callback):
+        return self.register(CallbackMetric(name, documentation, metric_type, callback))
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Peticiones HTTP atendidas', ('method', 'route', 'status')
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Duración de las peticiones HTTP', ('method', 'route', 'status')
+)
+DB_ACQUIRE_SECONDS = REGISTRY.histogram(
+    'db_acquire_duration_seconds', 'Tiempo para obtener una conexión del pool (incluye abrirla)'
+)
+DB_CONNECT_SECONDS = REGISTRY.histogram(
+    'db_connect_duration_seconds', 'Tiempo para abrir una conexión física a PostgreSQL'
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'db_query_duration_seconds', 'Duración de execute/COPY por tipo de sentencia', ('operation',)
+)
+DB_COMMIT_SECONDS = REGISTRY.histogram(
+    'db_commit_duration_seconds', 'Duración de los commits'
+)
+PARSE_DATETIME_SECONDS = REGISTRY.histogram(
+    'parse_datetime_duration_seconds', 'Parseo de fechas de las muestras por campo', ('field',), PARSE_BUCKETS
+)
+JSON_SERIALIZE_SECONDS = REGISTRY.histogram(
+    'json_serialize_duration_seconds', 'Serialización JSON de las respuestas'
+)
+MONITORING_DUPLICATES = REGISTRY.counter(
+    'monitoring_duplicates_total', 'Muestras duplicadas por clave de idempotencia, no insertadas', ('source',)
+)
+
+
+def register_pool_metrics(pool, registry=REGISTRY):
+    """Exportar los contadores y el tamaño del pool de conexiones"""
+    def counter(key):
+        return lambda: pool.stats()[key]
+
+    registry.callback('db_connections_opened_total', 'Conexiones físicas abiertas', 'counter',
+                      counter('connections_opened'))
+    registry.callback('db_connections_closed_total', 'Conexiones físicas cerradas', 'counter',
+                      counter('connections_closed'))
+    registry.callback('db_pool_waits_total', 'Peticiones que esperaron una conexión libre', 'counter',
+                      counter('waits'))
+    registry.callback('db_pool_timeouts_total', 'Peticiones sin conexión dentro del tiempo de espera', 'counter',
+                      counter('timeouts'))
+    registry.callback('db_pool_in_use', 'Conexiones en uso', 'gauge', counter('in_use'))
+    registry.callback('db_pool_idle', 'Conexiones inactivas', 'gauge', counter('idle'))
+
+
+# Instrumentación de psycopg2
+
+_OPERATION_RE = re.compile(r'\s*(\w+)')
+_OPERATION_RE_BYTES = re.compile(rb'\s*(\w+)')
+_OPERATIONS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'COPY', 'SET', 'BEGIN'})
+
+
+def query_operation(query):
+    """Primera palabra de la sentencia (SELECT, INSERT, ...) u OTHER"""
+    if isinstance(query, str):
+        match = _OPERATION_RE.match(query)
+        operation = match.group(1).upper() if match else ''
+    elif isinstance(query, bytes):
+        match = _OPERATION_RE_BYTES.match(query)
+        operation = match.group(1).decode('ascii', 'ignore').upper() if match else ''
+    else:
+        operation = ''
+    return operation if operation in _OPERATIONS else 'OTHER'
+
+
+class InstrumentedCursorMixin:
+    """Mide execute, executemany y COPY del cursor"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, (query_operation(query),))
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, (query_operation(query),))
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, ('COPY',))
+
+
+class InstrumentedCursor(InstrumentedCursorMixin, extensions.cursor):
+    pass
+
+
+_cursor_classes = {extensions.cursor: InstrumentedCursor}
+_cursor_classes_lock = threading.Lock()
+
+
+def _instrumented_cursor_class(cursor_factory):
+    """Subclase instrumentada de un cursor_factory (p. ej. RealDictCursor)"""
+    cls = _cursor_classes.get(cursor_factory)
+    if cls is None:
+        with _cursor_classes_lock:
+            cls = _cursor_classes.get(cursor_factory)
+            if cls is None:
+                cls = type(f"Instrumented{cursor_factory.__name__}",
+                           (InstrumentedCursorMixin, cursor_factory), {})
+                _cursor_classes[cursor_factory] = cls
+    return cls
+
+
+class InstrumentedConnection(extensions.connection):
+    """Conexión psycopg2 que mide consultas y commits"""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get('cursor_factory') or extensions.cursor
+        if not issubclass(factory, InstrumentedCursorMixin):
+            kwargs['cursor_factory'] = _instrumented_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
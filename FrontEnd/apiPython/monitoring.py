@@ -0,0 +1,222 @@
+"""
+Esquema de los datos de monitoreo compartido por los servidores Flask y ASGI
+
+Columnas de las tablas de fase2, construcción (validada) de los valores a
+insertar a partir del JSON recibido y lectura de los parámetros, consulta,
+ETag y cursor de GET /monitoring-data (marcadores %s de psycopg2).
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from timestamps import parse_datetime
+from validation import MONITORING_SAMPLE_SCHEMA, METADATA_SCHEMA
+
+# Columnas insertadas en fase2.monitoring_data (en el orden de build_monitoring_values)
+MONITORING_COLUMNS = (
+    'total_ram', 'ram_libre', 'uso_ram', 'porcentaje_ram', 'porcentaje_cpu_uso',
+    'porcentaje_cpu_libre', 'procesos_corriendo', 'total_procesos',
+    'procesos_durmiendo', 'procesos_zombie', 'procesos_parados',
+    'hora', 'timestamp_received', 'api'
+)
+MONITORING_COLUMNS_SQL = ', '.join(MONITORING_COLUMNS)
+MONITORING_METRIC_COLUMNS = MONITORING_COLUMNS[:11]
+# Columnas consultables (proyección con fields=) y columnas de tiempo con índice
+MONITORING_QUERY_COLUMNS = ('id',) + MONITORING_COLUMNS + ('created_at',)
+# Proyección pública de las lecturas: sin columnas internas como idempotency_key
+MONITORING_QUERY_COLUMNS_SQL = ', '.join(MONITORING_QUERY_COLUMNS)
+MONITORING_TIME_COLUMNS = ('hora', 'timestamp_received')
+
+def parse_fields(value):
+    """Columnas pedidas en fields=a,b,c (id siempre incluido, para paginar)"""
+    fields = ['id']
+    for field in value.split(','):
+        field = field.strip()
+        if not field or field in fields:
+            continue
+        if field not in MONITORING_QUERY_COLUMNS:
+            raise ValueError(f"Campo desconocido en fields: {field}")
+        fields.append(field)
+    return fields
+
+def parse_keyset_args(args):
+    """Leer los parámetros de paginación por cursor (before_id / after_id)"""
+    try:
+        before_id = int(args['before_id']) if 'before_id' in args else None
+        after_id = int(args['after_id']) if 'after_id' in args else None
+    except ValueError:
+        raise ValueError('before_id y after_id deben ser enteros') from None
+    if before_id is not None and after_id is not None:
+        raise ValueError('Use solo uno de before_id o after_id')
+    return before_id, after_id
+
+def parse_range_args(args):
+    """Leer el rango de tiempo (from/to sobre time_field), api y la proyección (fields)"""
+    time_field = args.get('time_field', 'hora')
+    if time_field not in MONITORING_TIME_COLUMNS:
+        raise ValueError('time_field debe ser hora o timestamp_received')
+    start = parse_datetime(args['from']) if args.get('from') else None
+    end = parse_datetime(args['to']) if args.get('to') else None
+    api = args.get('api') or None
+    fields = parse_fields(args['fields']) if args.get('fields') else None
+    return time_field, start, end, api, fields
+
+def parse_page_args(args):
+    """Leer los parámetros de GET /monitoring-data: (argumentos de build_page_query, stream)
+
+    Lanza ValueError con el mensaje de la respuesta 400."""
+    try:
+        skip = int(args.get('skip', 0))
+    except ValueError:
+        raise ValueError('skip debe ser un entero') from None
+    before_id, after_id = parse_keyset_args(args)
+    time_field, start, end, api, fields = parse_range_args(args)
+    cursor = decode_range_cursor(args['cursor']) if args.get('cursor') else None
+
+    ranged = start is not None or end is not None
+    if ranged and (before_id is not None or after_id is not None):
+        raise ValueError('before_id y after_id no se combinan con from/to: use cursor')
+    if cursor is not None and not ranged:
+        raise ValueError('cursor solo se usa con from/to')
+    if cursor is not None and skip:
+        raise ValueError('skip no se combina con cursor')
+
+    stream_format = args.get('stream')
+    if stream_format and stream_format not in ('json', 'ndjson'):
+        raise ValueError('stream debe ser json o ndjson')
+
+    page = {
+        'before_id': before_id, 'after_id': after_id, 'skip': skip, 'fields': fields,
+        'time_field': time_field, 'start': start, 'end': end, 'api': api, 'cursor': cursor
+    }
+    return page, stream_format
+
+def range_conditions(time_field, start, end, api):
+    """Condiciones WHERE del rango de tiempo y del filtro por api"""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f'{time_field} >= %s')
+        params.append(start)
+    if end is not None:
+        conditions.append(f'{time_field} <= %s')
+        params.append(end)
+    if api is not None:
+        conditions.append('api = %s')
+        params.append(api)
+    return conditions, params
+
+def encode_range_cursor(timestamp, row_id):
+    """Cursor opaco de un rango de tiempo: (columna de tiempo, id) de la última fila"""
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(',', ':')).encode('ascii')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+def decode_range_cursor(value):
+    """Leer un cursor de encode_range_cursor: (timestamp, id) o ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        timestamp, row_id = json.loads(raw)
+        if not isinstance(row_id, int) or isinstance(row_id, bool):
+            raise ValueError
+        return datetime.fromisoformat(timestamp), row_id
+    except (ValueError, TypeError):
+        raise ValueError('cursor inválido') from None
+
+def build_page_query(before_id, after_id, skip, limit, fields=None, time_field='hora', start=None, end=None,
+                     api=None, cursor=None):
+    """Construir la consulta paginada: por cursor sobre id, por OFFSET o por rango de tiempo
+
+    Con rango (from/to) se pagina por (time_field, id) en orden ascendente: cursor
+    es el (timestamp, id) de la última fila de la página anterior."""
+    conditions, params = range_conditions(time_field, start, end, api)
+    ranged = start is not None or end is not None
+    if ranged:
+        # Recorre el índice de la columna de tiempo (idx_monitoring_data_hora o
+        # idx_monitoring_data_timestamp) en lugar del de id; id desempata
+        if cursor is not None:
+            conditions.append(f'({time_field}, id) > (%s, %s)')
+            params.extend(cursor)
+        order_by = f"{time_field} ASC, id ASC"
+        # La columna de tiempo hace falta para el cursor de la página siguiente
+        if fields and time_field not in fields:
+            fields = list(fields) + [time_field]
+    elif after_id is not None:
+        # Registros más nuevos que el cursor, en orden ascendente
+        conditions.append('id > %s')
+        params.append(after_id)
+        order_by = 'id ASC'
+    elif before_id is not None:
+        conditions.append('id < %s')
+        params.append(before_id)
+        order_by = 'id DESC'
+    else:
+        order_by = 'id DESC'
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    columns = ', '.join(fields) if fields else MONITORING_QUERY_COLUMNS_SQL
+    query = f"SELECT {columns} FROM fase2.monitoring_data {where} ORDER BY {order_by}"
+    if skip and after_id is None and before_id is None and cursor is None:
+        query += ' OFFSET %s'
+        params.append(skip)
+    if limit is not None:
+        query += ' LIMIT %s'
+        params.append(limit)
+    return query, params
+
+def page_etag(columns, rows):
+    """ETag de una página: ids de la primera y la última fila (los registros no cambian)"""
+    if not rows:
+        return 'empty'
+    id_index = columns.index('id')
+    return f"{rows[0][id_index]}-{rows[-1][id_index]}-{len(rows)}"
+
+def next_page_cursor(columns, rows, limit, after_id, range_time_field=None):
+    """Valor de X-Next-Cursor para la página siguiente, o None si no hay más"""
+    if after_id is not None:
+        return f"after_id={rows[-1][columns.index('id')] if rows else after_id}"
+    if not rows or len(rows) != limit:
+        return None
+    last = rows[-1]
+    if range_time_field is not None:
+        # Con rango de tiempo, el (timestamp, id) de la última fila
+        return f"cursor={encode_range_cursor(last[columns.index(range_time_field)], last[columns.index('id')])}"
+    return f"before_id={last[columns.index('id')]}"
+
+def build_monitoring_values(data):
+    """Validar el JSON recibido y construir la tupla de valores a insertar"""
+    return MONITORING_SAMPLE_SCHEMA(data)
+
+def monitoring_idempotency_key(values):
+    """Clave de una muestra validada: hash de hora, métricas y api (sin timestamp_received)
+
+    Dos muestras con la misma hora y las mismas métricas se tratan como un reenvío
+    aunque lleguen por separado: timestamp_received cambia en cada reintento (lo
+    asigna el servidor si falta) y no sirve para distinguirlas."""
+    material = f"{values[:11]!r}|{values[11].isoformat()}|{values[13]}"
+    return hashlib.sha256(b'payload:' + material.encode('utf-8')).hexdigest()
+
+# Columnas insertadas en fase2.metadata (en el orden de build_metadata_values)
+METADATA_COLUMNS = (
+    'total_records', 'collection_start', 'collection_end', 'duration_minutes',
+    'users', 'generated_at', 'phase', 'description', 'api'
+)
+METADATA_COLUMNS_SQL = ', '.join(METADATA_COLUMNS)
+
+def build_metadata_values(data):
+    """Validar el JSON de metadata y construir la tupla de valores a insertar"""
+    return METADATA_SCHEMA(data)
+
+def stats_from_row(results):
+    """Convertir la fila de la consulta agregada de /stats en la respuesta JSON"""
+    return {
+        'total_monitoring_records': int(results[0] or 0),
+        'total_metadata_records': int(results[1] or 0),
+        'average_cpu_usage': round(float(results[2] or 0), 2),
+        'average_ram_usage': round(float(results[3] or 0), 2),
+        'max_cpu_usage': int(results[4] or 0),
+        'max_ram_usage': int(results[5] or 0),
+        'python_api_records': int(results[6] or 0),
+        'api': 'Python',
+        'schema': 'fase2'
+    }
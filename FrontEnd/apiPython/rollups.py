@@ -0,0 +1,171 @@
+"""
+Rollups por minuto y por hora de fase2.monitoring_data
+
+Un hilo en segundo plano agrega los registros nuevos (id mayor a la marca
+guardada en fase2.rollup_state) y los acumula en fase2.monitoring_rollup con
+count, sum, min, max y last por columna numérica y por api. Un advisory lock
+garantiza que solo una réplica procese a la vez, y la marca se actualiza en la
+misma transacción que los rollups, por lo que cada fila se cuenta una sola vez.
+La marca no pasa ids de transacciones que aún pueden estar en curso.
+"""
+
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tamaños de bucket soportados y su unidad para date_trunc
+ROLLUP_BUCKETS = {
+    '1m': 'minute',
+    '1h': 'hour',
+}
+
+ROLLUP_LOCK_ID = 202201947
+
+
+def build_rollup_upsert(metric_columns):
+    """Construir el INSERT ... SELECT ... ON CONFLICT que acumula un rango de ids"""
+    select_parts = []
+    insert_parts = []
+    update_parts = []
+    for column in metric_columns:
+        insert_parts += [f"{column}_sum", f"{column}_min", f"{column}_max", f"{column}_last"]
+        select_parts += [
+            f"SUM({column})",
+            f"MIN({column})",
+            f"MAX({column})",
+            f"(ARRAY_AGG({column} ORDER BY hora DESC, id DESC))[1]",
+        ]
+        update_parts += [
+            f"{column}_sum = r.{column}_sum + EXCLUDED.{column}_sum",
+            f"{column}_min = LEAST(r.{column}_min, EXCLUDED.{column}_min)",
+            f"{column}_max = GREATEST(r.{column}_max, EXCLUDED.{column}_max)",
+            f"{column}_last = CASE WHEN EXCLUDED.last_hora >= r.last_hora "
+            f"THEN EXCLUDED.{column}_last ELSE r.{column}_last END",
+        ]
+
+    return f"""
+        INSERT INTO fase2.monitoring_rollup AS r (
+            bucket, bucket_start, api, sample_count, last_hora, {', '.join(insert_parts)}
+        )
+        SELECT %s, date_trunc(%s, hora), COALESCE(api, ''), COUNT(*), MAX(hora),
+               {', '.join(select_parts)}
+        FROM fase2.monitoring_data
+        WHERE id > %s AND id <= %s
+        GROUP BY 2, 3
+        ON CONFLICT (bucket, bucket_start, api) DO UPDATE SET
+            sample_count = r.sample_count + EXCLUDED.sample_count,
+            last_hora = GREATEST(r.last_hora, EXCLUDED.last_hora),
+            {', '.join(update_parts)}
+    """
+
+
+class RollupWorker:
+    """Hilo que mantiene los rollups al día a partir de los registros nuevos"""
+
+    def __init__(self, pool, metric_columns, interval=5, max_rows=50000, settle_seconds=2):
+        self.pool = pool
+        self.interval = interval
+        self.max_rows = max_rows
+        self.settle_seconds = settle_seconds
+        self.upsert_query = build_rollup_upsert(metric_columns)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_error = None
+        self.processed_rows = 0
+        self.last_id = None
+
+    def run_once(self):
+        """Procesar un rango de ids nuevos; devuelve la cantidad de filas agregadas"""
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_xact_lock(%s)', (ROLLUP_LOCK_ID,))
+                if not cursor.fetchone()[0]:
+                    # Otra réplica está procesando
+                    conn.rollback()
+                    return 0
+
+                cursor.execute("""
+                    INSERT INTO fase2.rollup_state (name, last_id)
+                    VALUES ('monitoring_data', 0)
+                    ON CONFLICT (name) DO NOTHING
+                """)
+                cursor.execute(
+                    "SELECT last_id FROM fase2.rollup_state WHERE name = 'monitoring_data'"
+                )
+                watermark = cursor.fetchone()[0]
+
+                # La marca solo avanza por el tramo contiguo de ids cuyas transacciones
+                # son anteriores a la más antigua aún en curso (xmin del snapshot): una
+                # transacción abierta puede tener ids menores que filas ya visibles y,
+                # si la marca los pasara, esas filas nunca se agregarían. created_at
+                # deja además un margen de settle_seconds
+                cursor.execute("""
+                    SELECT MAX(id), COUNT(*) FROM (
+                        SELECT id, bool_and(
+                            age(nuevos.xmin) > age(snapshot.xmin)
+                            AND created_at <= now() - %s * interval '1 second'
+                        ) OVER (ORDER BY id) AS settled
+                        FROM (
+                            SELECT id, xmin, created_at FROM fase2.monitoring_data
+                            WHERE id > %s
+                            ORDER BY id
+                            LIMIT %s
+                        ) nuevos, (
+                            SELECT (pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+                                    %% 4294967296)::text::xid AS xmin
+                        ) snapshot
+                    ) tramo
+                    WHERE settled
+                """, (self.settle_seconds, watermark, self.max_rows))
+                upper, count = cursor.fetchone()
+                if upper is None:
+                    conn.rollback()
+                    self.last_id = watermark
+                    return 0
+
+                for bucket, unit in ROLLUP_BUCKETS.items():
+                    cursor.execute(self.upsert_query, (bucket, unit, watermark, upper))
+
+                cursor.execute(
+                    "UPDATE fase2.rollup_state SET last_id = %s WHERE name = 'monitoring_data'",
+                    (upper,)
+                )
+            conn.commit()
+            self.processed_rows += count
+            self.last_id = upper
+            return count
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                # Seguir procesando mientras haya atraso
+                while self.run_once() >= self.max_rows and not self._stop_event.is_set():
+                    pass
+                self._last_error = None
+            except Exception as e:
+                # Registrar cada error distinto una sola vez para no saturar los logs
+                if str(e) != self._last_error:
+                    logger.error(f"Error actualizando rollups: {e}")
+                    self._last_error = str(e)
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        """Iniciar el hilo de mantenimiento"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='rollup-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detener el hilo de mantenimiento"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(self.interval + 5)
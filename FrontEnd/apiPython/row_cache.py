@@ -0,0 +1,191 @@
+"""
+Cachés de lectura para registros de monitoreo (filas inmutables una vez insertadas)
+
+- RowCache: LRU por id con límite de entradas y TTL para GET /monitoring-data/<id>.
+- HotWindow: los últimos N registros (orden descendente por id) para servir las
+  primeras páginas de GET /monitoring-data sin consultar la base. El camino de
+  inserción agrega las filas nuevas; pasado `max_age` se recarga con una sola
+  consulta para incluir lo insertado por otras réplicas o por COPY.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class RowCache:
+    """LRU por clave con TTL y contadores de aciertos"""
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    def get(self, key):
+        """Valor en caché o None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return value
+                del self._entries[key]
+                self._counters['expired'] += 1
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        """Invalidar todas las entradas"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                **self._counters,
+                'hit_rate': round(self._counters['hits'] / lookups, 4) if lookups else None
+            }
+
+
+class HotWindow:
+    """Últimos `size` registros por id, recargados con `loader` cada `max_age` segundos
+
+    `loader(size)` devuelve (columnas, filas) con las filas más recientes en
+    orden descendente por id; la primera columna debe ser id."""
+
+    def __init__(self, loader, size=1000, max_age=1.0):
+        self.loader = loader
+        self.size = size
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._columns = None
+        self._rows = []
+        self._by_id = {}
+        # La ventana contiene toda la tabla (menos filas que `size`)
+        self._complete = False
+        self._loaded_at = None
+        # Filas agregadas mientras corre una recarga: se mezclan al terminarla
+        self._pending = None
+        # Cambia con cada invalidación: una recarga que la cruza no se guarda
+        self._generation = 0
+        self._counters = {'hits': 0, 'misses': 0, 'reloads': 0, 'rows_added': 0, 'invalidations': 0}
+
+    def _fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.max_age
+
+    def _slice(self, skip, limit):
+        if skip + limit <= len(self._rows) or self._complete:
+            return self._columns, self._rows[skip:skip + limit]
+        return None
+
+    def page(self, skip, limit):
+        """(columnas, filas, estado) de la página, o None si no cabe en la ventana"""
+        if skip + limit > self.size:
+            return None
+        with self._lock:
+            page = self._slice(skip, limit) if self._fresh() else None
+            if page is not None:
+                self._counters['hits'] += 1
+                return page + ('hit',)
+
+        # Una sola recarga a la vez; quienes esperan usan su resultado
+        with self._reload_lock:
+            with self._lock:
+                page = self._slice(skip, limit) if self._fresh() else None
+                if page is not None:
+                    self._counters['hits'] += 1
+                    return page + ('hit',)
+                self._counters['misses'] += 1
+                self._pending = []
+                generation = self._generation
+            try:
+                columns, rows = self.loader(self.size)
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                pending, self._pending = self._pending, None
+                if generation != self._generation:
+                    # Invalidada durante la consulta: se responde sin guardarla
+                    rows = list(rows)
+                    return columns, rows[skip:skip + limit], 'miss'
+                self._columns = columns
+                self._rows = list(rows)
+                self._by_id = {row[0]: row for row in self._rows}
+                self._complete = len(self._rows) < self.size
+                self._loaded_at = time.monotonic()
+                self._counters['reloads'] += 1
+                if pending:
+                    self._merge(pending)
+                return self._slice(skip, limit) + ('miss',)
+
+    def _merge(self, rows):
+        for row in rows:
+            if row[0] not in self._by_id:
+                self._by_id[row[0]] = row
+                self._rows.append(row)
+                self._counters['rows_added'] += 1
+        # Las transacciones pueden confirmar fuera del orden de sus ids
+        self._rows.sort(key=lambda row: row[0], reverse=True)
+        if len(self._rows) > self.size:
+            for row in self._rows[self.size:]:
+                del self._by_id[row[0]]
+            del self._rows[self.size:]
+            self._complete = False
+
+    def add(self, columns, rows):
+        """Agregar filas recién insertadas (mismas columnas que la ventana)"""
+        if not rows:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(rows)
+            elif self._loaded_at is not None and columns == self._columns:
+                self._merge(rows)
+
+    def find(self, key):
+        """Fila con ese id si está en la ventana vigente: (columnas, fila) o None"""
+        with self._lock:
+            if not self._fresh():
+                return None
+            row = self._by_id.get(key)
+            return (self._columns, row) if row is not None else None
+
+    def invalidate(self):
+        """Forzar una recarga en la siguiente lectura (p. ej. tras COPY o DELETE)"""
+        with self._lock:
+            self._loaded_at = None
+            self._rows = []
+            self._by_id = {}
+            self._generation += 1
+            self._counters['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                'rows': len(self._rows),
+                'size': self.size,
+                'max_age_seconds': self.max_age,
+                'age_seconds': round(time.monotonic() - self._loaded_at, 3) if self._loaded_at else None,
+                **self._counters,
+                'hit_rate': round(self._counters['hits'] / lookups, 4) if lookups else None
+            }
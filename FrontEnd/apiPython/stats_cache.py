@@ -0,0 +1,204 @@
+"""
+Caché con TTL y stale-while-revalidate para resultados costosos (p. ej. /stats)
+
+- Dentro del TTL se sirve el valor en caché.
+- Vencido el TTL pero dentro de la ventana stale, se sirve el valor anterior y
+  se recalcula en segundo plano.
+- Sin valor utilizable, el primer llamador calcula y los concurrentes esperan
+  ese mismo cálculo en lugar de repetirlo.
+- clear() incrementa una generación: un cálculo iniciado antes (p. ej. antes de
+  un DELETE) no guarda su resultado y los llamadores posteriores no lo esperan.
+"""
+
+import asyncio
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlight:
+    """Cálculo en curso compartido por los llamadores de una misma clave"""
+
+    __slots__ = ('event', 'value', 'error', 'generation')
+
+    def __init__(self, generation):
+        self.event = threading.Event()
+        self.generation = generation
+        self.value = None
+        self.error = None
+
+
+class StaleWhileRevalidateCache:
+    """Caché por clave con TTL, ventana stale y un solo cálculo en vuelo por clave"""
+
+    def __init__(self, ttl=5, stale_ttl=30, max_entries=128):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._generation = 0
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'shared_waits': 0, 'refresh_errors': 0}
+
+    def _store(self, key, value, generation):
+        with self._lock:
+            # Calculado antes de un clear(): el resultado puede no reflejarlo
+            if generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _compute(self, key, compute_fn, flight):
+        """Ejecutar el cálculo y despertar a quienes lo esperan"""
+        try:
+            flight.value = compute_fn()
+            self._store(key, flight.value, flight.generation)
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+            flight.event.set()
+
+    def _refresh_in_background(self, key, compute_fn, flight):
+        self._compute(key, compute_fn, flight)
+        if flight.error is not None:
+            with self._lock:
+                self._counters['refresh_errors'] += 1
+            logger.error(f"Error recalculando caché en segundo plano ({key}): {flight.error}")
+
+    def get(self, key, compute_fn):
+        """
+        Devolver (valor, edad_en_segundos, estado) para la clave.
+
+        `estado` es 'hit', 'stale' o 'miss'.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            flight = self._in_flight.get(key)
+
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self._counters['hits'] += 1
+                    return value, age, 'hit'
+                if age < self.ttl + self.stale_ttl:
+                    self._counters['stale_hits'] += 1
+                    if flight is None:
+                        flight = _InFlight(self._generation)
+                        self._in_flight[key] = flight
+                        threading.Thread(
+                            target=self._refresh_in_background,
+                            args=(key, compute_fn, flight),
+                            daemon=True
+                        ).start()
+                    return value, age, 'stale'
+
+            self._counters['misses'] += 1
+            owner = flight is None
+            if owner:
+                flight = _InFlight(self._generation)
+                self._in_flight[key] = flight
+            else:
+                self._counters['shared_waits'] += 1
+
+        if owner:
+            self._compute(key, compute_fn, flight)
+        else:
+            flight.event.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, 0.0, 'miss'
+
+    def clear(self):
+        """Invalidar todas las entradas y los cálculos en curso"""
+        with self._lock:
+            self._entries.clear()
+            self._in_flight.clear()
+            self._generation += 1
+
+    def stats(self):
+        """Contadores de aciertos, stale y fallos"""
+        with self._lock:
+            return {'entries': len(self._entries), **self._counters}
+
+
+class AsyncStaleWhileRevalidateCache:
+    """Variante asyncio de StaleWhileRevalidateCache para el servidor ASGI"""
+
+    def __init__(self, ttl=5, stale_ttl=30, max_entries=128):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._generation = 0
+        self._counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'shared_waits': 0, 'refresh_errors': 0}
+
+    async def _compute(self, key, compute_fn, generation):
+        # La generación se toma al crear la tarea, no cuando empieza a ejecutarse
+        try:
+            value = await compute_fn()
+            if generation == self._generation:
+                self._entries[key] = (value, time.monotonic())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        finally:
+            if self._in_flight.get(key) is asyncio.current_task():
+                del self._in_flight[key]
+
+    def _on_refresh_done(self, key, task):
+        if not task.cancelled() and task.exception() is not None:
+            self._counters['refresh_errors'] += 1
+            logger.error(f"Error recalculando caché en segundo plano ({key}): {task.exception()}")
+
+    async def get(self, key, compute_fn):
+        """Devolver (valor, edad_en_segundos, estado) para la clave"""
+        entry = self._entries.get(key)
+        task = self._in_flight.get(key)
+
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self._counters['hits'] += 1
+                return value, age, 'hit'
+            if age < self.ttl + self.stale_ttl:
+                self._counters['stale_hits'] += 1
+                if task is None:
+                    task = asyncio.ensure_future(self._compute(key, compute_fn, self._generation))
+                    task.add_done_callback(lambda t: self._on_refresh_done(key, t))
+                    self._in_flight[key] = task
+                return value, age, 'stale'
+
+        self._counters['misses'] += 1
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, compute_fn, self._generation))
+            self._in_flight[key] = task
+        else:
+            self._counters['shared_waits'] += 1
+        # shield: si un llamador se cancela no se cancela el cálculo compartido
+        value = await asyncio.shield(task)
+        return value, 0.0, 'miss'
+
+    def clear(self):
+        """Invalidar todas las entradas y los cálculos en curso"""
+        self._entries.clear()
+        self._in_flight.clear()
+        self._generation += 1
+
+    def stats(self):
+        """Contadores de aciertos, stale y fallos"""
+        return {'entries': len(self._entries), **self._counters}
@@ -0,0 +1,91 @@
+"""Configuración de pytest: los módulos de la API son planos (from monitoring import ...)"""
+
+import os
+import sys
+
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+
+# Próximo xid de wrapped_postgres: a 300 transacciones de dar la vuelta a 2^32
+WRAPAROUND_NEXT_XID = 2 ** 32 - 300
+
+
+def load_schema(config):
+    """Crear el esquema fase2 de init.sql"""
+    import psycopg2
+
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('CREATE SCHEMA IF NOT EXISTS fase2')
+            cursor.execute('SET search_path TO fase2')
+            with open(os.path.join(API_DIR, 'init.sql'), 'r', encoding='utf-8') as f:
+                cursor.execute(f.read())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def server_config(server):
+    """Parámetros de conexión por el socket del servidor"""
+    info = server.get_postmaster_info()
+    return {'host': str(info.socket_dir), 'database': 'postgres', 'user': 'postgres', 'password': '',
+            'port': str(info.port)}
+
+
+@pytest.fixture(scope='session')
+def postgres(tmp_path_factory):
+    """PostgreSQL desechable (pgserver) con el esquema fase2 de init.sql
+
+    Las pruebas que lo usan se omiten sin pgserver (pip install pgserver), como
+    --temp-db de benchmarks/bench_ingest.py."""
+    pgserver = pytest.importorskip('pgserver')
+
+    directory = str(tmp_path_factory.mktemp('pgdata'))
+    server = pgserver.get_server(directory, cleanup_mode='delete')
+    config = server_config(server)
+    load_schema(config)
+
+    yield config
+    server.cleanup()
+
+
+@pytest.fixture(scope='module')
+def wrapped_postgres(tmp_path_factory):
+    """Como postgres, pero con el contador de transacciones cerca de dar la vuelta
+
+    pg_resetwal fija el próximo xid en WRAPAROUND_NEXT_XID; antes se congela el
+    catálogo para que sus filas sigan visibles y se crea el segmento de pg_xact
+    de ese xid, como en las pruebas de wraparound de PostgreSQL."""
+    pgserver = pytest.importorskip('pgserver')
+    import psycopg2
+
+    directory = str(tmp_path_factory.mktemp('pgdata_wrap'))
+    server = pgserver.get_server(directory, cleanup_mode='delete')
+    conn = psycopg2.connect(**server_config(server))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('VACUUM FREEZE')
+    finally:
+        conn.close()
+
+    pgserver.pg_ctl(['-w', 'stop'], pgdata=server.pgdata, user=server.system_user)
+    pgserver.pg_resetwal(['-x', str(WRAPAROUND_NEXT_XID)], pgdata=server.pgdata, user=server.system_user)
+    # 32 páginas de 8 kB por segmento, 4 transacciones por byte
+    segment = os.path.join(directory, 'pg_xact', f'{WRAPAROUND_NEXT_XID // (32 * 8192 * 4):04X}')
+    with open(segment, 'wb') as f:
+        f.write(bytes(32 * 8192))
+    if server.system_user is not None:
+        import pwd
+        owner = pwd.getpwnam(server.system_user)
+        os.chown(segment, owner.pw_uid, owner.pw_gid)
+    server.ensure_postgres_running()
+    config = server_config(server)
+    load_schema(config)
+
+    yield config
+    server.cleanup()
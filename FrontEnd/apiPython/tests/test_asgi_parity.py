@@ -0,0 +1,166 @@
+"""Paridad de app.py (Flask) y asgi_app.py (Starlette) sobre las mismas peticiones"""
+
+import importlib
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from monitoring import encode_range_cursor
+
+VOLATILE_KEYS = {'timestamp', 'created_at', 'cache_age_seconds'}
+COMPARED_HEADERS = ('ETag', 'X-Next-Cursor', 'X-Cache')
+
+
+def sample(second, **changes):
+    return {
+        'total_ram': 16000, 'ram_libre': 8000 - second, 'uso_ram': 8000 + second, 'porcentaje_ram': 50,
+        'porcentaje_cpu_uso': 20 + second, 'porcentaje_cpu_libre': 80 - second, 'procesos_corriendo': 2,
+        'total_procesos': 300, 'procesos_durmiendo': 290, 'procesos_zombie': 0, 'procesos_parados': 8,
+        'hora': f'2024-01-01 10:00:{second // 2:02d}', 'timestamp_received': '2024-01-01T10:05:00+00:00',
+        **changes
+    }
+
+
+METADATA = {
+    'total_records': 4, 'collection_start': '2024-01-01 10:00:00', 'collection_end': '2024-01-01 10:00:05',
+    'duration_minutes': 1, 'users': 2, 'generated_at': '2024-01-01T10:06:00', 'phase': 2,
+    'description': 'paridad', 'api': 'Python'
+}
+
+RANGE = '/monitoring-data?from=2024-01-01T10:00:00&limit=2&fields=porcentaje_ram'
+
+REQUESTS = [
+    ('POST', '/monitoring-data', {'json': sample(0)}),
+    ('POST', '/monitoring-data', {'json': [sample(1), sample(2), sample(3, api='Node.js')]}),
+    ('POST', '/monitoring-data', {'json': [sample(4), {'hora': 'no es una fecha'}]}),
+    ('POST', '/monitoring-data', {'json': {}}),
+    ('POST', '/monitoring-data', {'json': sample(5, porcentaje_ram='x')}),
+    ('POST', '/metadata', {'json': METADATA}),
+    ('GET', '/monitoring-data?limit=2', {}),
+    ('GET', '/monitoring-data?limit=2', {'headers': {'If-None-Match': 'W/"4-3-2"'}}),
+    ('GET', '/monitoring-data?limit=2&skip=1', {}),
+    ('GET', '/monitoring-data?before_id=3&limit=10', {}),
+    ('GET', '/monitoring-data?after_id=2', {}),
+    ('GET', '/monitoring-data?api=Node.js', {}),
+    ('GET', RANGE, {}),
+    ('GET', f"{RANGE}&cursor={encode_range_cursor(datetime(2024, 1, 1, 10, 0, 0), 2)}", {}),
+    ('GET', '/monitoring-data?to=2024-01-01T10:00:00&time_field=hora&fields=uso_ram', {}),
+    ('GET', '/monitoring-data?stream=ndjson', {}),
+    ('GET', '/monitoring-data?stream=json&limit=2&fields=hora', {}),
+    ('GET', '/monitoring-data?before_id=x', {}),
+    ('GET', '/monitoring-data?before_id=1&after_id=2', {}),
+    ('GET', '/monitoring-data?cursor=zzz&from=2024-01-01', {}),
+    ('GET', '/monitoring-data?from=2024-01-01&after_id=1', {}),
+    ('GET', '/monitoring-data?stream=csv', {}),
+    ('GET', '/monitoring-data?time_field=created_at', {}),
+    ('GET', '/monitoring-data?fields=password', {}),
+    ('GET', '/monitoring-data/1', {}),
+    ('GET', '/monitoring-data/1', {'headers': {'If-None-Match': 'W/"1"'}}),
+    ('GET', '/monitoring-data/999', {}),
+    ('GET', '/metadata', {}),
+    ('GET', '/stats', {}),
+    ('GET', '/stats?from=2024-01-01T10:00:01&api=Python', {}),
+    ('DELETE', '/monitoring-data', {}),
+    ('GET', '/monitoring-data', {}),
+    ('GET', '/no-existe', {}),
+]
+
+
+def without_volatile(value):
+    if isinstance(value, dict):
+        return {key: without_volatile(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [without_volatile(item) for item in value]
+    return value
+
+
+def outcome(status, headers, content_type, body):
+    if not body:
+        parsed = None
+    elif content_type.startswith('application/x-ndjson'):
+        parsed = [json.loads(line) for line in body.splitlines()]
+    else:
+        parsed = json.loads(body)
+    return status, {name: headers.get(name) for name in COMPARED_HEADERS}, without_volatile(parsed)
+
+
+def reset(config):
+    import psycopg2
+
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('TRUNCATE fase2.monitoring_data, fase2.metadata RESTART IDENTITY')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope='module')
+def apps(postgres):
+    """Clientes de prueba de ambos servidores sobre la misma base (sin hilos en segundo plano)"""
+    os.environ.update({
+        'DB_HOST': postgres['host'], 'DB_NAME': postgres['database'], 'DB_USER': postgres['user'],
+        'DB_PASSWORD': postgres['password'], 'DB_PORT': postgres['port'],
+        'ROLLUP_ENABLED': 'false', 'STREAM_ENABLED': 'false', 'HOT_WINDOW_SIZE': '0', 'ROW_CACHE_SIZE': '0'
+    })
+    from starlette.testclient import TestClient
+
+    flask_app = importlib.import_module('app').app
+    asgi_app = importlib.import_module('asgi_app').app
+    with TestClient(asgi_app) as asgi_client:
+        yield flask_app.test_client(), asgi_client
+
+
+def run_flask(client, config):
+    reset(config)
+    results = []
+    for method, path, kwargs in REQUESTS:
+        response = client.open(path, method=method, **kwargs)
+        results.append(outcome(response.status_code, response.headers, response.content_type, response.data))
+    return results
+
+
+def run_asgi(client, config):
+    reset(config)
+    results = []
+    for method, path, kwargs in REQUESTS:
+        response = client.request(method, path, **kwargs)
+        results.append(outcome(response.status_code, response.headers, response.headers.get('content-type', ''),
+                               response.content))
+    return results
+
+
+def test_same_responses_for_the_same_requests(apps, postgres):
+    flask_client, asgi_client = apps
+    flask_results = run_flask(flask_client, postgres)
+    asgi_results = run_asgi(asgi_client, postgres)
+
+    for (method, path, _), flask_result, asgi_result in zip(REQUESTS, flask_results, asgi_results):
+        assert asgi_result == flask_result, f'{method} {path}'
+
+
+def test_requests_cover_cursors_and_not_modified(apps, postgres):
+    flask_client, _ = apps
+    results = run_flask(flask_client, postgres)
+    statuses = [status for status, _, _ in results]
+    assert statuses[:8] == [201, 201, 400, 400, 400, 201, 200, 304]
+    assert results[6][1]['X-Next-Cursor'] == 'before_id=3'
+    assert results[12][1]['X-Next-Cursor'].startswith('cursor=')
+    assert [row['id'] for row in results[13][2]] == [3, 4]
+
+
+def test_asgi_answers_501_for_unsupported_features(apps, postgres):
+    _, asgi_client = apps
+    reset(postgres)
+    response = asgi_client.post('/monitoring-data', json=sample(0), headers={'Idempotency-Key': 'abc'})
+    assert response.status_code == 501
+    assert asgi_client.get('/monitoring-data').json() == []
+
+    response = asgi_client.post('/monitoring-data/bulk', content=b'[]', headers={'Content-Type': 'application/json'})
+    assert response.status_code == 501
+    for path in ('/monitoring-data/rollup', '/monitoring-data/downsample', '/monitoring-data/stream', '/pool-stats',
+                 '/cache-stats', '/metrics', '/ingest-status', '/stream-status'):
+        assert asgi_client.get(path).status_code == 501, path
@@ -0,0 +1,177 @@
+"""Logging asíncrono: WARNING y superiores nunca se descartan y la cola se vacía al salir"""
+
+import io
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import async_logging
+from async_logging import (AsyncLogging, JSONLogFormatter, NonBlockingQueueHandler, SampledLogger, SamplingFilter,
+                           parse_sample_rates)
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_record(level, name='app', **extra):
+    record = logging.LogRecord(name, level, __file__, 1, 'mensaje', (), None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+@pytest.fixture
+def frozen_clock(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(async_logging.time, 'monotonic', lambda: clock[0])
+    return clock
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates('monitoring_insert=0.01, stats = 0.5,') == {'monitoring_insert': 0.01, 'stats': 0.5}
+    assert parse_sample_rates('') == {}
+    assert parse_sample_rates(None) == {}
+
+
+@pytest.mark.parametrize('level', [logging.WARNING, logging.ERROR, logging.CRITICAL])
+def test_warning_and_above_are_always_kept(level, frozen_clock):
+    # Muestreo 0, tasa 0 para el evento y sin tokens: todo lo demás se descartaría
+    sampling = SamplingFilter(sample_rate=0.0, event_rates={'monitoring_insert': 0.0}, rate_limit=1)
+    assert all(sampling.filter(make_record(level, event='monitoring_insert')) for _ in range(1000))
+    assert all(sampling.filter(make_record(level)) for _ in range(1000))
+    assert (sampling.sampled_out, sampling.rate_limited) == (0, 0)
+
+    assert not sampling.filter(make_record(logging.INFO))
+    assert not sampling.filter(make_record(logging.DEBUG, event='monitoring_insert'))
+    assert sampling.sampled_out == 2
+
+
+def test_sample_rate_per_event(monkeypatch):
+    draws = iter([0.3, 0.7, 0.3, 0.7])
+    monkeypatch.setattr(async_logging.random, 'random', lambda: next(draws))
+    sampling = SamplingFilter(sample_rate=0.5, event_rates={'siempre': 1.0})
+    assert sampling.allow('otro') and not sampling.allow('otro')
+    # Tasa 1.0: no se sortea (el iterador seguiría en 0.3)
+    assert sampling.allow('siempre')
+    assert sampling.filter(make_record(logging.INFO, event='otro'))
+    assert not sampling.filter(make_record(logging.INFO, name='otro'))
+    assert sampling.sampled_out == 2
+
+
+def test_rate_limit_per_event_refills_over_time(frozen_clock):
+    sampling = SamplingFilter(rate_limit=3)
+    assert [sampling.allow('a') for _ in range(5)] == [True, True, True, False, False]
+    # Cada evento tiene su propio límite
+    assert sampling.allow('b')
+    frozen_clock[0] += 0.5
+    assert [sampling.allow('a') for _ in range(3)] == [True, False, False]
+    frozen_clock[0] += 10
+    assert [sampling.allow('a') for _ in range(4)] == [True, True, True, False]
+    assert sampling.rate_limited == 5
+
+
+def test_sampled_logger_decides_before_creating_the_record():
+    sampling = SamplingFilter(sample_rate=0.0)
+    logger = logging.Logger('sampled_logger_test', logging.DEBUG)
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    handler.addFilter(sampling)
+    logger.addHandler(handler)
+    adapter = SampledLogger(logger, sampling)
+
+    adapter.info('descartado', extra={'event': 'monitoring_insert'})
+    adapter.warning('conservado')
+    adapter.error('conservado %s', 'también', extra={'event': 'monitoring_insert'})
+    assert [record.getMessage() for record in records] == ['conservado', 'conservado también']
+    assert sampling.sampled_out == 1
+
+    # Un INFO que pasa el muestreo no se vuelve a sortear en el filtro del handler
+    sampling.event_rates['monitoring_insert'] = 1.0
+    adapter.info('conservado', extra={'event': 'monitoring_insert'})
+    assert records[-1]._sampled and records[-1].event == 'monitoring_insert'
+    assert sampling.sampled_out == 1
+
+
+def test_full_queue_drops_info_but_not_warnings():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(make_record(logging.INFO))
+    assert handler.dropped == 3
+    assert handler.queue.qsize() == 2
+
+    handler.queue.get_nowait()
+    handler.handle(make_record(logging.WARNING))
+    assert handler.dropped == 3
+    assert [handler.queue.get_nowait().levelno for _ in range(2)] == [logging.INFO, logging.WARNING]
+
+
+def test_json_formatter_includes_extra_fields():
+    try:
+        raise RuntimeError('fallo')
+    except RuntimeError:
+        record = logging.LogRecord('app', logging.ERROR, __file__, 1, 'señal %s', ('x',), sys.exc_info())
+    record.event = 'monitoring_insert'
+    record.records = 3
+    record._sampled = True
+    entry = json.loads(JSONLogFormatter().format(record))
+    assert entry['level'] == 'ERROR' and entry['logger'] == 'app' and entry['message'] == 'señal x'
+    assert entry['event'] == 'monitoring_insert' and entry['records'] == 3
+    assert '_sampled' not in entry
+    assert 'RuntimeError: fallo' in entry['exception']
+
+
+def test_listener_writes_every_warning_with_a_small_queue():
+    stream = io.StringIO()
+    control = AsyncLogging(queue_size=1, sample_rate=0.0, stream=stream)
+    logger = logging.Logger('small_queue_test', logging.INFO)
+    logger.addHandler(control.handler)
+    control.listener.start()
+    control._started = True
+    for index in range(200):
+        logger.info('info %d', index)
+        logger.warning('warning %d', index)
+    control.stop()
+
+    lines = stream.getvalue().splitlines()
+    assert [line for line in lines if line.startswith('WARNING')] == [
+        f'WARNING:small_queue_test:warning {index}' for index in range(200)]
+    assert not any(line.startswith('INFO') for line in lines)
+    assert control.stats()['sampled_out'] == 200
+
+
+def test_invalid_format():
+    with pytest.raises(ValueError, match='Formato de log no soportado'):
+        AsyncLogging(log_format='xml')
+
+
+def test_listener_is_stopped_and_drained_at_exit():
+    # En un proceso aparte: configure_logging reemplaza los handlers del logger raíz
+    script = textwrap.dedent(f"""
+        import atexit
+        import logging
+        import sys
+        sys.path.insert(0, {API_DIR!r})
+        from async_logging import configure_logging
+
+        control = configure_logging(queue_size=100000)
+        logger = control.get_logger('salida')
+
+        # Registrado después, como el vaciado del buffer de ingesta en app.py:
+        # se ejecuta antes de detener el listener y su registro se escribe
+        atexit.register(lambda: logger.warning('handler de salida'))
+        for index in range(5000):
+            logger.info('info %d', index)
+        logger.error('último error')
+        # Sin control.stop(): lo hace atexit
+    """)
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    lines = result.stderr.splitlines()
+    assert lines[:5000] == [f'INFO:salida:info {index}' for index in range(5000)]
+    assert lines[5000:] == ['ERROR:salida:último error', 'WARNING:salida:handler de salida']
@@ -0,0 +1,100 @@
+"""Lectura incremental de cargas masivas (arreglo JSON, archivo de la fase 1 y NDJSON)"""
+
+import io
+import json
+
+import pytest
+
+from bulk_ingest import iter_bulk_records, BulkFormatError, MAX_VALUE_CHUNKS
+
+RECORD = {
+    'total_ram': 16000, 'porcentaje_cpu_uso': -1.5e3, 'hora': '2024-01-01 10:00:00',
+    'description': 'café é "citado"', 'activo': True, 'nulo': None, 'lista': [1, 2.25, False]
+}
+
+
+class CountingStream(io.BytesIO):
+    """BytesIO que cuenta las lecturas para comprobar que no se lee todo el cuerpo"""
+
+    reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def records(body, content_type='application/json', chunk_size=7):
+    return list(iter_bulk_records(io.BytesIO(body.encode('utf-8')), content_type, chunk_size))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 65536])
+def test_array_split_at_any_chunk_boundary(chunk_size):
+    body = json.dumps([RECORD] * 20)
+    assert records(body, chunk_size=chunk_size) == [(index, RECORD) for index in range(20)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 65536])
+def test_phase1_wrapper_skips_metadata(chunk_size):
+    body = json.dumps({'metadata': {'users': 3, 'tags': ['a', {'b': 1}]}, 'data': [RECORD, RECORD], 'extra': 1})
+    assert records(body, chunk_size=chunk_size) == [(0, RECORD), (1, RECORD)]
+
+
+def test_empty_array_and_missing_data():
+    assert records(' [ ] ') == []
+    with pytest.raises(BulkFormatError):
+        records('{"metadata": {}}')
+
+
+def test_ndjson_reports_bad_lines_and_continues():
+    body = json.dumps(RECORD) + '\n\n{"roto": \n' + json.dumps(RECORD)
+    result = records(body, 'application/x-ndjson; charset=utf-8')
+    assert [index for index, _ in result] == [0, 1, 2]
+    assert result[0][1] == RECORD and result[2][1] == RECORD
+    assert isinstance(result[1][1], BulkFormatError)
+
+
+def test_malformed_element_is_reported_then_stops():
+    body = '[' + json.dumps(RECORD) + ', {"a": 1 "b": 2}, ' + ', '.join([json.dumps(RECORD)] * 2000) + ']'
+    stream = CountingStream(body.encode('utf-8'))
+    seen = []
+    with pytest.raises(BulkFormatError):
+        for item in iter_bulk_records(stream, 'application/json', 256):
+            seen.append(item)
+    assert seen[0] == (0, RECORD)
+    assert seen[1][0] == 1 and isinstance(seen[1][1], BulkFormatError)
+    # Falla en cuanto el error queda dentro del buffer, sin leer hasta el final
+    assert stream.reads < 5
+
+
+def test_oversized_element_fails_without_reading_to_eof():
+    limit = 65536 * MAX_VALUE_CHUNKS
+    body = '[{"a": "' + 'x' * (limit * 3) + '"}]'
+    stream = CountingStream(body.encode('utf-8'))
+    with pytest.raises(BulkFormatError, match='Elemento de más de'):
+        list(iter_bulk_records(stream, 'application/json', 65536))
+    assert stream.reads <= MAX_VALUE_CHUNKS + 2
+
+
+def test_truncated_body_and_trailing_content():
+    with pytest.raises(BulkFormatError):
+        records('[' + json.dumps(RECORD) + ', {"a": ')
+    with pytest.raises(BulkFormatError, match='Contenido adicional'):
+        records('[] []')
+    with pytest.raises(BulkFormatError):
+        records('"texto"')
+
+
+def test_oversized_ndjson_line_fails_without_reading_to_eof():
+    limit = 65536 * MAX_VALUE_CHUNKS
+    body = json.dumps(RECORD) + '\n' + 'x' * (limit * 3)
+    stream = CountingStream(body.encode('utf-8'))
+    results = iter_bulk_records(stream, 'application/x-ndjson', 65536)
+    assert next(results) == (0, RECORD)
+    with pytest.raises(BulkFormatError, match='Línea de más de'):
+        next(results)
+    assert stream.reads <= MAX_VALUE_CHUNKS + 2
+
+
+def test_ndjson_last_line_without_newline_within_limit():
+    body = json.dumps(RECORD) + '\n' + json.dumps(RECORD)
+    assert records(body, 'application/x-ndjson') == [(0, RECORD), (1, RECORD)]
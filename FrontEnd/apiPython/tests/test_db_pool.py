@@ -0,0 +1,220 @@
+"""Contabilidad del pool de conexiones (sin base de datos: conexiones simuladas)"""
+
+import threading
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+import db_pool
+from db_pool import PostgresConnectionPool, PoolTimeoutError, _PooledEntry
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        pass
+
+    def fetchone(self):
+        return (1,)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.rollbacks = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return self.status
+
+
+class FakePool(PostgresConnectionPool):
+    """Pool que abre conexiones simuladas; `fail_connect` hace fallar la apertura"""
+
+    fail_connect = False
+
+    def _connect(self):
+        if self.fail_connect:
+            raise RuntimeError('base caída')
+        return _PooledEntry(FakeConnection())
+
+
+def make_pool(**kwargs):
+    options = {'min_size': 0, 'max_size': 2, 'acquire_timeout': 0.05}
+    options.update(kwargs)
+    return FakePool({}, **options)
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        make_pool(min_size=3, max_size=2)
+    with pytest.raises(ValueError):
+        make_pool(max_size=0)
+
+
+def test_warmup_opens_min_size():
+    pool = make_pool(min_size=2, max_size=4)
+    pool.warmup()
+    stats = pool.stats()
+    assert stats['idle'] == 2
+    assert stats['connections_opened'] == 2
+    assert stats['total'] == 2
+
+
+def test_getconn_opens_until_max_then_times_out():
+    pool = make_pool()
+    first, second = pool.getconn(), pool.getconn()
+    assert first is not second
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+    stats = pool.stats()
+    assert stats['in_use'] == 2
+    assert stats['connections_opened'] == 2
+    assert stats['acquired'] == 2
+    assert stats['waits'] == 1
+    assert stats['timeouts'] == 1
+
+
+def test_putconn_reuses_most_recent_connection():
+    pool = make_pool()
+    first, second = pool.getconn(), pool.getconn()
+    pool.putconn(first)
+    pool.putconn(second)
+    assert pool.getconn() is second
+    stats = pool.stats()
+    assert stats['in_use'] == 1
+    assert stats['idle'] == 1
+    assert stats['connections_opened'] == 2
+    assert stats['acquired'] == 3
+
+
+def test_putconn_rolls_back_open_transaction():
+    pool = make_pool()
+    conn = pool.getconn()
+    conn.status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_connection_recycled_after_max_uses():
+    pool = make_pool(max_uses=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    pool.putconn(conn)
+    stats = pool.stats()
+    assert conn.closed
+    assert stats['idle'] == 0
+    assert stats['connections_closed'] == 1
+    assert stats['connections_recycled'] == 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db_pool.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def keep_reusing_the_newest(pool, clock):
+    """Con LIFO solo se reutiliza la última conexión devuelta; la primera queda inactiva"""
+    oldest, newest = pool.getconn(), pool.getconn()
+    pool.putconn(oldest)
+    pool.putconn(newest)
+    for _ in range(3):
+        clock[0] += 5
+        assert pool.getconn() is newest
+        pool.putconn(newest)
+    return oldest, newest
+
+
+def test_expired_idle_connections_are_closed_on_checkin(clock):
+    pool = make_pool(max_idle_seconds=10)
+    oldest, newest = keep_reusing_the_newest(pool, clock)
+    assert oldest.closed and not newest.closed
+    stats = pool.stats()
+    assert stats['idle'] == 1
+    assert stats['connections_recycled'] == 1
+
+
+def test_checkin_keeps_min_size_idle_connections(clock):
+    pool = make_pool(min_size=2, max_idle_seconds=10)
+    oldest, _ = keep_reusing_the_newest(pool, clock)
+    assert not oldest.closed
+    assert pool.stats()['idle'] == 2
+    # Al tomarla se recicla igual que antes y se abre otra
+    pool.getconn()
+    assert pool.getconn() is not oldest
+    assert oldest.closed
+
+
+def test_checkin_without_idle_limit_keeps_connections(clock):
+    pool = make_pool(max_idle_seconds=0)
+    oldest, _ = keep_reusing_the_newest(pool, clock)
+    assert not oldest.closed
+    assert pool.stats()['idle'] == 2
+
+
+def test_discarded_and_foreign_connections_are_closed():
+    pool = make_pool()
+    conn = pool.getconn()
+    pool.putconn(conn, discard=True)
+    foreign = FakeConnection()
+    pool.putconn(foreign)
+    stats = pool.stats()
+    assert conn.closed and foreign.closed
+    assert stats['total'] == 0
+    assert stats['connections_closed'] == 1
+
+
+def test_failed_connect_releases_slot():
+    pool = make_pool(max_size=1)
+    pool.fail_connect = True
+    with pytest.raises(RuntimeError):
+        pool.getconn()
+    assert pool.stats()['opening'] == 0
+    pool.fail_connect = False
+    assert pool.getconn() is not None
+
+
+def test_waiter_gets_returned_connection():
+    pool = make_pool(max_size=1, acquire_timeout=5)
+    conn = pool.getconn()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.getconn()))
+    waiter.start()
+    while pool.stats()['waits'] == 0:
+        threading.Event().wait(0.01)
+    pool.putconn(conn)
+    waiter.join(5)
+    assert acquired == [conn]
+    stats = pool.stats()
+    assert stats['waits'] == 1
+    assert stats['max_wait_ms'] > 0
+
+
+def test_closeall_rejects_getconn():
+    pool = make_pool()
+    conn = pool.getconn()
+    pool.putconn(conn)
+    pool.closeall()
+    assert conn.closed
+    with pytest.raises(psycopg2.InterfaceError):
+        pool.getconn()
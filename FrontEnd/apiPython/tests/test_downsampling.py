@@ -0,0 +1,137 @@
+"""Reductores de series (LTTB, minmax, raw) frente a implementaciones de referencia sin numpy"""
+
+import math
+import random
+
+import pytest
+
+from downsampling import LTTBReducer, MinMaxReducer, RawReducer, _Reducer
+
+COLUMNS = ('porcentaje_cpu_uso', 'porcentaje_ram')
+
+
+def make_rows(count, buckets, seed=1):
+    """Filas (bucket, epoch, valores...) como las de width_bucket en downsample_series"""
+    rng = random.Random(seed)
+    times = sorted(1700000000 + rng.uniform(0, 3600) for _ in range(count))
+    low, high = times[0], times[-1]
+    rows = []
+    for time in times:
+        bucket = min(math.floor((time - low) / (high - low) * buckets) + 1, buckets)
+        rows.append((bucket, time) + tuple(float(rng.randint(0, 100)) for _ in COLUMNS))
+    return rows
+
+
+def bucket_averages(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row[0], []).append(row)
+    return [
+        (bucket,) + tuple(sum(values) / len(values) for values in zip(*[row[1:] for row in members]))
+        for bucket, members in sorted(grouped.items())
+    ]
+
+
+def feed_in_blocks(reducer, rows, block_size):
+    for start in range(0, len(rows), block_size):
+        reducer.feed(rows[start:start + block_size])
+    return reducer.result()
+
+
+def reference_lttb(rows, column):
+    averages = {row[0]: (row[1], row[2 + column]) for row in bucket_averages(rows)}
+    order = sorted(averages)
+    last = (rows[-1][1], rows[-1][2 + column])
+    selected = [(rows[0][1], rows[0][2 + column])]
+    for position, bucket in enumerate(order):
+        candidates = [(row[1], row[2 + column]) for row in rows[1:] if row[0] == bucket]
+        if not candidates:
+            continue
+        following = averages[order[position + 1]] if position + 1 < len(order) else last
+        previous = selected[-1]
+        best = max(candidates, key=lambda point: abs(
+            (previous[0] - following[0]) * (point[1] - previous[1])
+            - (previous[0] - point[0]) * (following[1] - previous[1])
+        ))
+        selected.append(best)
+    if selected[-1][0] != last[0]:
+        selected.append(last)
+    return selected
+
+
+def reference_minmax(rows, column):
+    points = []
+    for bucket in sorted({row[0] for row in rows}):
+        members = [(row[1], row[2 + column]) for row in rows if row[0] == bucket]
+        low = min(members, key=lambda point: point[1])
+        high = max(members, key=lambda point: point[1])
+        points += [low] if low[0] == high[0] else sorted([low, high])
+    return points
+
+
+def as_points(series):
+    return [(time, value) for time, value in zip(series['t'], series['v'])]
+
+
+def in_ms(points):
+    return [(int(round(time * 1000)), value) for time, value in points]
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 100, 5000])
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_lttb_matches_reference(block_size, seed):
+    rows = make_rows(600, 48, seed)
+    last = rows[-1][1:]
+    result = feed_in_blocks(LTTBReducer(COLUMNS, bucket_averages(rows), last), rows, block_size)
+    for index, column in enumerate(COLUMNS):
+        expected = reference_lttb(rows, index)
+        assert as_points(result[column]) == in_ms(expected)
+        # Abre con la primera fila, cierra con la última y elige un punto por bucket
+        assert len(expected) <= 48 + 2
+
+
+def test_lttb_keeps_spike():
+    rows = [(min(i // 10 + 1, 10), 1000.0 + i, 50.0, 50.0) for i in range(100)]
+    rows[55] = rows[55][:2] + (100.0, 50.0)
+    result = LTTBReducer(COLUMNS, bucket_averages(rows), rows[-1][1:])
+    result.feed(rows)
+    series = result.result()['porcentaje_cpu_uso']
+    assert 100.0 in series['v']
+    assert series['t'][0] == 1000000 and series['t'][-1] == 1099000
+
+
+@pytest.mark.parametrize('block_size', [1, 13, 5000])
+def test_minmax_matches_reference(block_size):
+    rows = make_rows(500, 25, seed=4)
+    result = feed_in_blocks(MinMaxReducer(COLUMNS), rows, block_size)
+    for index, column in enumerate(COLUMNS):
+        assert as_points(result[column]) == in_ms(reference_minmax(rows, index))
+
+
+def test_minmax_ties_keep_first_and_single_point_buckets():
+    rows = [(1, 10.0, 5.0, 1.0), (1, 11.0, 5.0, 1.0), (2, 20.0, 3.0, 2.0)]
+    result = feed_in_blocks(MinMaxReducer(COLUMNS), rows, 1)
+    assert as_points(result['porcentaje_cpu_uso']) == [(10000, 5.0), (20000, 3.0)]
+
+
+def test_raw_returns_every_row():
+    rows = make_rows(50, 1)
+    reducer = RawReducer(COLUMNS)
+    result = feed_in_blocks(reducer, [(0,) + row[1:] for row in rows], 8)
+    assert reducer.rows == 50
+    assert as_points(result['porcentaje_ram']) == in_ms([(row[1], row[3]) for row in rows])
+
+
+def test_empty_input():
+    assert RawReducer(COLUMNS).result() == {column: {'t': [], 'v': []} for column in COLUMNS}
+    assert MinMaxReducer(COLUMNS).result()['porcentaje_ram'] == {'t': [], 'v': []}
+
+
+def test_reducer_requires_segment():
+    class Incomplete(_Reducer):
+        pass
+
+    with pytest.raises(TypeError):
+        _Reducer(COLUMNS)
+    with pytest.raises(TypeError, match='_segment'):
+        Incomplete(COLUMNS)
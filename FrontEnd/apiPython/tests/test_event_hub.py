@@ -0,0 +1,57 @@
+"""Reparto de eventos a suscriptores con colas acotadas"""
+
+import json
+
+import pytest
+
+from event_hub import EventHub, NotifyListener, TooManySubscribersError
+
+
+def test_batches_are_shared_with_consecutive_ids():
+    hub = EventHub(max_batches=10)
+    first, second = hub.subscribe(), hub.subscribe()
+    hub.publish('a')
+    hub.publish_many(['b', 'c'])
+    hub.publish_many([])
+    assert first.get(0) == (1, ['a'])
+    assert second.get(0) == (1, ['a'])
+    batch = first.get(0)
+    assert batch == (2, ['b', 'c'])
+    # El mismo lote se comparte entre suscriptores, no se copia
+    assert second.get(0) is batch
+    assert first.get(0.01) is None
+    stats = hub.stats()
+    assert (stats['published'], stats['delivered'], stats['last_event_id']) == (3, 6, 3)
+
+
+def test_slow_subscriber_is_dropped_without_blocking():
+    hub = EventHub(max_batches=2)
+    slow, fast = hub.subscribe(), hub.subscribe()
+    for event in ('a', 'b'):
+        hub.publish(event)
+        fast.get(0)
+    hub.publish('c')
+    assert slow.dropped and not fast.dropped
+    assert slow.get(0) is None
+    assert fast.get(0) == (3, ['c'])
+    stats = hub.stats()
+    assert stats['subscribers'] == 1
+    assert stats['dropped_subscribers'] == 1
+
+
+def test_subscriber_limit_and_unsubscribe():
+    hub = EventHub(max_subscribers=1)
+    subscription = hub.subscribe()
+    with pytest.raises(TooManySubscribersError):
+        hub.subscribe()
+    hub.unsubscribe(subscription)
+    hub.unsubscribe(subscription)
+    assert hub.stats()['subscribers'] == 0
+    hub.subscribe()
+
+
+def test_listener_transform_skips_invalid_payloads():
+    listener = NotifyListener(EventHub(), {}, 'monitoring_data',
+                              transform=lambda payload: json.dumps(json.loads(payload)['id']))
+    assert listener._events(['{"id": 1}', 'no es json', '{"id": 2}']) == ['1', '2']
+    assert NotifyListener(EventHub(), {}, 'canal')._events(['x']) == ['x']
@@ -0,0 +1,96 @@
+"""Buffer de escritura diferida: secuencias, reintentos y vaciado al detenerse"""
+
+import threading
+import logging
+
+import pytest
+
+from ingest_buffer import WriteBehindBuffer, IngestQueueFullError
+
+
+class FlakyFlush:
+    """flush_fn que falla las primeras `failures` llamadas"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    def __call__(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('base caída')
+        self.batches.append(list(rows))
+
+
+def make_buffer(flush_fn, **kwargs):
+    options = {'batch_size': 3, 'flush_interval': 0.01, 'max_retries': 2, 'retry_backoff': 0.001}
+    options.update(kwargs)
+    return WriteBehindBuffer(flush_fn, **options)
+
+
+def test_submit_returns_consecutive_sequences_and_rejects_when_full():
+    buffer = make_buffer(FlakyFlush(), max_queue=2)
+    assert [buffer.submit('a'), buffer.submit('b')] == [1, 2]
+    with pytest.raises(IngestQueueFullError):
+        buffer.submit('c')
+    stats = buffer.stats()
+    assert stats['pending'] == 2
+    assert stats['last_sequence'] == 2
+    assert stats['rejected_rows'] == 1
+
+
+def test_failed_batch_is_retried_before_advancing():
+    flush = FlakyFlush(failures=2)
+    buffer = make_buffer(flush)
+    buffer._flush([(1, 'a'), (2, 'b')])
+    stats = buffer.stats()
+    assert flush.batches == [['a', 'b']]
+    assert stats['retries'] == 2
+    assert stats['last_flushed_sequence'] == 2
+    assert stats['failed_rows'] == 0
+
+
+def test_exhausted_retries_record_failed_sequences():
+    buffer = make_buffer(FlakyFlush(failures=3))
+    buffer._flush([(1, 'a'), (2, 'b')])
+    stats = buffer.stats()
+    assert stats['last_flushed_sequence'] == 0
+    assert stats['failed_rows'] == 2
+    assert stats['failed_sequences'] == [[1, 2]]
+
+    # Un lote posterior confirmado sí avanza la secuencia guardada
+    buffer._flush([(3, 'c')])
+    stats = buffer.stats()
+    assert stats['last_flushed_sequence'] == 3
+    assert stats['failed_sequences'] == [[1, 2]]
+    assert stats['in_flight'] == 0
+
+
+def test_stop_drains_pending_rows_in_batches():
+    flush = FlakyFlush()
+    buffer = make_buffer(flush)
+    buffer.start()
+    for row in range(7):
+        buffer.submit(row)
+    buffer.stop()
+    assert [row for batch in flush.batches for row in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in flush.batches)
+    stats = buffer.stats()
+    assert stats['pending'] == 0
+    assert stats['last_flushed_sequence'] == 7
+    with pytest.raises(IngestQueueFullError):
+        buffer.submit('tarde')
+
+
+def test_stop_logs_rows_left_when_drain_times_out(caplog):
+    release = threading.Event()
+    buffer = make_buffer(lambda rows: release.wait(5), batch_size=1)
+    buffer.start()
+    for row in range(4):
+        buffer.submit(row)
+    while buffer.stats()['in_flight'] == 0:
+        release.wait(0.01)
+    with caplog.at_level(logging.ERROR, logger='ingest_buffer'):
+        buffer.stop(timeout=0.1)
+    release.set()
+    assert any('4 registros sin guardar' in record.getMessage() for record in caplog.records)
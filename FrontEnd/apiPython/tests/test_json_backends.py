@@ -0,0 +1,104 @@
+"""Backends JSON: mismos bytes que jsonify de Flask (el formato anterior de la API)"""
+
+import importlib.util
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify, request
+from werkzeug.http import http_date
+
+from json_backends import BackendJSONProvider, format_http_date, get_json_backend
+
+COLUMNS = ['id', 'hora', 'porcentaje_ram', 'api', 'created_at']
+ROWS = [
+    (1, datetime(2024, 1, 1, 10, 0, 0), 50, 'Python', datetime(2024, 1, 1, 10, 0, 0, 123456)),
+    (2, datetime(2024, 2, 29, 23, 59, 59), 0, 'Node.js', datetime(2024, 3, 1, 0, 0, 0)),
+    (3, datetime(1999, 12, 31, 0, 0, 1), 100, 'Pythön ñandú 😀', datetime(2030, 7, 4, 12, 30, 5)),
+]
+
+DOCUMENTS = [
+    {'message': 'Datos eliminados exitosamente', 'deleted_monitoring_records': 10, 'api': 'Python'},
+    {'error': 'Datos inválidos', 'details': {'hora': 'Fecha inválida: mañana', 'campo': ['¿qué?', '€', '日本']}},
+    {'average_cpu_usage': 12.35, 'average_ram_usage': 0.0, 'max_cpu_usage': 100, 'ratio': 0.1, 'neg': -1.5},
+    {'total': Decimal('12.50'), 'grande': Decimal('123456789012345678901234567890.5'), 'exp': Decimal('1E+2')},
+    {'naive': datetime(2024, 1, 1, 10, 0, 0, 999999), 'day': date(2024, 6, 15)},
+    {'utc': datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc),
+     'offset': datetime(2024, 1, 1, 2, 30, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+     'negative': datetime(2023, 12, 31, 22, 0, tzinfo=timezone(timedelta(hours=-5)))},
+    {'zeta': 1, 'alfa': 2, 'Beta': 3, 'ñ': 4, 'n': 5, 'nested': {'b': [None, True, False], 'a': []}},
+    [1, 'dos', None, {'x': 'señal'}],
+    [],
+    {},
+]
+
+
+# Sin orjson get_json_backend('orjson') usaría json: el caso se omite
+BACKENDS = ['json', pytest.param('orjson', marks=pytest.mark.skipif(
+    importlib.util.find_spec('orjson') is None, reason='orjson no está instalado'))]
+
+
+def baseline_app():
+    return Flask('baseline')
+
+
+def backend_app(name):
+    app = Flask(f'backend_{name}')
+    app.json = BackendJSONProvider(app, get_json_backend(name, 'http'))
+    return app
+
+
+def jsonify_bytes(app, obj):
+    with app.app_context():
+        return jsonify(obj).get_data()
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_jsonify_is_byte_identical(name, document):
+    assert jsonify_bytes(backend_app(name), document) == jsonify_bytes(baseline_app(), document)
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_rows_response_matches_jsonify_of_dict_rows(name):
+    # Antes: RealDictCursor + jsonify([dict(row) for row in rows])
+    expected = jsonify_bytes(baseline_app(), [dict(zip(COLUMNS, row)) for row in ROWS])
+    app = backend_app(name)
+    with app.app_context():
+        response = app.json.rows_response(COLUMNS, ROWS)
+    assert response.get_data() == expected
+    assert response.mimetype == 'application/json'
+    assert expected.isascii()
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_ndjson_lines_match_jsonify_per_row(name):
+    baseline = baseline_app()
+    expected = b''.join(jsonify_bytes(baseline, dict(zip(COLUMNS, row))) for row in ROWS)
+    assert get_json_backend(name, 'http').dumps_lines(COLUMNS, ROWS) == expected
+
+
+@pytest.mark.parametrize('name', BACKENDS)
+def test_round_trip_through_get_json(name):
+    app = backend_app(name)
+    with app.test_request_context(json={'hora': '2024-01-01 10:00:00', 'texto': 'café'}):
+        assert request.get_json() == {'hora': '2024-01-01 10:00:00', 'texto': 'café'}
+
+
+@pytest.mark.parametrize('value', [
+    datetime(2024, 1, 1), datetime(2024, 12, 31, 23, 59, 59, 999999), datetime(1970, 1, 1),
+    datetime(2024, 3, 10, 12, 0, tzinfo=timezone(timedelta(hours=-8))), date(2000, 2, 29),
+])
+def test_format_http_date_matches_werkzeug(value):
+    assert format_http_date(value) == http_date(value)
+    # Segunda llamada desde la caché
+    assert format_http_date(value) == http_date(value)
+
+
+def test_iso_format_is_opt_in():
+    backend = get_json_backend('json', 'iso')
+    assert backend.dumps({'hora': datetime(2024, 1, 1, 10)}) == b'{"hora":"2024-01-01T10:00:00"}'
+    with pytest.raises(ValueError):
+        get_json_backend('json', 'rfc')
+    with pytest.raises(ValueError):
+        get_json_backend('ujson')
@@ -0,0 +1,54 @@
+"""Clave de idempotencia de las muestras y proyección pública de las columnas"""
+
+from datetime import datetime
+
+import pytest
+
+from monitoring import (
+    MONITORING_QUERY_COLUMNS, MONITORING_QUERY_COLUMNS_SQL, build_monitoring_values, monitoring_idempotency_key,
+    parse_fields
+)
+
+SAMPLE = {
+    'total_ram': 16000, 'ram_libre': 8000, 'uso_ram': 8000, 'porcentaje_ram': 50,
+    'porcentaje_cpu_uso': 25, 'porcentaje_cpu_libre': 75, 'procesos_corriendo': 2,
+    'total_procesos': 300, 'procesos_durmiendo': 290, 'procesos_zombie': 0,
+    'procesos_parados': 8, 'hora': '2024-01-01 10:00:00'
+}
+
+
+def key(**changes):
+    return monitoring_idempotency_key(build_monitoring_values({**SAMPLE, **changes}))
+
+
+def test_key_is_stable_sha256():
+    assert key() == key()
+    assert len(key()) == 64 and int(key(), 16) >= 0
+
+
+def test_retry_with_new_timestamp_received_is_a_replay():
+    assert key(timestamp_received='2024-01-01 10:00:01') == key(timestamp_received='2024-01-01 10:05:00')
+    # Sin timestamp_received el servidor usa la hora actual: la clave no cambia
+    assert key() == key(timestamp_received=datetime(2030, 1, 1).isoformat())
+
+
+def test_equivalent_inputs_share_key():
+    assert key(porcentaje_ram='50') == key(porcentaje_ram=50.2)
+    assert key(hora='2024-01-01T10:00:00') == key()
+
+
+@pytest.mark.parametrize('changes', [
+    {'hora': '2024-01-01 10:00:01'},
+    {'porcentaje_cpu_uso': 26},
+    {'procesos_zombie': 1},
+])
+def test_different_samples_get_different_keys(changes):
+    assert key(**changes) != key()
+
+
+def test_public_projection_excludes_internal_columns():
+    assert 'idempotency_key' not in MONITORING_QUERY_COLUMNS
+    assert MONITORING_QUERY_COLUMNS_SQL.split(', ') == list(MONITORING_QUERY_COLUMNS)
+    with pytest.raises(ValueError):
+        parse_fields('id,idempotency_key')
+    assert parse_fields('hora, id,hora') == ['id', 'hora']
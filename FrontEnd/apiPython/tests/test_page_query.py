@@ -0,0 +1,76 @@
+"""Consultas paginadas de GET /monitoring-data y cursor de los rangos de tiempo"""
+
+from datetime import datetime
+
+import pytest
+
+from monitoring import MONITORING_QUERY_COLUMNS_SQL, build_page_query, decode_range_cursor, encode_range_cursor
+
+START = datetime(2024, 1, 1, 10, 0, 0)
+END = datetime(2024, 1, 1, 11, 0, 0)
+
+
+def test_default_page_orders_by_id_with_offset():
+    query, params = build_page_query(None, None, 200, 100)
+    assert query == (f"SELECT {MONITORING_QUERY_COLUMNS_SQL} FROM fase2.monitoring_data  ORDER BY id DESC"
+                     " OFFSET %s LIMIT %s")
+    assert params == [200, 100]
+
+
+def test_id_cursors_ignore_skip():
+    query, params = build_page_query(50, None, 200, 10)
+    assert 'WHERE id < %s ORDER BY id DESC LIMIT %s' in query
+    assert 'OFFSET' not in query
+    assert params == [50, 10]
+
+    query, params = build_page_query(None, 50, 0, 10)
+    assert 'WHERE id > %s ORDER BY id ASC LIMIT %s' in query
+    assert params == [50, 10]
+
+
+def test_range_orders_by_time_field_and_id():
+    query, params = build_page_query(None, None, 0, 100, time_field='timestamp_received', start=START, end=END,
+                                     api='Python')
+    assert ('WHERE timestamp_received >= %s AND timestamp_received <= %s AND api = %s'
+            ' ORDER BY timestamp_received ASC, id ASC LIMIT %s') in query
+    assert params == [START, END, 'Python', 100]
+
+
+def test_range_cursor_is_a_row_comparison_without_offset():
+    cursor = (datetime(2024, 1, 1, 10, 30, 0, 123456), 42)
+    query, params = build_page_query(None, None, 0, 100, start=START, cursor=cursor)
+    assert 'WHERE hora >= %s AND (hora, id) > (%s, %s) ORDER BY hora ASC, id ASC LIMIT %s' in query
+    assert 'OFFSET' not in query
+    assert params == [START, cursor[0], 42, 100]
+
+
+def test_range_projection_keeps_time_field_for_the_cursor():
+    query, _ = build_page_query(None, None, 0, 10, fields=['id', 'porcentaje_ram'], start=START)
+    assert query.startswith('SELECT id, porcentaje_ram, hora FROM')
+
+    query, _ = build_page_query(None, None, 0, 10, fields=['id', 'hora'], start=START)
+    assert query.startswith('SELECT id, hora FROM')
+
+    # Sin rango la proyección es la pedida
+    query, _ = build_page_query(None, None, 0, 10, fields=['id', 'porcentaje_ram'])
+    assert query.startswith('SELECT id, porcentaje_ram FROM')
+
+
+def test_stream_without_limit():
+    query, params = build_page_query(None, None, 0, None, start=START)
+    assert 'LIMIT' not in query
+    assert params == [START]
+
+
+def test_range_cursor_round_trip_is_url_safe():
+    timestamp = datetime(2024, 1, 1, 10, 30, 0, 123456)
+    token = encode_range_cursor(timestamp, 987654321)
+    assert token.replace('-', '').replace('_', '').isalnum()
+    assert decode_range_cursor(token) == (timestamp, 987654321)
+
+
+@pytest.mark.parametrize('token', ['', 'no-es-base64!', encode_range_cursor(START, 1)[:-3], 'WzEsMl0',
+                                   'WyIyMDI0LTAxLTAxVDEwOjAwOjAwIiwiMSJd'])
+def test_invalid_range_cursor(token):
+    with pytest.raises(ValueError, match='cursor inválido'):
+        decode_range_cursor(token)
@@ -0,0 +1,287 @@
+"""Rollups: avance de la marca (tabla vacía, transacciones abiertas, wraparound) y valores agregados"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import psycopg2
+import pytest
+
+from db_pool import PostgresConnectionPool
+from monitoring import MONITORING_METRIC_COLUMNS
+from rollups import ROLLUP_LOCK_ID, RollupWorker, build_rollup_upsert
+
+START = datetime(2024, 1, 1, 10, 0, 0)
+
+
+def connect(config):
+    conn = psycopg2.connect(**config)
+    with conn.cursor() as cursor:
+        cursor.execute('SET search_path TO fase2, public')
+    conn.commit()
+    return conn
+
+
+def insert(conn, seconds, value, api='Python'):
+    """Insertar un registro cuyas columnas numéricas valen `value` (sin commit)"""
+    columns = MONITORING_METRIC_COLUMNS + ('hora', 'timestamp_received', 'api')
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO monitoring_data ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))}) RETURNING id",
+            (value,) * len(MONITORING_METRIC_COLUMNS) + (START + timedelta(seconds=seconds), START, api)
+        )
+        return cursor.fetchone()[0]
+
+
+def insert_committed(conn, *rows):
+    ids = [insert(conn, *row) for row in rows]
+    conn.commit()
+    return ids
+
+
+def query(conn, sql, params=()):
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    conn.commit()
+    return rows
+
+
+def watermark(conn):
+    rows = query(conn, "SELECT last_id FROM rollup_state WHERE name = 'monitoring_data'")
+    return rows[0][0] if rows else None
+
+
+def rollups(conn, bucket):
+    """{(inicio, api): (muestras, suma, mínimo, máximo, último)} de porcentaje_ram"""
+    rows = query(conn, """
+        SELECT bucket_start, api, sample_count, porcentaje_ram_sum, porcentaje_ram_min,
+               porcentaje_ram_max, porcentaje_ram_last
+        FROM monitoring_rollup WHERE bucket = %s
+    """, (bucket,))
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+
+def reset(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('DELETE FROM monitoring_data')
+        cursor.execute('DELETE FROM monitoring_rollup')
+        cursor.execute('DELETE FROM rollup_state')
+    conn.commit()
+
+
+@pytest.fixture
+def db(postgres):
+    conn = connect(postgres)
+    reset(conn)
+    pool = PostgresConnectionPool(postgres, min_size=0, max_size=2)
+    yield conn, pool
+    pool.closeall()
+    conn.rollback()
+    conn.close()
+
+
+def worker(pool, **options):
+    return RollupWorker(pool, MONITORING_METRIC_COLUMNS, **{'settle_seconds': 0, **options})
+
+
+def test_empty_table_keeps_the_watermark(db):
+    conn, pool = db
+    rollup = worker(pool)
+    assert rollup.run_once() == 0
+    assert rollup.last_id == 0
+    # El estado se crea dentro de la transacción que se descarta sin filas nuevas
+    assert watermark(conn) is None
+    assert rollups(conn, '1m') == {}
+
+    ids = insert_committed(conn, (0, 10))
+    assert rollup.run_once() == 1
+    assert (rollup.last_id, watermark(conn)) == (ids[0], ids[0])
+
+    # Tabla vaciada (DELETE /monitoring-data): la marca no retrocede y los ids siguen creciendo
+    query(conn, 'DELETE FROM monitoring_data RETURNING id')
+    assert rollup.run_once() == 0
+    assert (rollup.last_id, watermark(conn)) == (ids[0], ids[0])
+    assert insert_committed(conn, (1, 20))[0] > ids[0]
+    assert rollup.run_once() == 1
+
+
+def test_rollups_match_the_raw_rows(db):
+    conn, pool = db
+    rows = [(0, 10), (20, 30), (59, 20), (61, 5), (65, 7), (3, 50, 'Node.js'), (4, 40, None)]
+    insert_committed(conn, *rows)
+    assert worker(pool).run_once() == len(rows)
+
+    minute = START.replace(second=0)
+    assert rollups(conn, '1m') == {
+        (minute, 'Python'): (3, 60, 10, 30, 20),
+        (minute + timedelta(minutes=1), 'Python'): (2, 12, 5, 7, 7),
+        (minute, 'Node.js'): (1, 50, 50, 50, 50),
+        # api nula en la clave vacía
+        (minute, ''): (1, 40, 40, 40, 40),
+    }
+    assert rollups(conn, '1h')[(START.replace(minute=0), 'Python')] == (5, 72, 5, 30, 7)
+
+    # Todas las columnas numéricas se agregan igual
+    sums = query(conn, f"""
+        SELECT {', '.join(f'{column}_sum' for column in MONITORING_METRIC_COLUMNS)}
+        FROM monitoring_rollup WHERE bucket = '1h' AND api = 'Python'
+    """)
+    assert sums == [(72,) * len(MONITORING_METRIC_COLUMNS)]
+
+
+def test_new_rows_accumulate_into_existing_buckets(db):
+    conn, pool = db
+    rollup = worker(pool)
+    insert_committed(conn, (10, 10), (30, 30))
+    assert rollup.run_once() == 2
+
+    # Un registro más reciente reemplaza al último; uno con hora anterior no
+    insert_committed(conn, (40, 1), (5, 99))
+    assert rollup.run_once() == 2
+    assert rollups(conn, '1m') == {(START, 'Python'): (4, 140, 1, 99, 1)}
+    assert rollup.run_once() == 0
+    assert rollup.processed_rows == 4
+
+
+def test_settle_seconds_delays_recent_rows(db):
+    conn, pool = db
+    insert_committed(conn, (0, 10))
+    assert worker(pool, settle_seconds=3600).run_once() == 0
+    assert worker(pool).run_once() == 1
+
+
+def test_max_rows_limits_each_run(db):
+    conn, pool = db
+    ids = insert_committed(conn, *[(second, second) for second in range(5)])
+    rollup = worker(pool, max_rows=2)
+    assert [rollup.run_once() for _ in range(4)] == [2, 2, 1, 0]
+    assert watermark(conn) == ids[-1]
+    assert rollups(conn, '1m')[(START, 'Python')][:2] == (5, 10)
+
+
+def test_watermark_stops_before_an_open_transaction(db, postgres):
+    conn, pool = db
+    first = insert_committed(conn, (0, 1), (1, 2))
+    rollup = worker(pool)
+
+    # Transacción abierta con un id menor que filas ya confirmadas
+    open_conn = connect(postgres)
+    try:
+        open_id = insert(open_conn, 2, 3)
+        later = insert_committed(conn, (3, 4))
+        assert later[0] > open_id
+
+        assert rollup.run_once() == 2
+        assert watermark(conn) == first[-1]
+        # Mientras siga abierta la marca no la pasa, aunque haya filas visibles detrás
+        assert rollup.run_once() == 0
+
+        open_conn.commit()
+    finally:
+        open_conn.close()
+    assert rollup.run_once() == 2
+    assert watermark(conn) == later[0]
+    assert rollups(conn, '1m')[(START, 'Python')] == (4, 10, 1, 4, 4)
+
+
+def test_rolled_back_ids_are_skipped(db, postgres):
+    conn, pool = db
+    aborted_conn = connect(postgres)
+    try:
+        insert(aborted_conn, 0, 100)
+        aborted_conn.rollback()
+    finally:
+        aborted_conn.close()
+    ids = insert_committed(conn, (1, 1))
+    assert worker(pool).run_once() == 1
+    assert watermark(conn) == ids[0]
+
+
+def test_another_replica_holding_the_lock(db, postgres):
+    conn, pool = db
+    insert_committed(conn, (0, 1))
+    other = connect(postgres)
+    try:
+        with other.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', (ROLLUP_LOCK_ID,))
+        assert worker(pool).run_once() == 0
+        assert watermark(conn) is None
+    finally:
+        other.rollback()
+        other.close()
+    assert worker(pool).run_once() == 1
+
+
+def test_background_thread_catches_up(db):
+    conn, pool = db
+    ids = insert_committed(conn, *[(second, 1) for second in range(7)])
+    rollup = worker(pool, interval=0.05, max_rows=3)
+    rollup.start()
+    try:
+        for _ in range(200):
+            if rollup.last_id == ids[-1]:
+                break
+            threading.Event().wait(0.02)
+    finally:
+        rollup.stop()
+    assert rollup.last_id == ids[-1]
+    assert rollup.processed_rows == 7
+
+
+def test_background_errors_are_logged_once(caplog):
+    class BrokenPool:
+        def getconn(self):
+            raise RuntimeError('sin conexión')
+
+    rollup = RollupWorker(BrokenPool(), MONITORING_METRIC_COLUMNS, interval=0.01)
+    with caplog.at_level(logging.ERROR, logger='rollups'):
+        rollup.start()
+        threading.Event().wait(0.2)
+        rollup.stop()
+    assert [record.getMessage() for record in caplog.records] == ['Error actualizando rollups: sin conexión']
+
+
+def test_upsert_covers_every_metric_column():
+    query_text = build_rollup_upsert(MONITORING_METRIC_COLUMNS)
+    for column in MONITORING_METRIC_COLUMNS:
+        for suffix in ('sum', 'min', 'max', 'last'):
+            assert f'{column}_{suffix} = ' in query_text
+
+
+def test_watermark_across_transaction_id_wraparound(wrapped_postgres):
+    conn = connect(wrapped_postgres)
+    pool = PostgresConnectionPool(wrapped_postgres, min_size=0, max_size=2)
+    open_conn = connect(wrapped_postgres)
+    try:
+        rollup = worker(pool)
+        # A pocas transacciones de la vuelta (WRAPAROUND_NEXT_XID de conftest.py)
+        assert 2 ** 32 - 1000 < query(conn, 'SELECT txid_current()')[0][0] < 2 ** 32
+
+        # Transacción abierta antes de la vuelta del contador de xid
+        open_id = insert(open_conn, 0, 1000)
+        before = insert_committed(conn, (1, 1))
+
+        after = [insert_committed(conn, (2 + index % 50, 1))[0] for index in range(400)]
+        assert query(conn, 'SELECT txid_current()')[0][0] > 2 ** 32
+        assert query(conn, 'SELECT MIN(xmin::text::bigint) FROM monitoring_data')[0][0] < 1000
+        assert open_id < before[0] < after[0]
+
+        # Las filas confirmadas después de la vuelta no pasan la transacción abierta
+        assert rollup.run_once() == 0
+        assert watermark(conn) is None
+
+        open_conn.commit()
+        assert rollup.run_once() == 402
+        assert watermark(conn) == after[-1]
+        assert rollups(conn, '1m')[(START, 'Python')][:2] == (402, 1401)
+
+        # Con la transacción ya cerrada, las filas nuevas se agregan enseguida
+        later = insert_committed(conn, (5, 1))
+        assert rollup.run_once() == 1
+        assert watermark(conn) == later[0]
+    finally:
+        open_conn.close()
+        pool.closeall()
+        conn.close()
@@ -0,0 +1,171 @@
+"""Caché LRU por id y ventana de registros recientes"""
+
+import threading
+
+import pytest
+
+import row_cache
+from row_cache import RowCache, HotWindow
+
+COLUMNS = ['id', 'porcentaje_ram']
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(row_cache.time, 'monotonic', clock)
+    return clock
+
+
+class Loader:
+    """Tabla simulada: devuelve los últimos `size` ids en orden descendente"""
+
+    def __init__(self, total):
+        self.total = total
+        self.calls = 0
+
+    def __call__(self, size):
+        self.calls += 1
+        ids = range(self.total, max(0, self.total - size), -1)
+        return COLUMNS, [(record_id, record_id % 100) for record_id in ids]
+
+
+def test_row_cache_lru_eviction():
+    cache = RowCache(max_entries=2, ttl=60)
+    cache.put(1, 'a')
+    cache.put(2, 'b')
+    assert cache.get(1) == 'a'
+    cache.put(3, 'c')
+    assert cache.get(2) is None
+    assert cache.get(1) == 'a' and cache.get(3) == 'c'
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert (stats['hits'], stats['misses']) == (3, 1)
+    assert stats['hit_rate'] == 0.75
+
+
+def test_row_cache_ttl(clock):
+    cache = RowCache(max_entries=10, ttl=5)
+    cache.put('clave', 42)
+    clock.now += 4.9
+    assert cache.get('clave') == 42
+    clock.now += 0.2
+    assert cache.get('clave') is None
+    stats = cache.stats()
+    assert stats['expired'] == 1 and stats['entries'] == 0
+
+
+def test_row_cache_clear():
+    cache = RowCache()
+    cache.put(1, 'a')
+    cache.clear()
+    assert cache.get(1) is None
+    assert cache.stats()['hit_rate'] == 0.0
+
+
+def test_hot_window_serves_pages_until_max_age(clock):
+    loader = Loader(50)
+    window = HotWindow(loader, size=20, max_age=1.0)
+    columns, rows, status = window.page(0, 5)
+    assert (columns, [row[0] for row in rows], status) == (COLUMNS, [50, 49, 48, 47, 46], 'miss')
+    assert window.page(15, 5)[2] == 'hit'
+    assert window.page(18, 5) is None
+    assert loader.calls == 1
+    clock.now += 1.0
+    assert window.page(0, 5)[2] == 'miss'
+    assert loader.calls == 2
+
+
+def test_hot_window_complete_table_answers_short_pages(clock):
+    window = HotWindow(Loader(3), size=20)
+    window.page(0, 1)
+    columns, rows, status = window.page(0, 10)
+    assert ([row[0] for row in rows], status) == ([3, 2, 1], 'hit')
+
+
+def test_hot_window_add_merges_sorted_and_trims(clock):
+    window = HotWindow(Loader(10), size=5)
+    window.page(0, 5)
+    window.add(COLUMNS, [(12, 0), (11, 0)])
+    window.add(['id'], [(13,)])
+    _, rows, status = window.page(0, 5)
+    assert ([row[0] for row in rows], status) == ([12, 11, 10, 9, 8], 'hit')
+    assert window.find(7) is None
+    assert window.find(11) == (COLUMNS, (11, 0))
+    assert window.stats()['rows_added'] == 2
+
+
+def test_hot_window_invalidate_forces_reload(clock):
+    loader = Loader(10)
+    window = HotWindow(loader, size=5)
+    window.page(0, 5)
+    window.invalidate()
+    assert window.find(10) is None
+    loader.total = 12
+    _, rows, status = window.page(0, 2)
+    assert ([row[0] for row in rows], status) == ([12, 11], 'miss')
+    assert window.stats()['invalidations'] == 1
+
+
+def test_rows_added_during_reload_are_merged(clock):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader(size):
+        started.set()
+        release.wait(5)
+        return Loader(10)(size)
+
+    window = HotWindow(slow_loader, size=5)
+    reader = threading.Thread(target=window.page, args=(0, 5))
+    reader.start()
+    started.wait(5)
+    window.add(COLUMNS, [(11, 0)])
+    release.set()
+    reader.join(5)
+    _, rows, _ = window.page(0, 5)
+    assert [row[0] for row in rows] == [11, 10, 9, 8, 7]
+
+
+def test_reload_crossing_invalidation_is_not_kept(clock):
+    started, release = threading.Event(), threading.Event()
+    loader = Loader(10)
+
+    def slow_loader(size):
+        started.set()
+        release.wait(5)
+        return loader(size)
+
+    window = HotWindow(slow_loader, size=5)
+    results = []
+    reader = threading.Thread(target=lambda: results.append(window.page(0, 2)))
+    reader.start()
+    started.wait(5)
+    window.invalidate()
+    release.set()
+    reader.join(5)
+    assert [row[0] for row in results[0][1]] == [10, 9]
+    assert window.stats()['reloads'] == 0
+    assert window.find(10) is None
+
+
+def test_loader_error_propagates_and_window_recovers(clock):
+    calls = []
+
+    def failing_loader(size):
+        calls.append(size)
+        if len(calls) == 1:
+            raise RuntimeError('base caída')
+        return Loader(3)(size)
+
+    window = HotWindow(failing_loader, size=5)
+    with pytest.raises(RuntimeError):
+        window.page(0, 1)
+    assert window.page(0, 1)[2] == 'miss'
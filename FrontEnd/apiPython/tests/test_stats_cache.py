@@ -0,0 +1,221 @@
+"""Caché stale-while-revalidate de /stats: TTL, cálculo compartido e invalidación con DELETE"""
+
+import asyncio
+import threading
+
+import pytest
+
+import stats_cache
+from stats_cache import AsyncStaleWhileRevalidateCache, StaleWhileRevalidateCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(stats_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+class Blocking:
+    """compute_fn que no termina hasta que el test lo libera"""
+
+    def __init__(self, value):
+        self.value = value
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        return self.value
+
+
+def run_in_thread(function):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('value', function()))
+    thread.start()
+    return thread, result
+
+
+def test_hit_stale_and_miss(clock):
+    cache = StaleWhileRevalidateCache(ttl=5, stale_ttl=30)
+    assert cache.get('k', lambda: 1) == (1, 0.0, 'miss')
+    clock[0] += 2
+    assert cache.get('k', lambda: 2) == (1, 2, 'hit')
+
+    # Vencido el TTL: valor anterior y recálculo en segundo plano
+    clock[0] += 10
+    refresh = Blocking(3)
+    assert cache.get('k', refresh) == (1, 12, 'stale')
+    assert cache.get('k', refresh) == (1, 12, 'stale')
+    refresh.release.set()
+    assert refresh.started.wait(5)
+    for _ in range(500):
+        if cache.get('k', lambda: None)[0] == 3:
+            break
+        threading.Event().wait(0.01)
+    assert refresh.calls == 1
+    assert cache.get('k', lambda: None) == (3, 0, 'hit')
+
+    # Fuera también de la ventana stale: se recalcula en primer plano
+    clock[0] += 100
+    assert cache.get('k', lambda: 4) == (4, 0.0, 'miss')
+    stats = cache.stats()
+    assert (stats['entries'], stats['misses'], stats['shared_waits'], stats['refresh_errors']) == (1, 2, 0, 0)
+    assert stats['stale_hits'] >= 2
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = StaleWhileRevalidateCache()
+    compute = Blocking({'total': 1})
+    first, first_result = run_in_thread(lambda: cache.get('k', compute))
+    assert compute.started.wait(5)
+    second, second_result = run_in_thread(lambda: cache.get('k', lambda: pytest.fail('segundo cálculo')))
+    for _ in range(500):
+        if cache.stats()['shared_waits']:
+            break
+        threading.Event().wait(0.01)
+    compute.release.set()
+    first.join(5)
+    second.join(5)
+    assert first_result['value'] == second_result['value'] == ({'total': 1}, 0.0, 'miss')
+    assert compute.calls == 1
+
+
+def test_errors_reach_the_caller_and_are_not_cached():
+    cache = StaleWhileRevalidateCache()
+
+    def fail():
+        raise RuntimeError('sin conexión')
+
+    with pytest.raises(RuntimeError, match='sin conexión'):
+        cache.get('k', fail)
+    assert cache.get('k', lambda: 1)[2] == 'miss'
+
+
+def test_max_entries_evicts_the_least_recently_stored():
+    cache = StaleWhileRevalidateCache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.get(key, lambda: key)
+    assert cache.get('a', lambda: 'nuevo') == ('nuevo', 0.0, 'miss')
+    assert cache.get('c', lambda: None)[2] == 'hit'
+
+
+def test_computation_started_before_clear_is_not_stored():
+    cache = StaleWhileRevalidateCache()
+    before_delete = Blocking({'total': 10})
+    thread, result = run_in_thread(lambda: cache.get('k', before_delete))
+    assert before_delete.started.wait(5)
+
+    # DELETE mientras el cálculo sigue en curso
+    cache.clear()
+    # Un llamador posterior no espera el cálculo anterior: calcula de nuevo
+    after, after_result = run_in_thread(lambda: cache.get('k', lambda: {'total': 0}))
+    after.join(5)
+    before_delete.release.set()
+    thread.join(5)
+    after.join(5)
+    assert after_result['value'] == ({'total': 0}, 0.0, 'miss')
+    # Quien lo pidió antes del DELETE recibe su valor, pero no reemplaza al nuevo
+    assert result['value'] == ({'total': 10}, 0.0, 'miss')
+    assert cache.get('k', lambda: None)[:1] == ({'total': 0},)
+    assert cache.stats()['entries'] == 1
+
+
+def test_background_refresh_started_before_clear_is_not_stored(clock):
+    cache = StaleWhileRevalidateCache(ttl=5, stale_ttl=30)
+    cache.get('k', lambda: 'antes')
+    clock[0] += 10
+    refresh = Blocking('recalculado antes del DELETE')
+    assert cache.get('k', refresh)[2] == 'stale'
+    assert refresh.started.wait(5)
+    cache.clear()
+    refresh.release.set()
+    for _ in range(100):
+        threading.Event().wait(0.01)
+        if not cache._in_flight and cache.stats()['entries'] == 0:
+            break
+    assert cache.get('k', lambda: 'después') == ('después', 0.0, 'miss')
+
+
+def test_async_hit_stale_and_miss(clock):
+    async def scenario():
+        cache = AsyncStaleWhileRevalidateCache(ttl=5, stale_ttl=30)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return len(calls)
+
+        assert await cache.get('k', compute) == (1, 0.0, 'miss')
+        clock[0] += 2
+        assert await cache.get('k', compute) == (1, 2, 'hit')
+        clock[0] += 10
+        assert await cache.get('k', compute) == (1, 12, 'stale')
+        await asyncio.sleep(0)
+        assert await cache.get('k', compute) == (2, 0, 'hit')
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_async_concurrent_misses_share_one_computation():
+    async def scenario():
+        cache = AsyncStaleWhileRevalidateCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'valor'
+
+        results = await asyncio.gather(*(cache.get('k', compute) for _ in range(5)))
+        assert results == [('valor', 0.0, 'miss')] * 5
+        assert len(calls) == 1
+        assert cache.stats()['shared_waits'] == 4
+
+    asyncio.run(scenario())
+
+
+def test_async_computation_started_before_clear_is_not_stored():
+    async def scenario():
+        cache = AsyncStaleWhileRevalidateCache()
+        release = asyncio.Event()
+
+        async def before_delete():
+            await release.wait()
+            return 10
+
+        async def after_delete():
+            return 0
+
+        first = asyncio.ensure_future(cache.get('k', before_delete))
+        await asyncio.sleep(0)
+        cache.clear()
+        assert await asyncio.wait_for(cache.get('k', after_delete), 5) == (0, 0.0, 'miss')
+        release.set()
+        assert await first == (10, 0.0, 'miss')
+        assert (await cache.get('k', before_delete))[:1] == (0,)
+        assert not cache._in_flight
+
+    asyncio.run(scenario())
+
+
+def test_async_task_created_just_before_clear_is_not_stored():
+    async def scenario():
+        cache = AsyncStaleWhileRevalidateCache()
+
+        async def compute():
+            return 'antes'
+
+        # La tarea del cálculo ya existe pero clear() llega antes de que empiece
+        first = asyncio.ensure_future(cache.get('k', compute))
+        await asyncio.sleep(0)
+        assert 'k' in cache._in_flight
+        cache.clear()
+        assert await first == ('antes', 0.0, 'miss')
+        assert cache.stats()['entries'] == 0
+
+    asyncio.run(scenario())
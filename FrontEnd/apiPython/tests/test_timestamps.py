@@ -0,0 +1,107 @@
+"""TimestampParser frente a parse_datetime (el parser anterior, que queda como respaldo)"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from timestamps import TimestampParser, parse_datetime
+
+VALUES = [
+    # hora sin zona, con espacio o 'T'
+    '2024-01-01 10:00:00',
+    '2024-01-01T10:00:00',
+    '2024-01-01 10:00',
+    '2024-01-01',
+    # Con desplazamiento y sufijo 'Z'
+    '2024-01-01T10:00:00+00:00',
+    '2024-01-01T10:00:00-05:00',
+    '2024-01-01 10:00:00+05:30',
+    '2024-01-01T10:00:00Z',
+    '2024-01-01 10:00:00.250Z',
+    # Fracciones de segundo de distinta longitud
+    '2024-01-01T10:00:00.1',
+    '2024-01-01 10:00:00.123',
+    '2024-01-01T10:00:00.123456',
+    '2024-01-01T10:00:00.1234567',
+    '2024-01-01T10:00:00.123456+02:00',
+    # Espacios alrededor
+    ' 2024-01-01 10:00:00 ',
+    '\t2024-01-01T10:00:00Z\n',
+]
+
+INVALID = ['', '   ', 'ayer', '2024-13-01 10:00:00', '2024-01-01 25:00:00', '01/02/2024', None, 123, 1.5, []]
+
+
+def same(result, expected):
+    """Igualdad estricta: mismo instante y misma zona (datetime == ignora la zona)"""
+    return result == expected and result.utcoffset() == expected.utcoffset()
+
+
+@pytest.mark.parametrize('value', VALUES)
+def test_matches_old_parser(value):
+    for field in ('hora', 'timestamp_received', None):
+        assert same(TimestampParser().parse(value, field), parse_datetime(value))
+
+
+def test_matches_old_parser_when_shapes_change_between_values():
+    # Un solo parser: cada valor encuentra la forma recordada del valor anterior
+    parser = TimestampParser()
+    for value in VALUES + VALUES[::-1]:
+        assert same(parser.parse(value, 'hora'), parse_datetime(value)), value
+
+
+@pytest.mark.parametrize('value', INVALID)
+def test_invalid_input_raises_value_error_like_old_parser(value):
+    with pytest.raises(ValueError) as old:
+        parse_datetime(value)
+    parser = TimestampParser()
+    parser.parse('2024-01-01 10:00:00', 'hora')
+    with pytest.raises(ValueError) as new:
+        parser.parse(value, 'hora')
+    assert str(new.value) == str(old.value)
+
+
+def test_invalid_value_does_not_poison_the_cache():
+    parser = TimestampParser()
+    assert parser.parse('2024-01-01 10:00:00', 'hora') == datetime(2024, 1, 1, 10)
+    with pytest.raises(ValueError):
+        parser.parse('ayer', 'hora')
+    assert parser.parse('2024-01-01 10:00:00', 'hora') == datetime(2024, 1, 1, 10)
+    # Sin forma que funcione no se recuerda ninguna
+    assert parser.shapes() == {}
+
+
+def test_repeated_value_is_served_from_the_memo():
+    parser = TimestampParser()
+    first = parser.parse('2024-01-01 10:00:00', 'hora')
+    assert parser.parse('2024-01-01 10:00:00', 'hora') is first
+    assert parser.parse('2024-01-01 10:00:01', 'hora') == first + timedelta(seconds=1)
+
+
+def test_unique_fields_are_not_memoized():
+    parser = TimestampParser()
+    first = parser.parse('2024-01-01T10:00:00.123456', 'timestamp_received')
+    second = parser.parse('2024-01-01T10:00:00.123456', 'timestamp_received')
+    assert second == first and second is not first
+
+
+def test_remembers_the_shape_per_field():
+    parser = TimestampParser()
+    parser.parse('2024-01-01 10:00:00', 'hora')
+    parser.parse(' 2024-01-01T10:00:00Z ', 'timestamp_received')
+    # Solo se registran los campos que dejaron la forma por defecto (fromisoformat)
+    assert parser.shapes() == {'timestamp_received': 'iso_clean'}
+
+    # Con la forma recordada, los siguientes valores del campo se parsean igual
+    assert same(parser.parse(' 2024-01-02T00:00:00Z ', 'timestamp_received'),
+                datetime(2024, 1, 2, tzinfo=timezone.utc))
+
+
+def test_observer_receives_field_and_duration():
+    calls = []
+    parser = TimestampParser(observer=lambda field, seconds: calls.append((field, seconds)))
+    parser.parse('2024-01-01 10:00:00', 'hora')
+    with pytest.raises(ValueError):
+        parser.parse('ayer', 'hora')
+    assert [field for field, _ in calls] == ['hora', 'hora']
+    assert all(seconds >= 0 for _, seconds in calls)
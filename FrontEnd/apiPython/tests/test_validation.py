@@ -0,0 +1,97 @@
+"""Esquemas compilados: coerción, rangos, valores por defecto y errores por campo"""
+
+from datetime import datetime
+
+import pytest
+
+from validation import (
+    CompiledSchema, Field, ValidationError, MONITORING_SAMPLE_SCHEMA, METADATA_SCHEMA, PG_INT_MAX,
+    int_field, percent_field, datetime_field, text_field
+)
+
+SAMPLE = {
+    'total_ram': 16000, 'ram_libre': 8000, 'uso_ram': 8000, 'porcentaje_ram': 50,
+    'porcentaje_cpu_uso': 25, 'porcentaje_cpu_libre': 75, 'procesos_corriendo': 2,
+    'total_procesos': 300, 'procesos_durmiendo': 290, 'procesos_zombie': 0,
+    'procesos_parados': 8, 'hora': '2024-01-01 10:00:00', 'timestamp_received': '2024-01-01T10:00:01'
+}
+
+
+def test_monitoring_sample_in_column_order():
+    row = MONITORING_SAMPLE_SCHEMA(SAMPLE)
+    assert row[:11] == (16000, 8000, 8000, 50, 25, 75, 2, 300, 290, 0, 8)
+    assert row[11] == datetime(2024, 1, 1, 10, 0, 0)
+    assert row[12] == datetime(2024, 1, 1, 10, 0, 1)
+    assert row[13] == 'Python'
+
+
+def test_int_coercion_slow_path():
+    schema = CompiledSchema('prueba', [int_field('n')])
+    assert schema({'n': 7}) == (7,)
+    assert schema({'n': 7.6}) == (8,)
+    assert schema({'n': ' 12 '}) == (12,)
+    assert schema({'n': '3.4'}) == (3,)
+    assert schema({}) == (0,)
+
+
+@pytest.mark.parametrize('value', [True, float('nan'), 'inf', 'abc', None, [1], -1, PG_INT_MAX + 1])
+def test_int_rejects_invalid_values(value):
+    schema = CompiledSchema('prueba', [int_field('n')])
+    with pytest.raises(ValidationError) as error:
+        schema({'n': value})
+    assert list(error.value.errors) == ['n']
+
+
+def test_percent_range_and_defaults():
+    schema = CompiledSchema('prueba', [percent_field('p'), int_field('fase', default=2)])
+    assert schema({'p': 100}) == (100, 2)
+    with pytest.raises(ValidationError):
+        schema({'p': 101})
+
+
+def test_all_field_errors_reported_together():
+    with pytest.raises(ValidationError) as error:
+        MONITORING_SAMPLE_SCHEMA({**SAMPLE, 'porcentaje_ram': 150, 'total_ram': 'x', 'hora': 'no es fecha'})
+    assert set(error.value.errors) == {'porcentaje_ram', 'total_ram', 'hora'}
+    assert 'porcentaje_ram' in str(error.value)
+
+
+def test_missing_datetime_uses_current_time():
+    before = datetime.now()
+    row = CompiledSchema('prueba', [datetime_field('t')])({})
+    assert before <= row[0] <= datetime.now()
+
+
+def test_text_field_limits():
+    schema = CompiledSchema('prueba', [text_field('d', maximum=5)])
+    assert schema({}) == ('',)
+    assert schema({'d': None}) == ('',)
+    assert schema({'d': 'corto'}) == ('corto',)
+    with pytest.raises(ValidationError):
+        schema({'d': 'demasiado largo'})
+    with pytest.raises(ValidationError):
+        schema({'d': 5})
+
+
+def test_non_object_rejected():
+    with pytest.raises(ValidationError) as error:
+        MONITORING_SAMPLE_SCHEMA(['no', 'es', 'objeto'])
+    assert list(error.value.errors) == ['_record']
+
+
+def test_validate_many_splits_rows_and_errors():
+    rows, errors = MONITORING_SAMPLE_SCHEMA.validate_many([SAMPLE, {**SAMPLE, 'uso_ram': -5}, SAMPLE])
+    assert len(rows) == 2
+    assert [(error['index'], list(error['errors'])) for error in errors] == [(1, ['uso_ram'])]
+
+
+def test_metadata_schema_defaults():
+    row = METADATA_SCHEMA({'total_records': 10, 'description': 'fase 2'})
+    assert row[0] == 10
+    assert row[6] == 2
+    assert row[7:] == ('fase 2', 'Python')
+
+
+def test_unknown_field_kind():
+    with pytest.raises(ValueError):
+        CompiledSchema('prueba', [Field('x', 'bool')])
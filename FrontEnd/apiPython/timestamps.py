@@ -0,0 +1,120 @@
+"""
+Parseo de fechas de las muestras de monitoreo
+
+Los productores envían pocas formas de fecha: `hora` como
+"YYYY-MM-DD HH:MM:SS" y `timestamp_received` como ISO con microsegundos.
+TimestampParser recuerda por campo la última forma que funcionó y el último
+valor parseado, de modo que el camino habitual es una comparación de strings
+o una llamada a datetime.fromisoformat (implementada en C), sin regex ni
+strptime. parse_datetime queda como respaldo general para cualquier otra forma.
+"""
+
+from datetime import datetime
+from time import perf_counter
+
+def parse_datetime(date_string):
+    """Función para parsear fechas"""
+    if not date_string or not isinstance(date_string, str):
+        raise ValueError(f"Fecha inválida: {date_string}")
+    
+    # Limpiar la fecha de espacios
+    clean_date_string = date_string.strip()
+    
+    try:
+        # Intentar parsear directamente primero
+        return datetime.fromisoformat(clean_date_string.replace('Z', '+00:00'))
+    except:
+        pass
+    
+    # Si tiene microsegundos (más de 3 dígitos después del punto), truncar a milisegundos
+    if '.' in clean_date_string:
+        parts = clean_date_string.split('.')
+        if len(parts) == 2 and len(parts[1]) > 3:
+            # Truncar microsegundos a milisegundos
+            clean_date_string = f"{parts[0]}.{parts[1][:3]}"
+    
+    # Formatos específicos a intentar
+    formats = [
+        "%Y-%m-%d %H:%M:%S",
+        "%Y-%m-%dT%H:%M:%S",
+        "%Y-%m-%d %H:%M:%S.%f",
+        "%Y-%m-%dT%H:%M:%S.%f"
+    ]
+    
+    for fmt in formats:
+        try:
+            return datetime.strptime(clean_date_string, fmt)
+        except:
+            continue
+    
+    raise ValueError(f"No se pudo parsear la fecha: {date_string}")
+
+
+def _parse_iso_clean(value):
+    """Forma ISO con espacios alrededor o sufijo 'Z' (Python < 3.11)"""
+    return datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+
+class TimestampParser:
+    """Parser de fechas con caché de la última forma y del último valor por campo"""
+
+    # Formas en orden de preferencia; parse_datetime (strptime) es el último recurso
+    SHAPES = (
+        ('iso', datetime.fromisoformat),
+        ('iso_clean', _parse_iso_clean),
+        ('general', parse_datetime),
+    )
+
+    def __init__(self, memo_fields=('hora',), observer=None):
+        # Solo se memoiza el último valor de campos que se repiten entre muestras
+        # (varias muestras por segundo comparten `hora`); en campos únicos como
+        # `timestamp_received` guardar el valor solo agregaría costo
+        self.memo_fields = frozenset(memo_fields)
+        # Callback opcional observer(campo, segundos) para métricas de parseo
+        self.observer = observer
+        self._last_shape = {}
+        self._last_value = {}
+
+    def parse(self, value, field=None):
+        """Parsear `value` recordando la forma y el último valor del campo `field`"""
+        if self.observer is None:
+            return self._parse(value, field)
+        started = perf_counter()
+        try:
+            return self._parse(value, field)
+        finally:
+            self.observer(field, perf_counter() - started)
+
+    def _parse(self, value, field):
+        last = self._last_value.get(field)
+        if last is not None and last[0] == value:
+            return last[1]
+
+        shape = self._last_shape.get(field, datetime.fromisoformat)
+        try:
+            result = shape(value)
+        except TypeError:
+            # parse_datetime genera el mismo error que antes para valores no string
+            return parse_datetime(value)
+        except ValueError as error:
+            result = None
+            for _, candidate in self.SHAPES:
+                if candidate is shape:
+                    continue
+                try:
+                    result = candidate(value)
+                except ValueError as e:
+                    error = e
+                    continue
+                self._last_shape[field] = candidate
+                break
+            if result is None:
+                raise error
+
+        if field in self.memo_fields:
+            self._last_value[field] = (value, result)
+        return result
+
+    def shapes(self):
+        """Forma recordada para cada campo"""
+        names = {shape: name for name, shape in self.SHAPES}
+        return {field: names[shape] for field, shape in self._last_shape.items()}
@@ -0,0 +1,232 @@
+"""
+Validación y coerción precompilada de las muestras de monitoreo y la metadata
+
+Cada esquema se compila una sola vez en una función Python sin bucles que
+recorre los campos en una pasada: el caso común (entero dentro del rango) se
+resuelve con una comparación en línea y solo los valores que requieren
+coerción (float, string numérico) o que son inválidos pasan por el camino
+lento. Todos los errores del registro se reportan juntos.
+"""
+
+import math
+from datetime import datetime
+
+from timestamps import TimestampParser
+
+# Rango de las columnas INTEGER de PostgreSQL
+PG_INT_MAX = 2147483647
+
+_MISSING = object()
+
+
+class ValidationError(ValueError):
+    """Registro inválido; `errors` asocia cada campo con su mensaje"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(f"{field}: {message}" for field, message in errors.items()))
+
+
+class Field:
+    """Definición de un campo del esquema"""
+
+    def __init__(self, name, kind, default=0, minimum=None, maximum=None):
+        self.name = name
+        self.kind = kind
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+
+
+def int_field(name, minimum=0, maximum=PG_INT_MAX, default=0):
+    return Field(name, 'int', default, minimum, maximum)
+
+
+def percent_field(name, default=0):
+    return Field(name, 'int', default, 0, 100)
+
+
+def datetime_field(name):
+    # Si el campo no viene se usa la hora actual
+    return Field(name, 'datetime', default=None)
+
+
+def text_field(name, default='', maximum=None):
+    return Field(name, 'text', default, maximum=maximum)
+
+
+def _make_int_coercer(minimum, maximum):
+    """Camino lento para enteros: acepta float y strings numéricos y valida el rango"""
+    def coerce(value):
+        if isinstance(value, bool):
+            raise ValueError('se esperaba un número, no un booleano')
+        if isinstance(value, int):
+            number = value
+        elif isinstance(value, float):
+            if not math.isfinite(value):
+                raise ValueError('número no finito')
+            number = round(value)
+        elif isinstance(value, str):
+            try:
+                number = int(value.strip())
+            except ValueError:
+                try:
+                    number = float(value.strip())
+                except ValueError:
+                    raise ValueError(f"se esperaba un número y se recibió '{value}'")
+                if not math.isfinite(number):
+                    raise ValueError('número no finito')
+                number = round(number)
+        else:
+            raise ValueError(f"se esperaba un número y se recibió {type(value).__name__}")
+        if number < minimum or number > maximum:
+            raise ValueError(f"fuera de rango [{minimum}, {maximum}]: {number}")
+        return number
+    return coerce
+
+
+def _make_text_coercer(maximum):
+    def coerce(value):
+        if value is None:
+            return ''
+        if not isinstance(value, str):
+            raise ValueError(f"se esperaba texto y se recibió {type(value).__name__}")
+        if maximum is not None and len(value) > maximum:
+            raise ValueError(f"texto de más de {maximum} caracteres")
+        return value
+    return coerce
+
+
+def _record_error(errors, field, error):
+    errors = errors if errors is not None else {}
+    errors[field] = str(error)
+    return errors
+
+
+class CompiledSchema:
+    """Esquema compilado: validar(dict) -> tupla de valores en el orden de los campos"""
+
+    def __init__(self, name, fields, constants=()):
+        self.name = name
+        self.fields = tuple(fields)
+        self.constants = tuple(constants)
+        self.timestamp_parser = TimestampParser()
+        self._validate = self._compile()
+
+    def _compile(self):
+        namespace = {
+            'ValidationError': ValidationError,
+            '_MISSING': _MISSING,
+            '_record_error': _record_error,
+            '_now': datetime.now,
+            '_parse_ts': self.timestamp_parser.parse,
+            '_dict': dict,
+            '_int': int,
+        }
+        lines = [
+            'def validate(data):',
+            '    if type(data) is not _dict:',
+            "        raise ValidationError({'_record': 'se esperaba un objeto JSON'})",
+            '    errors = None',
+        ]
+        for index, field in enumerate(self.fields):
+            name = repr(field.name)
+            target = f"f{index}"
+            if field.kind == 'int':
+                namespace[f"coerce{index}"] = _make_int_coercer(field.minimum, field.maximum)
+                namespace[f"default{index}"] = field.default
+                lines += [
+                    f"    v = data.get({name}, default{index})",
+                    f"    if type(v) is _int and {field.minimum} <= v <= {field.maximum}:",
+                    f"        {target} = v",
+                    '    else:',
+                    '        try:',
+                    f"            {target} = coerce{index}(v)",
+                    '        except ValueError as e:',
+                    f"            errors = _record_error(errors, {name}, e)",
+                    f"            {target} = None",
+                ]
+            elif field.kind == 'datetime':
+                lines += [
+                    f"    v = data.get({name}, _MISSING)",
+                    '    if v is _MISSING:',
+                    f"        {target} = _now()",
+                    '    else:',
+                    '        try:',
+                    f"            {target} = _parse_ts(v, {name})",
+                    '        except ValueError as e:',
+                    f"            errors = _record_error(errors, {name}, e)",
+                    f"            {target} = None",
+                ]
+            elif field.kind == 'text':
+                namespace[f"coerce{index}"] = _make_text_coercer(field.maximum)
+                namespace[f"default{index}"] = field.default
+                lines += [
+                    f"    v = data.get({name}, default{index})",
+                    '    try:',
+                    f"        {target} = coerce{index}(v)",
+                    '    except ValueError as e:',
+                    f"        errors = _record_error(errors, {name}, e)",
+                    f"        {target} = None",
+                ]
+            else:
+                raise ValueError(f"Tipo de campo desconocido: {field.kind}")
+
+        namespace['constants'] = self.constants
+        targets = ', '.join(f"f{index}" for index in range(len(self.fields)))
+        lines += [
+            '    if errors is not None:',
+            '        raise ValidationError(errors)',
+            f"    return ({targets},) + constants",
+        ]
+        exec(compile('\n'.join(lines), f"<schema {self.name}>", 'exec'), namespace)
+        return namespace['validate']
+
+    def __call__(self, data):
+        """Validar y convertir un registro; lanza ValidationError con todos sus errores"""
+        return self._validate(data)
+
+    def validate_many(self, records):
+        """
+        Validar una lista de registros.
+
+        Devuelve (filas_válidas, errores) donde errores es una lista de
+        {'index': i, 'errors': {...}} para los registros rechazados.
+        """
+        validate = self._validate
+        rows = []
+        errors = []
+        for index, record in enumerate(records):
+            try:
+                rows.append(validate(record))
+            except ValidationError as e:
+                errors.append({'index': index, 'errors': e.errors})
+        return rows, errors
+
+
+MONITORING_SAMPLE_SCHEMA = CompiledSchema('monitoring_sample', [
+    int_field('total_ram'),
+    int_field('ram_libre'),
+    int_field('uso_ram'),
+    percent_field('porcentaje_ram'),
+    percent_field('porcentaje_cpu_uso'),
+    percent_field('porcentaje_cpu_libre'),
+    int_field('procesos_corriendo'),
+    int_field('total_procesos'),
+    int_field('procesos_durmiendo'),
+    int_field('procesos_zombie'),
+    int_field('procesos_parados'),
+    datetime_field('hora'),
+    datetime_field('timestamp_received'),
+], constants=('Python',))  # Campo api con valor 'Python'
+
+METADATA_SCHEMA = CompiledSchema('metadata', [
+    int_field('total_records'),
+    datetime_field('collection_start'),
+    datetime_field('collection_end'),
+    int_field('duration_minutes'),
+    int_field('users'),
+    datetime_field('generated_at'),
+    int_field('phase', default=2),
+    text_field('description'),
+], constants=('Python',))  # Campo api con valor 'Python'
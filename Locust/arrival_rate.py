@@ -0,0 +1,247 @@
+"""
+Carga de lazo abierto (tasa de llegadas fija) para phase2_sender
+
+Con wait_time cada usuario espera a su respuesta antes de volver a enviar: si
+la API se vuelve lenta la carga ofrecida baja justo cuando más importa
+(coordinated omission). Con --arrival-rate un greenlet programa los envíos
+según el perfil (constant, ramp o step) sin mirar las respuestas y los
+publica en una cola; los usuarios solo toman el siguiente envío programado.
+La latencia se reporta desde el instante programado, de modo que incluye la
+espera cuando todos los usuarios están ocupados: -u es la concurrencia máxima.
+
+Perfiles (duración D = --arrival-duration, tasa final R = --arrival-rate):
+- constant: R peticiones/s durante D
+- ramp: lineal desde --arrival-start-rate hasta R durante D
+- step: --arrival-steps escalones iguales desde --arrival-start-rate hasta R
+
+En modo distribuido cada worker programa su parte de la tasa (tasa / workers)
+y el master detiene la prueba al terminar el perfil.
+"""
+
+import math
+import time
+
+from distributed import Cluster
+
+PROFILES = ('constant', 'ramp', 'step')
+
+
+class ArrivalProfile:
+    """Tasa de llegadas como tramos lineales (t0, t1, tasa0, tasa1)"""
+
+    def __init__(self, shape, rate, duration, start_rate=None, steps=5):
+        if shape not in PROFILES:
+            raise ValueError(f"Perfil de carga no soportado: {shape}")
+        if rate <= 0 or duration <= 0:
+            raise ValueError("La tasa y la duración deben ser mayores que 0")
+        self.shape = shape
+        self.rate = rate
+        self.duration = duration
+
+        if shape == 'constant':
+            self.segments = [(0.0, duration, rate, rate)]
+        elif shape == 'ramp':
+            start_rate = 0.0 if start_rate is None else start_rate
+            self.segments = [(0.0, duration, start_rate, rate)]
+        else:
+            steps = max(1, steps)
+            start_rate = rate / steps if start_rate is None else start_rate
+            length = duration / steps
+            self.segments = []
+            for step in range(steps):
+                level = rate if steps == 1 else start_rate + (rate - start_rate) * step / (steps - 1)
+                self.segments.append((step * length, (step + 1) * length, level, level))
+
+    def rate_at(self, offset):
+        for t0, t1, r0, r1 in self.segments:
+            if t0 <= offset < t1:
+                return r0 + (r1 - r0) * (offset - t0) / (t1 - t0)
+        return 0.0
+
+    def expected_total(self):
+        return sum((r0 + r1) / 2 * (t1 - t0) for t0, t1, r0, r1 in self.segments)
+
+    def arrivals(self):
+        """Segundos desde el inicio de cada envío programado
+
+        El envío k ocurre cuando la integral de la tasa llega a k; en cada tramo
+        lineal eso es una ecuación de segundo grado."""
+        count = 1
+        base = 0.0
+        for t0, t1, r0, r1 in self.segments:
+            length = t1 - t0
+            slope = (r1 - r0) / (2 * length)
+            segment_total = (r0 + r1) / 2 * length
+            while count - base <= segment_total:
+                remaining = count - base
+                if slope == 0:
+                    x = remaining / r0
+                else:
+                    x = (-r0 + math.sqrt(max(0.0, r0 * r0 + 4 * slope * remaining))) / (2 * slope)
+                yield t0 + min(x, length)
+                count += 1
+            base += segment_total
+
+
+class ArrivalScheduler:
+    """Programa los envíos en un greenlet y los entrega a los usuarios"""
+
+    def __init__(self):
+        self.enabled = False
+        self.profile = None
+        self.finished = False
+        self._queue = None
+        self._greenlet = None
+        self._started_perf = 0.0
+        self._started_wall = 0.0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.scheduled = 0
+        self.dispatched = 0
+        self.max_backlog = 0
+        self.max_start_delay = 0.0
+        self._start_delay_total = 0.0
+
+    def start(self, profile, on_finish=None):
+        import gevent
+        from gevent.queue import Queue
+
+        self.enabled = True
+        self.finished = False
+        self.profile = profile
+        self.reset_stats()
+        self._queue = Queue()
+        self._started_perf = time.perf_counter()
+        self._started_wall = time.time()
+        self._greenlet = gevent.spawn(self._run, on_finish)
+
+    def _run(self, on_finish):
+        import gevent
+
+        for offset in self.profile.arrivals():
+            scheduled = self._started_perf + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                gevent.sleep(delay)
+            self._queue.put(scheduled)
+            self.scheduled += 1
+            self.max_backlog = max(self.max_backlog, self._queue.qsize())
+        self.finished = True
+
+        # Esperar a que se tomen los envíos pendientes antes de terminar
+        while self._queue.qsize():
+            gevent.sleep(0.1)
+        if on_finish is not None:
+            on_finish()
+
+    def next_arrival(self):
+        """Instante programado (perf_counter) del siguiente envío, o None al terminar el perfil"""
+        from gevent.queue import Empty
+
+        while True:
+            try:
+                scheduled = self._queue.get(timeout=0.5)
+            except Empty:
+                if self.finished or not self.enabled:
+                    return None
+                continue
+            start_delay = time.perf_counter() - scheduled
+            self.dispatched += 1
+            self._start_delay_total += start_delay
+            self.max_start_delay = max(self.max_start_delay, start_delay)
+            return scheduled
+
+    def measure_from_schedule(self, response, scheduled, sent_at):
+        """Reportar la latencia desde el instante programado en vez del envío real"""
+        meta = getattr(response, 'request_meta', None)
+        if meta is None:
+            return
+        meta['response_time'] = meta['response_time'] + (sent_at - scheduled) * 1000
+        meta['start_time'] = self._started_wall + (scheduled - self._started_perf)
+
+    def stop(self):
+        if self._greenlet is not None:
+            self._greenlet.kill(block=False)
+            self._greenlet = None
+        self.finished = True
+
+    def summary(self):
+        return {
+            'scheduled': self.scheduled,
+            'dispatched': self.dispatched,
+            'max_backlog': self.max_backlog,
+            'mean_start_delay_ms': round(self._start_delay_total / self.dispatched * 1000, 2) if self.dispatched else 0.0,
+            'max_start_delay_ms': round(self.max_start_delay * 1000, 2),
+        }
+
+
+def install(locust_events=None, cluster=None):
+    """Registrar las opciones --arrival-* y sus listeners; devuelve el programador"""
+    if locust_events is None:
+        from locust import events as locust_events
+    if cluster is None:
+        cluster = Cluster()
+
+    scheduler = ArrivalScheduler()
+
+    @locust_events.init_command_line_parser.add_listener
+    def _add_arguments(parser):
+        group = parser.add_argument_group('Tasa de llegadas fija (lazo abierto)')
+        group.add_argument('--arrival-rate', type=float, default=0.0, env_var='LOCUST_ARRIVAL_RATE',
+                           help='Peticiones/s objetivo (final en ramp/step); 0 usa wait_time (lazo cerrado)')
+        group.add_argument('--arrival-shape', type=str, default='constant', choices=PROFILES,
+                           env_var='LOCUST_ARRIVAL_SHAPE', help='Perfil de la tasa de llegadas')
+        group.add_argument('--arrival-start-rate', type=float, default=None, env_var='LOCUST_ARRIVAL_START_RATE',
+                           help='Tasa inicial de ramp (0 por defecto) y step (tasa/escalones por defecto)')
+        group.add_argument('--arrival-steps', type=int, default=5, env_var='LOCUST_ARRIVAL_STEPS',
+                           help='Cantidad de escalones del perfil step')
+        group.add_argument('--arrival-duration', type=float, default=60.0, env_var='LOCUST_ARRIVAL_DURATION',
+                           help='Duración del perfil en segundos; al terminar se detiene la prueba')
+
+    @locust_events.test_start.add_listener
+    def _on_test_start(environment, **kwargs):
+        options = getattr(environment, 'parsed_options', None)
+        rate = getattr(options, 'arrival_rate', 0.0)
+        scheduler.enabled = rate > 0
+        if not scheduler.enabled:
+            return
+        duration = getattr(options, 'arrival_duration', 60.0)
+        if cluster.is_master:
+            # Los workers programan los envíos; el master solo termina la prueba
+            print(f"🎯 Lazo abierto: hasta {rate:g} peticiones/s entre {cluster.count} workers durante {duration:g}s")
+            scheduler.enabled = False
+            import gevent
+
+            gevent.spawn_later(duration + 1.0, environment.runner.quit)
+            return
+
+        start_rate = getattr(options, 'arrival_start_rate', None)
+        profile = ArrivalProfile(
+            getattr(options, 'arrival_shape', 'constant'), cluster.share(rate), duration,
+            None if start_rate is None else cluster.share(start_rate),
+            getattr(options, 'arrival_steps', 5),
+        )
+        print(f"🎯 Lazo abierto ({cluster.label}): perfil {profile.shape}, hasta {profile.rate:g} peticiones/s "
+              f"durante {profile.duration:g}s (~{profile.expected_total():.0f} envíos)")
+
+        def on_finish():
+            print(f"🏁 Perfil de llegadas completado ({cluster.label})")
+            if not cluster.is_worker and environment.runner is not None:
+                environment.runner.quit()
+
+        scheduler.start(profile, on_finish)
+
+    @locust_events.test_stop.add_listener
+    def _on_test_stop(environment, **kwargs):
+        if not scheduler.enabled:
+            return
+        scheduler.stop()
+        summary = scheduler.summary()
+        print(f"🎯 ({cluster.label}) Envíos programados: {summary['scheduled']}, realizados: {summary['dispatched']}, "
+              f"cola máxima: {summary['max_backlog']}, retraso de inicio medio/máximo: "
+              f"{summary['mean_start_delay_ms']} / {summary['max_start_delay_ms']} ms")
+        if summary['max_backlog'] > 1 and summary['max_start_delay_ms'] > 100:
+            print("⚠️  Los envíos esperaron usuarios libres: la API no sostuvo la tasa o -u es muy bajo")
+
+    return scheduler
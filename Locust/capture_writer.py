@@ -0,0 +1,232 @@
+"""
+Captura de registros de la fase 1 en NDJSON, con memoria constante
+
+Cada respuesta de /metrics se encola y un hilo escritor la serializa como una
+línea JSON, en lotes, con un flush periódico: si el proceso muere solo se
+pierde el último intervalo. Dentro de Locust threading está parcheado por
+gevent y ese hilo es un greenlet: la escritura de cada lote (y la compresión)
+se pasa al threadpool de gevent para no bloquear el loop de los usuarios. Con compresión gzip cada flush es un sync flush,
+así que el archivo se puede leer hasta ese punto. Al cerrar se escribe la
+metadata en un archivo aparte (<captura>.meta.json).
+
+read_capture() lee tanto NDJSON (.ndjson / .ndjson.gz) como el formato
+anterior {"metadata": ..., "data": [...]}.
+
+En modo distribuido cada worker escribe su propia captura
+(<captura>.worker<N>.ndjson) y merge_captures() las combina en una sola,
+ordenada por timestamp_received.
+
+Convertir una captura al formato anterior:
+    python capture_writer.py captura.ndjson.gz locust_output_202201947.json
+"""
+
+import gzip
+import heapq
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+_STOP = object()
+
+
+def metadata_path(path):
+    """Ruta del archivo de metadata de una captura"""
+    return f"{path}.meta.json"
+
+
+def worker_capture_path(path, index):
+    """Ruta de la captura de un worker: captura.ndjson -> captura.worker<N>.ndjson"""
+    base, marker, extension = path.partition('.ndjson')
+    if not marker:
+        return f"{path}.worker{index}"
+    return f"{base}.worker{index}{marker}{extension}"
+
+
+def _blocking_io():
+    """Ejecutor de la E/S del archivo: el threadpool de gevent si threading está parcheado"""
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        monkey = None
+    if monkey is not None and monkey.is_module_patched('threading'):
+        return get_hub().threadpool.apply
+    return lambda function, args=(): function(*args)
+
+
+def _open_text(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class CaptureWriter:
+    """Escritor NDJSON en segundo plano con cola acotada"""
+
+    def __init__(self, path, compress=False, batch_size=500, flush_interval=1.0, max_queue=10000):
+        if compress and not path.endswith('.gz'):
+            path += '.gz'
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.count = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.error = None
+        self._file = None
+        self._thread = None
+        self._io = None
+
+    def start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # La metadata marca una captura terminada: la de una ejecución anterior ya no aplica
+        if os.path.exists(metadata_path(self.path)):
+            os.remove(metadata_path(self.path))
+        self._file = _open_text(self.path, 'w')
+        self._io = _blocking_io()
+        self._thread = threading.Thread(target=self._run, name='capture-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, record):
+        """Encolar un registro; si la cola está llena espera al escritor (memoria acotada)"""
+        timestamp = record.get('timestamp_received')
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+        self.count += 1
+        self.queue.put(record)
+
+    def _write_batch(self, batch):
+        self._file.write(''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in batch
+        ))
+
+    def _run(self):
+        batch = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            stopping = item is _STOP
+            if item is not None and not stopping:
+                batch.append(item)
+
+            due = stopping or time.monotonic() - last_flush >= self.flush_interval
+            try:
+                if batch and (due or len(batch) >= self.batch_size):
+                    self._io(self._write_batch, (batch,))
+                    batch = []
+                if due:
+                    self._io(self._file.flush)
+                    last_flush = time.monotonic()
+            except OSError as e:
+                # Se reporta al cerrar; los registros siguientes se descartan
+                self.error = e
+                batch = []
+
+            if stopping:
+                return
+
+    def close(self, metadata=None):
+        """Escribir lo pendiente, cerrar el archivo y escribir la metadata"""
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+
+        if metadata is not None:
+            write_metadata(self.path, metadata)
+        if self.error is not None:
+            raise self.error
+
+
+def write_metadata(path, metadata):
+    """Escribir <captura>.meta.json"""
+    with open(metadata_path(path), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+
+def read_metadata(path):
+    """Metadata de una captura NDJSON (archivo aparte) o del formato anterior"""
+    if os.path.exists(metadata_path(path)):
+        with open(metadata_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('metadata', {})
+    return {}
+
+
+def read_capture(path):
+    """Iterar los registros de una captura NDJSON (.gz opcional) o del formato anterior"""
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)['data']
+        return
+    with _open_text(path, 'r') as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea truncada de una captura interrumpida
+                    return
+        except EOFError:
+            # gzip sin cerrar: se leyó hasta el último flush
+            return
+
+
+def merge_captures(sources, destination):
+    """Combinar capturas ordenadas por timestamp_received en una sola (sin cargarlas en memoria)
+
+    Devuelve (registros, primer timestamp_received, último timestamp_received)."""
+    streams = [read_capture(source) for source in sources]
+    count = 0
+    first = last = None
+    with _open_text(destination, 'w') as out:
+        for record in heapq.merge(*streams, key=lambda record: record.get('timestamp_received') or ''):
+            out.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            out.write('\n')
+            timestamp = record.get('timestamp_received')
+            if first is None:
+                first = timestamp
+            last = timestamp
+            count += 1
+    return count, first, last
+
+
+def to_legacy_json(source, destination):
+    """Convertir una captura NDJSON al formato {"metadata", "data"} sin cargarla en memoria"""
+    metadata = read_metadata(source)
+    with open(destination, 'w', encoding='utf-8') as out:
+        out.write('{\n  "metadata": ')
+        out.write(json.dumps(metadata, ensure_ascii=False))
+        out.write(',\n  "data": [')
+        first = True
+        for record in read_capture(source):
+            out.write('\n    ' if first else ',\n    ')
+            out.write(json.dumps(record, ensure_ascii=False))
+            first = False
+        out.write('\n  ]\n}\n')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Uso: python capture_writer.py <captura.ndjson[.gz]> <salida.json>')
+        sys.exit(1)
+    to_legacy_json(sys.argv[1], sys.argv[2])
+    print(f"✅ {sys.argv[2]} generado")
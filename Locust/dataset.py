@@ -0,0 +1,236 @@
+"""
+Lectura de la captura de la fase 1 con mmap para phase2_sender
+
+El archivo se mapea en memoria y se construye una sola vez un índice con el
+offset de cada registro; los registros se decodifican solo cuando se piden.
+Varios workers de Locust en la misma máquina comparten las páginas del
+archivo a través del caché del sistema operativo en vez de tener cada uno una
+lista de dicts.
+
+Formatos:
+- NDJSON (.ndjson), escrito por capture_writer.py. El índice se arma
+  recorriendo el archivo una vez al abrirlo.
+- Binario (.bin): encabezado, tabla de offsets y los registros como JSON
+  compacto. El índice ya viene en el archivo, no se recorre nada.
+- .ndjson.gz y el JSON anterior no se pueden mapear: se descomprimen una vez
+  a un NDJSON temporal.
+
+Convertir una captura al formato binario:
+    python dataset.py locust_output_202201947.ndjson locust_output_202201947.bin
+"""
+
+import itertools
+import json
+import logging
+import mmap
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+from capture_writer import metadata_path, read_capture, read_metadata
+
+logger = logging.getLogger(__name__)
+
+BINARY_MAGIC = b'P2DSET01'
+# Firma y cantidad de registros; le sigue la tabla de count + 1 offsets (uint64)
+_HEADER = struct.Struct('<8sQ')
+
+SAMPLING_MODES = ('random', 'sequential', 'shard')
+
+
+def _little_endian(offsets):
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+    return offsets
+
+
+class Dataset:
+    """Captura mapeada en memoria con acceso a registros por índice"""
+
+    def __init__(self, path):
+        self.path = path
+        self.metadata = read_metadata(path)
+        self._temp_path = None
+
+        if path.endswith('.gz') or path.endswith('.json'):
+            logger.warning(f"{path} no se puede mapear; se descomprime a un NDJSON temporal "
+                           f"(conviértalo con dataset.py para evitarlo)")
+            path = self._temp_path = _decompress(path)
+
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Archivo vacío: mmap no admite longitud 0
+            self._mmap = b''
+
+        self.binary = self._mmap[:len(BINARY_MAGIC)] == BINARY_MAGIC
+        if self.binary:
+            self._base, self._offsets = self._binary_index()
+        else:
+            self._base, self._offsets = 0, self._ndjson_index()
+        self._sequence = itertools.count()
+
+    def _binary_index(self):
+        _, count = _HEADER.unpack_from(self._mmap, 0)
+        table_end = _HEADER.size + 8 * (count + 1)
+        offsets = array('Q')
+        offsets.frombytes(self._mmap[_HEADER.size:table_end])
+        return table_end, _little_endian(offsets)
+
+    def _ndjson_index(self):
+        """Offsets de inicio de cada línea no vacía más el fin de la última"""
+        data = self._mmap
+        size = len(data)
+        starts = array('Q')
+        ends = array('Q')
+        position = 0
+        while position < size:
+            end = data.find(b'\n', position)
+            if end == -1:
+                end = size
+            if data[position:end].strip():
+                starts.append(position)
+                ends.append(end)
+            position = end + 1
+
+        # Una captura interrumpida puede terminar con una línea incompleta
+        if ends and ends[-1] == size and size and data[size - 1:size] != b'\n':
+            try:
+                json.loads(data[starts[-1]:size])
+            except ValueError:
+                starts.pop()
+                ends.pop()
+
+        self._ends = ends
+        return starts
+
+    def __len__(self):
+        return len(self._offsets) - 1 if self.binary else len(self._offsets)
+
+    def raw(self, index):
+        """Bytes JSON del registro, sin decodificar"""
+        if self.binary:
+            return self._mmap[self._base + self._offsets[index]:self._base + self._offsets[index + 1]]
+        return self._mmap[self._offsets[index]:self._ends[index]]
+
+    def record(self, index):
+        """Registro decodificado como dict"""
+        return json.loads(self.raw(index))
+
+    def __getitem__(self, index):
+        return self.record(index)
+
+    def next_sequential(self):
+        """Siguiente valor de un contador compartido por todos los usuarios del proceso"""
+        return next(self._sequence)
+
+    def sampler(self, mode='random', user_index=0, user_count=1, seed=None, start=0, end=None):
+        """Selector de índices para un usuario dentro de [start, end) (la parte de un worker)"""
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Modo de muestreo no soportado: {mode}")
+        end = len(self) if end is None else min(end, len(self))
+        if start >= end:
+            raise ValueError(f"La captura {self.path} no tiene registros en [{start}, {end})")
+        if mode == 'random':
+            return RandomSampler(start, end, None if seed is None else seed + user_index)
+        if mode == 'sequential':
+            return SequentialSampler(self, start, end)
+        return ShardSampler(start, end, user_index, user_count)
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+        if self._temp_path:
+            os.unlink(self._temp_path)
+            self._temp_path = None
+
+
+class RandomSampler:
+    """Índices uniformes al azar (con semilla, reproducibles por usuario)"""
+
+    def __init__(self, start, end, seed=None):
+        self.start = start
+        self.end = end
+        self._random = random.Random(seed) if seed is not None else random
+
+    def next_index(self):
+        return self._random.randrange(self.start, self.end)
+
+
+class SequentialSampler:
+    """Recorre la captura en orden; los usuarios se reparten los registros consecutivos"""
+
+    def __init__(self, dataset, start, end):
+        self.dataset = dataset
+        self.start = start
+        self.size = end - start
+
+    def next_index(self):
+        return self.start + self.dataset.next_sequential() % self.size
+
+
+class ShardSampler:
+    """Cada usuario recorre en orden su propio bloque contiguo de la captura"""
+
+    def __init__(self, start, end, user_index, user_count):
+        size = end - start
+        user_count = max(1, user_count)
+        user_index %= user_count
+        self.start = start + size * user_index // user_count
+        self.end = start + size * (user_index + 1) // user_count
+        if self.start == self.end:
+            # Más usuarios que registros: un registro por usuario
+            self.start = start + user_index % size
+            self.end = self.start + 1
+        self._position = self.start
+
+    def next_index(self):
+        index = self._position
+        self._position = index + 1 if index + 1 < self.end else self.start
+        return index
+
+
+def _decompress(path):
+    """Escribir una captura comprimida o en el formato anterior como NDJSON temporal"""
+    handle, temp_path = tempfile.mkstemp(prefix='phase2_dataset_', suffix='.ndjson')
+    with os.fdopen(handle, 'w', encoding='utf-8') as out:
+        for record in read_capture(path):
+            out.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            out.write('\n')
+    return temp_path
+
+
+def write_binary(source, destination):
+    """Convertir una captura al formato binario (copia también la metadata)"""
+    offsets = array('Q', [0])
+    with tempfile.TemporaryFile() as body:
+        for record in read_capture(source):
+            payload = json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            body.write(payload)
+            offsets.append(offsets[-1] + len(payload))
+
+        with open(destination, 'wb') as out:
+            out.write(_HEADER.pack(BINARY_MAGIC, len(offsets) - 1))
+            out.write(_little_endian(offsets).tobytes())
+            body.seek(0)
+            shutil.copyfileobj(body, out)
+
+    metadata = read_metadata(source)
+    if metadata:
+        with open(metadata_path(destination), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+    return len(offsets) - 1
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Uso: python dataset.py <captura.ndjson[.gz]|captura.json> <salida.bin>')
+        sys.exit(1)
+    total = write_binary(sys.argv[1], sys.argv[2])
+    print(f"✅ {sys.argv[2]} generado con {total} registros")
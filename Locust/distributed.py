@@ -0,0 +1,90 @@
+"""
+Modo distribuido de Locust (master y workers en la misma máquina)
+
+Locust reparte los usuarios entre workers con --processes (-1 = un worker por
+núcleo). Este módulo solo agrega lo que los scripts necesitan saber para
+repartir su propio trabajo: el rol del proceso, el índice del worker y la
+cantidad de workers. El master envía la cantidad al iniciar cada prueba,
+antes de la orden de crear usuarios, así que ya está disponible en el
+test_start de los workers.
+
+    cluster = distributed.install()
+    ...
+    inicio, fin = cluster.partition(len(registros))
+"""
+
+LOCAL = 'local'
+MASTER = 'master'
+WORKER = 'worker'
+
+
+def runner_role(runner):
+    """local, master o worker según el tipo de runner de Locust"""
+    from locust.runners import MasterRunner, WorkerRunner
+
+    if isinstance(runner, MasterRunner):
+        return MASTER
+    if isinstance(runner, WorkerRunner):
+        return WORKER
+    return LOCAL
+
+
+class Cluster:
+    """Rol del proceso y reparto de trabajo entre workers"""
+
+    def __init__(self):
+        self.role = LOCAL
+        self.index = 0
+        self.count = 1
+
+    @property
+    def is_master(self):
+        return self.role == MASTER
+
+    @property
+    def is_worker(self):
+        return self.role == WORKER
+
+    @property
+    def label(self):
+        return f"worker {self.index}" if self.is_worker else self.role
+
+    def share(self, total):
+        """Parte de una cantidad (usuarios, peticiones/s) que le toca a este worker"""
+        return total / self.count
+
+    def partition(self, size):
+        """Rango [inicio, fin) contiguo de `size` elementos que le toca a este worker"""
+        start = size * self.index // self.count
+        end = size * (self.index + 1) // self.count
+        if start == end and size:
+            # Más workers que elementos: un elemento por worker
+            start = self.index % size
+            end = start + 1
+        return start, end
+
+
+def install(locust_events=None):
+    """Registrar los listeners del reparto; devuelve el Cluster del proceso"""
+    if locust_events is None:
+        from locust import events as locust_events
+
+    cluster = Cluster()
+
+    def _on_cluster_info(environment, msg, **kwargs):
+        cluster.index = max(0, environment.runner.worker_index)
+        cluster.count = max(1, msg.data['workers'])
+
+    @locust_events.init.add_listener
+    def _on_init(environment, **kwargs):
+        cluster.role = runner_role(environment.runner)
+        if cluster.is_worker:
+            environment.runner.register_message('cluster_info', _on_cluster_info)
+
+    @locust_events.test_start.add_listener
+    def _on_test_start(environment, **kwargs):
+        if cluster.is_master:
+            cluster.count = max(1, environment.runner.worker_count)
+            environment.runner.send_message('cluster_info', {'workers': cluster.count})
+
+    return cluster
@@ -0,0 +1,452 @@
+"""
+Reporte de resultados de las pruebas de carga (fase 1 y fase 2)
+
+Registra cada petición de Locust en un histograma de latencias tipo HDR por
+endpoint (3 dígitos significativos, percentiles p50/p90/p99/p99.9) y en una
+línea de tiempo de throughput por segundo. Al terminar la prueba exporta los
+resultados a JSON y CSV y, si se indica una línea base (un JSON de una
+ejecución anterior), compara los percentiles y marca la prueba como fallida
+cuando algún endpoint empeora más que el umbral.
+
+Uso desde un locustfile:
+    import load_report
+    report = load_report.install('fase2')
+
+Opciones agregadas a la línea de comandos de Locust:
+    --report-dir        carpeta de salida (reports)
+    --report-baseline   JSON de una ejecución anterior para comparar
+    --report-threshold  empeoramiento máximo permitido en % (10)
+
+En modo distribuido (--processes) cada worker registra sus peticiones y al
+detenerse envía su parte al master, que las combina y escribe el reporte.
+"""
+
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from distributed import LOCAL, MASTER, WORKER, runner_role
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+# Endpoints con menos muestras no se comparan contra la línea base (ruido)
+MIN_SAMPLES_TO_COMPARE = 20
+
+
+class LatencyHistogram:
+    """
+    Histograma log-lineal de latencias en microsegundos (estilo HdrHistogram)
+
+    Los valores menores a 2048 µs se guardan exactos; los mayores se agrupan en
+    1024 sub-buckets por potencia de dos, con un error relativo máximo de ~0.1%.
+    Los conteos son un dict disperso, por lo que se serializa y combina barato.
+    """
+
+    SUB_BUCKET_BITS = 11
+    SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+    SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.sum = 0
+
+    @classmethod
+    def _index(cls, value):
+        if value < cls.SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        return cls.SUB_BUCKET_COUNT + (shift - 1) * cls.SUB_BUCKET_HALF + ((value >> shift) - cls.SUB_BUCKET_HALF)
+
+    @classmethod
+    def _highest_equivalent(cls, index):
+        """Mayor valor que cae en el bucket `index`"""
+        if index < cls.SUB_BUCKET_COUNT:
+            return index
+        shift, offset = divmod(index - cls.SUB_BUCKET_COUNT, cls.SUB_BUCKET_HALF)
+        shift += 1
+        return ((cls.SUB_BUCKET_HALF + offset + 1) << shift) - 1
+
+    def record(self, value_us, count=1):
+        """Registrar una latencia en microsegundos"""
+        value = max(0, int(value_us))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Sumar los conteos de otro histograma"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def value_at_percentile(self, percentile):
+        """Latencia (µs) bajo la cual está el `percentile` % de las muestras"""
+        if not self.total:
+            return 0
+        target = max(1, int(round(self.total * percentile / 100.0 + 0.4999999)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+    def to_dict(self):
+        return {
+            'counts': {str(index): count for index, count in sorted(self.counts.items())},
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'sum': self.sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in data['counts'].items()}
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        histogram.sum = data['sum']
+        return histogram
+
+
+class EndpointStats:
+    """Histograma, fallos y línea de tiempo por segundo de un endpoint"""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.failures = 0
+        # segundo (epoch) -> [peticiones, fallos]
+        self.timeline = {}
+
+    def record(self, response_time_ms, failed, second):
+        self.histogram.record(response_time_ms * 1000)
+        bucket = self.timeline.get(second)
+        if bucket is None:
+            bucket = self.timeline[second] = [0, 0]
+        bucket[0] += 1
+        if failed:
+            self.failures += 1
+            bucket[1] += 1
+
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+        self.failures += other.failures
+        for second, (requests, failures) in other.timeline.items():
+            bucket = self.timeline.setdefault(second, [0, 0])
+            bucket[0] += requests
+            bucket[1] += failures
+
+    def to_dict(self):
+        return {
+            'histogram': self.histogram.to_dict(),
+            'failures': self.failures,
+            'timeline': {str(second): counts for second, counts in sorted(self.timeline.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.histogram = LatencyHistogram.from_dict(data['histogram'])
+        stats.failures = data['failures']
+        stats.timeline = {int(second): list(counts) for second, counts in data['timeline'].items()}
+        return stats
+
+
+class LoadReport:
+    """Resultados de una prueba de carga por endpoint"""
+
+    def __init__(self, name):
+        self.name = name
+        self.endpoints = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def record(self, request_type, name, response_time_ms, failed=False, timestamp=None):
+        """Registrar una petición terminada"""
+        key = f"{request_type} {name}"
+        stats = self.endpoints.get(key)
+        if stats is None:
+            stats = self.endpoints[key] = EndpointStats()
+        stats.record(response_time_ms, failed, int(timestamp if timestamp is not None else time.time()))
+
+    def reset(self):
+        self.endpoints = {}
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def merge_partial(self, data):
+        """Combinar un resultado parcial (p. ej. de otro proceso) en este reporte"""
+        for key, endpoint in data.items():
+            partial = EndpointStats.from_dict(endpoint)
+            if key in self.endpoints:
+                self.endpoints[key].merge(partial)
+            else:
+                self.endpoints[key] = partial
+
+    def partial(self):
+        """Resultado parcial serializable para combinarlo en otro proceso"""
+        return {key: stats.to_dict() for key, stats in self.endpoints.items()}
+
+    def _total(self):
+        total = EndpointStats()
+        for stats in self.endpoints.values():
+            total.merge(stats)
+        return total
+
+    def _summary_row(self, stats, duration):
+        histogram = stats.histogram
+        row = {
+            'requests': histogram.total,
+            'failures': stats.failures,
+            'failure_ratio': round(stats.failures / histogram.total, 6) if histogram.total else 0.0,
+            'rps': round(histogram.total / duration, 3) if duration else 0.0,
+            'min_ms': (histogram.min or 0) / 1000,
+            'mean_ms': round(histogram.mean() / 1000, 3),
+            'max_ms': histogram.max / 1000,
+        }
+        for percentile in PERCENTILES:
+            row[f"p{percentile:g}_ms"] = histogram.value_at_percentile(percentile) / 1000
+        return row
+
+    def summary(self):
+        """Resumen por endpoint y total (latencias en ms)"""
+        finished = self.finished_at or time.time()
+        duration = max(finished - self.started_at, 1e-9) if self.started_at else 0
+        summary = {key: self._summary_row(stats, duration) for key, stats in sorted(self.endpoints.items())}
+        summary['Total'] = self._summary_row(self._total(), duration)
+        return summary
+
+    def timeline(self):
+        """Filas (segundo, endpoint, peticiones, fallos) ordenadas por segundo"""
+        rows = []
+        for key, stats in self.endpoints.items():
+            for second, (requests, failures) in stats.timeline.items():
+                rows.append((second, key, requests, failures))
+        rows.sort()
+        return rows
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'generated_at': datetime.now().isoformat(),
+            'percentiles': list(PERCENTILES),
+            'summary': self.summary(),
+            'endpoints': self.partial(),
+        }
+
+    def write(self, directory):
+        """Escribir <nombre>_<fecha>.json, _summary.csv y _timeline.csv; devuelve las rutas"""
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        prefix = os.path.join(directory, f"{self.name}_{stamp}")
+        data = self.to_dict()
+
+        json_path = f"{prefix}.json"
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+        summary_path = f"{prefix}_summary.csv"
+        with open(summary_path, 'w', newline='', encoding='utf-8') as f:
+            rows = data['summary']
+            columns = list(next(iter(rows.values())).keys())
+            writer = csv.writer(f)
+            writer.writerow(['endpoint'] + columns)
+            for key, row in rows.items():
+                writer.writerow([key] + [row[column] for column in columns])
+
+        timeline_path = f"{prefix}_timeline.csv"
+        with open(timeline_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['second', 'endpoint', 'requests', 'failures'])
+            writer.writerows(self.timeline())
+
+        return [json_path, summary_path, timeline_path]
+
+    def print_summary(self):
+        summary = self.summary()
+        header = f"{'Endpoint':<42}{'Reqs':>8}{'Fallos':>8}{'RPS':>9}" + ''.join(
+            f"{f'p{p:g}':>9}" for p in PERCENTILES
+        )
+        print(header)
+        print('-' * len(header))
+        for key, row in summary.items():
+            print(f"{key[:41]:<42}{row['requests']:>8}{row['failures']:>8}{row['rps']:>9.1f}" + ''.join(
+                f"{row[f'p{p:g}_ms']:>9.1f}" for p in PERCENTILES
+            ))
+        print('(latencias en ms)')
+
+
+def compare(summary, baseline_summary, threshold_percent):
+    """
+    Comparar un resumen contra la línea base.
+
+    Devuelve la lista de regresiones: un percentil o el RPS que empeoró más
+    que `threshold_percent` %, o una tasa de fallos que subió más de
+    `threshold_percent` puntos.
+    """
+    regressions = []
+    limit = 1 + threshold_percent / 100.0
+    for key, row in summary.items():
+        base = baseline_summary.get(key)
+        if base is None or row['requests'] < MIN_SAMPLES_TO_COMPARE or base['requests'] < MIN_SAMPLES_TO_COMPARE:
+            continue
+        for percentile in PERCENTILES:
+            column = f"p{percentile:g}_ms"
+            if base[column] > 0 and row[column] > base[column] * limit:
+                regressions.append({
+                    'endpoint': key, 'metric': column,
+                    'baseline': base[column], 'current': row[column],
+                    'change_percent': round((row[column] / base[column] - 1) * 100, 1),
+                })
+        if base['rps'] > 0 and row['rps'] * limit < base['rps']:
+            regressions.append({
+                'endpoint': key, 'metric': 'rps',
+                'baseline': base['rps'], 'current': row['rps'],
+                'change_percent': round((row['rps'] / base['rps'] - 1) * 100, 1),
+            })
+        if row['failure_ratio'] > base['failure_ratio'] + threshold_percent / 100.0:
+            regressions.append({
+                'endpoint': key, 'metric': 'failure_ratio',
+                'baseline': base['failure_ratio'], 'current': row['failure_ratio'],
+                'change_percent': round((row['failure_ratio'] - base['failure_ratio']) * 100, 1),
+            })
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['summary']
+
+
+def install(name, locust_events=None):
+    """Registrar las opciones y los listeners del reporte en Locust; devuelve el LoadReport"""
+    if locust_events is None:
+        from locust import events as locust_events
+
+    report = LoadReport(name)
+    role = LOCAL
+    # Master: workers que deben enviar su parte, partes recibidas y si falta escribir el reporte
+    expected = received = 0
+    pending = False
+
+    def _finish(environment):
+        nonlocal pending
+        pending = False
+        if not report.endpoints:
+            return
+        options = getattr(environment, 'parsed_options', None)
+        finish(
+            report, environment,
+            directory=getattr(options, 'report_dir', 'reports'),
+            baseline=getattr(options, 'report_baseline', ''),
+            threshold=getattr(options, 'report_threshold', 10.0),
+        )
+
+    def _on_worker_partial(environment, msg, **kwargs):
+        nonlocal received
+        report.merge_partial(msg.data['endpoints'])
+        received += 1
+        if pending and received >= expected:
+            _finish(environment)
+
+    @locust_events.init.add_listener
+    def _on_init(environment, **kwargs):
+        nonlocal role
+        role = runner_role(environment.runner)
+        if role == MASTER:
+            environment.runner.register_message('load_report_partial', _on_worker_partial)
+
+    @locust_events.init_command_line_parser.add_listener
+    def _add_arguments(parser):
+        group = parser.add_argument_group('Reporte de resultados')
+        group.add_argument('--report-dir', type=str, default='reports', env_var='LOCUST_REPORT_DIR',
+                           help='Carpeta donde se escriben los resultados en JSON y CSV')
+        group.add_argument('--report-baseline', type=str, default='', env_var='LOCUST_REPORT_BASELINE',
+                           help='JSON de una ejecución anterior contra el cual comparar')
+        group.add_argument('--report-threshold', type=float, default=10.0, env_var='LOCUST_REPORT_THRESHOLD',
+                           help='Empeoramiento máximo permitido respecto a la línea base, en %%')
+
+    @locust_events.test_start.add_listener
+    def _on_test_start(environment, **kwargs):
+        nonlocal expected, received, pending
+        report.reset()
+        if role == MASTER:
+            expected, received, pending = environment.runner.worker_count, 0, False
+
+    @locust_events.request.add_listener
+    def _on_request(request_type, name, response_time, response_length, exception=None, **kwargs):
+        report.record(request_type, name, response_time, exception is not None, kwargs.get('start_time'))
+
+    @locust_events.test_stop.add_listener
+    def _on_test_stop(environment, **kwargs):
+        nonlocal pending
+        report.finished_at = time.time()
+        if role == WORKER:
+            environment.runner.send_message('load_report_partial', {'endpoints': report.partial()})
+            return
+        if role == MASTER and received < expected:
+            # Al terminar por --run-time el master se detiene antes que los workers:
+            # el reporte se escribe al llegar la última parte (o al salir)
+            pending = True
+            return
+        _finish(environment)
+
+    @locust_events.quitting.add_listener
+    def _on_quitting(environment, **kwargs):
+        if pending:
+            _finish(environment)
+
+    return report
+
+
+def finish(report, environment=None, directory='reports', baseline='', threshold=10.0):
+    """Imprimir, exportar y comparar contra la línea base; devuelve True si pasa"""
+    print(f"\n📈 Reporte de latencias ({report.name})")
+    report.print_summary()
+    try:
+        for path in report.write(directory):
+            print(f"📁 {path}")
+    except OSError as e:
+        print(f"❌ Error escribiendo el reporte: {e}")
+
+    if not baseline:
+        return True
+
+    try:
+        regressions = compare(report.summary(), load_baseline(baseline), threshold)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ No se pudo leer la línea base {baseline}: {e}")
+        return True
+
+    if not regressions:
+        print(f"✅ Sin regresiones mayores a {threshold:g}% respecto a {baseline}")
+        return True
+
+    print(f"❌ {len(regressions)} regresiones mayores a {threshold:g}% respecto a {baseline}:")
+    for regression in regressions:
+        print(f"   {regression['endpoint']} {regression['metric']}: "
+              f"{regression['baseline']} -> {regression['current']} ({regression['change_percent']:+g}%)")
+    if environment is not None:
+        environment.process_exit_code = 1
+    return False
@@ -1,18 +1,45 @@
 import json
+import os
 import time
 from datetime import datetime
 from locust import HttpUser, task, between, events
 import logging
 
+import distributed
+import load_report
+from capture_writer import (CaptureWriter, merge_captures, metadata_path,
+                            worker_capture_path, write_metadata)
+
 # Configurar logging
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
-# Lista para almacenar todos los datos JSON recibidos
-collected_data = []
+# Rol del proceso en modo distribuido (--processes): local, master o worker
+cluster = distributed.install()
+
+# Histogramas de latencia por endpoint, exportados a JSON/CSV al terminar
+report = load_report.install('fase1')
+
+# Escritor de la captura: cada registro recibido se escribe en disco como NDJSON
+capture = None
 
 # Variables de control
-json_filename = "locust_output_202201947.json"
+json_filename = "locust_output_202201947.ndjson"
+
+# Segundos que el master espera a que los workers cierren sus capturas
+WORKER_CAPTURE_TIMEOUT = 60
+
+
+@events.init_command_line_parser.add_listener
+def agregar_opciones(parser):
+    """Opciones de la captura"""
+    group = parser.add_argument_group('Captura de la fase 1')
+    group.add_argument('--capture-file', type=str, default=json_filename, env_var='LOCUST_CAPTURE_FILE',
+                       help='Archivo NDJSON donde se escriben los registros recibidos')
+    group.add_argument('--capture-compress', action='store_true', default=False, env_var='LOCUST_CAPTURE_COMPRESS',
+                       help='Comprimir la captura con gzip (.ndjson.gz)')
+    group.add_argument('--capture-flush-interval', type=float, default=1.0, env_var='LOCUST_CAPTURE_FLUSH_INTERVAL',
+                       help='Segundos máximos entre escrituras a disco')
 
 class SystemMonitorUser(HttpUser):
     """
@@ -56,12 +83,12 @@ class SystemMonitorUser(HttpUser):
                         # Agregar timestamp de cuando se recibió
                         data['timestamp_received'] = datetime.now().isoformat()
                         
-                        # Guardar en la lista global
-                        collected_data.append(data)
+                        # Encolar para el escritor de la captura
+                        capture.write(data)
                         
                         # Log cada 200 registros para verificación
-                        if len(collected_data) % 200 == 0:
-                            print(f"📊 Registros recolectados: {len(collected_data)}")
+                        if capture.count % 200 == 0:
+                            print(f"📊 Registros recolectados: {capture.count}")
                         
                         response.success()
                         
@@ -126,6 +153,25 @@ class SystemMonitorUser(HttpUser):
 @events.test_start.add_listener
 def on_test_start(environment, **kwargs):
     """Se ejecuta cuando inicia el test"""
+    global capture, json_filename
+    options = getattr(environment, 'parsed_options', None)
+    json_filename = getattr(options, 'capture_file', json_filename)
+    compress = getattr(options, 'capture_compress', False)
+    if compress and not json_filename.endswith('.gz'):
+        json_filename += '.gz'
+
+    # En modo distribuido cada worker escribe su parte y el master las combina al salir
+    if capture is None and not cluster.is_master:
+        path = worker_capture_path(json_filename, cluster.index) if cluster.is_worker else json_filename
+        capture = CaptureWriter(
+            path,
+            compress=compress,
+            flush_interval=getattr(options, 'capture_flush_interval', 1.0)
+        ).start()
+
+    if cluster.is_worker:
+        return
+
     print(f"\n{'='*60}")
     print(f"🚀 INICIANDO FASE 1 - GENERACIÓN DE TRÁFICO")
     print(f"{'='*60}")
@@ -135,6 +181,8 @@ def on_test_start(environment, **kwargs):
     print(f"📈 Objetivo: ~2000 registros")
     print(f"🌐 Host: {environment.host}")
     print(f"📁 Archivo de salida: {json_filename}")
+    if cluster.is_master:
+        print(f"🧩 Workers: {cluster.count}")
     print(f"{'='*60}")
     print("⚡ Generando tráfico...")
 
@@ -142,66 +190,120 @@ def on_test_start(environment, **kwargs):
 @events.test_stop.add_listener
 def on_test_stop(environment, **kwargs):
     """Se ejecuta cuando termina el test"""
+    global capture
+    if cluster.is_worker:
+        # Cerrar la parte del worker para que el master pueda combinarla
+        if capture is not None:
+            close_capture(capture, {"worker": cluster.index})
+            print(f"⏹️  Worker {cluster.index}: {capture.count} registros en {capture.path}")
+            capture = None
+        return
+
     print(f"\n⏹️  Generación de tráfico detenida")
-    print(f"📊 Registros recolectados: {len(collected_data)}")
+    if cluster.is_master:
+        print(f"📊 Las capturas de {cluster.count} workers se combinan al terminar")
+    else:
+        print(f"📊 Registros recolectados: {capture.count if capture else 0}")
+
+
+def build_metadata(total, collection_start, collection_end, **extra):
+    """Metadata de la captura (archivo <captura>.meta.json)"""
+    metadata = {
+        "total_records": total,
+        "collection_start": collection_start,
+        "collection_end": collection_end,
+        "duration_minutes": 3,
+        "users": 300,
+        "generated_at": datetime.now().isoformat(),
+        "phase": 1,
+        "description": "Datos recolectados del sistema de monitoreo"
+    }
+    metadata.update(extra)
+    return metadata
+
+
+def close_capture(writer, extra=None):
+    """Vaciar la cola del escritor, cerrar el archivo y escribir la metadata"""
+    writer.close(build_metadata(writer.count, writer.first_timestamp, writer.last_timestamp, **(extra or {})))
+
+
+def merge_worker_captures():
+    """Esperar las capturas de los workers y combinarlas en json_filename; devuelve el total"""
+    paths = [worker_capture_path(json_filename, index) for index in range(cluster.count)]
+    deadline = time.monotonic() + WORKER_CAPTURE_TIMEOUT
+    # Cada worker escribe su metadata al cerrar la captura
+    pending = [path for path in paths if not os.path.exists(metadata_path(path))]
+    while pending and time.monotonic() < deadline:
+        time.sleep(0.5)
+        pending = [path for path in pending if not os.path.exists(metadata_path(path))]
+    for path in pending:
+        print(f"⚠️  La captura {path} no se cerró; se combina hasta su último flush")
+
+    available = [path for path in paths if os.path.exists(path)]
+    total, collection_start, collection_end = merge_captures(available, json_filename)
+    write_metadata(json_filename, build_metadata(total, collection_start, collection_end, workers=cluster.count))
+
+    for path in available:
+        os.remove(path)
+        if os.path.exists(metadata_path(path)):
+            os.remove(metadata_path(path))
+    return total
+
+
+def print_summary(total):
+    """Resumen final de la fase 1"""
+    print(f"\n{'='*60}")
+    print(f"✅ FASE 1 COMPLETADA EXITOSAMENTE")
+    print(f"{'='*60}")
+    print(f"📁 Archivo generado: {json_filename} (metadata en {metadata_path(json_filename)})")
+    print(f"📊 Total de registros: {total}")
+    print(f"🎯 Objetivo: ~2000 registros")
+    
+    # Mostrar estadísticas
+    if total >= 2000:
+        print("✅ Objetivo de registros alcanzado!")
+        status = "EXITOSO"
+    elif total >= 1500:
+        print("⚠️  Registros suficientes para continuar")
+        status = "ACEPTABLE"
+    else:
+        print(f"❌ Solo se generaron {total} registros")
+        status = "INSUFICIENTE"
+    
+    print(f"📋 Estado: {status}")
+    print(f"{'='*60}")
+    print(f"🔄 Siguiente paso: Ejecutar Fase 2")
+    print(f"💻 Comando: locust -f phase2_sender.py --host=http://TU-INGRESS-URL -u 150 -r 1 --headless")
+    print(f"{'='*60}")
 
 
 @events.quitting.add_listener
 def on_quitting(environment, **kwargs):
     """
     Se ejecuta cuando Locust termina
-    Guarda todos los datos recolectados en un archivo JSON
+    Cierra la captura y escribe su metadata en <captura>.meta.json
+    (en modo distribuido, el master combina las capturas de los workers)
     """
-    if collected_data:
-        try:
-            # Preparar metadata
-            metadata = {
-                "total_records": len(collected_data),
-                "collection_start": collected_data[0]['timestamp_received'] if collected_data else None,
-                "collection_end": collected_data[-1]['timestamp_received'] if collected_data else None,
-                "duration_minutes": 3,
-                "users": 300,
-                "generated_at": datetime.now().isoformat(),
-                "phase": 1,
-                "description": "Datos recolectados del sistema de monitoreo"
-            }
-            
-            # Estructura final del JSON
-            final_data = {
-                "metadata": metadata,
-                "data": collected_data
-            }
-            
-            # Guardar todos los datos en un archivo JSON
-            with open(json_filename, 'w', encoding='utf-8') as f:
-                json.dump(final_data, f, indent=2, ensure_ascii=False)
-            
-            print(f"\n{'='*60}")
-            print(f"✅ FASE 1 COMPLETADA EXITOSAMENTE")
-            print(f"{'='*60}")
-            print(f"📁 Archivo generado: {json_filename}")
-            print(f"📊 Total de registros: {len(collected_data)}")
-            print(f"🎯 Objetivo: ~2000 registros")
-            
-            # Mostrar estadísticas
-            if len(collected_data) >= 2000:
-                print("✅ Objetivo de registros alcanzado!")
-                status = "EXITOSO"
-            elif len(collected_data) >= 1500:
-                print("⚠️  Registros suficientes para continuar")
-                status = "ACEPTABLE"
-            else:
-                print(f"❌ Solo se generaron {len(collected_data)} registros")
-                status = "INSUFICIENTE"
-            
-            print(f"📋 Estado: {status}")
-            print(f"{'='*60}")
-            print(f"🔄 Siguiente paso: Ejecutar Fase 2")
-            print(f"💻 Comando: locust -f phase2_sender.py --host=http://TU-INGRESS-URL -u 150 -r 1 --headless")
-            print(f"{'='*60}")
-                
-        except Exception as e:
-            print(f"❌ Error guardando datos: {e}")
+    if cluster.is_worker:
+        if capture is not None:
+            close_capture(capture, {"worker": cluster.index})
+        return
+
+    try:
+        if cluster.is_master:
+            total = merge_worker_captures()
+        elif capture is not None:
+            # Los registros ya están en disco: solo falta vaciar la cola y la metadata
+            close_capture(capture)
+            total = capture.count
+        else:
+            total = 0
+    except Exception as e:
+        print(f"❌ Error guardando datos: {e}")
+        return
+
+    if total:
+        print_summary(total)
     else:
         print("\n❌ No se recolectaron datos durante la ejecución")
         print("🔍 Verificar que el backend esté funcionando en el host especificado")
@@ -220,7 +322,9 @@ if __name__ == "__main__":
     print("  -r 1: agregar 1 usuario por segundo")
     print("  -t 180s: duración de 3 minutos")
     print("  --headless: ejecutar sin interfaz web")
-    print("\n📁 Archivo de salida: locust_output_202201947.json")
+    print("  --capture-compress: comprimir la captura con gzip (opcional)")
+    print("  --processes -1: un worker por núcleo (las capturas se combinan al terminar)")
+    print("\n📁 Archivo de salida: locust_output_202201947.ndjson (+ .meta.json)")
     print("="*70)
 
 
@@ -4,105 +4,171 @@ Enviador de Datos Fase 2 con Locust - CORREGIDO
 Envía datos de monitoreo al balanceador de carga usando Locust
 """
 
-import json
+import itertools
+import math
+import os
 import random
+import sys
 import time
 from datetime import datetime
-from locust import HttpUser, task, between, events
-from locust.env import Environment
+from locust import FastHttpUser, task, between, events
 from locust.stats import stats_printer, stats_history
 from locust.log import setup_logging
 import logging
-import gevent
+
+import arrival_rate
+import distributed
+import load_report
+import sender_cpu
+from dataset import Dataset, SAMPLING_MODES
 
 # Configurar logging
 setup_logging("INFO", None)
 logger = logging.getLogger(__name__)
 
-# Variable global para almacenar los datos del JSON
-json_data = None
-monitoring_records = []
+# Histogramas de latencia por endpoint, exportados a JSON/CSV al terminar
+report = load_report.install('fase2')
 
-def load_json_data():
-    """Cargar datos del archivo JSON al inicio"""
-    global json_data, monitoring_records
-    
-    json_file_path = "/home/pablor03/Documentos/LabSopes1/Proyecto_Fase2/Locust/locust_output_202201947.json"
+# Rol del proceso en modo distribuido (--processes): local, master o worker
+cluster = distributed.install()
+
+# Lazo abierto: envíos a tasa fija programados por un greenlet (--arrival-rate)
+arrivals = arrival_rate.install(cluster=cluster)
+
+# CPU del generador por petición (--sender-cpu)
+cpu_monitor = sender_cpu.install()
+
+# Encabezados fijos de los envíos: el cuerpo ya es JSON, requests no lo vuelve a serializar
+POST_HEADERS = {
+    'Content-Type': 'application/json',
+    'User-Agent': 'Locust-Phase2-Sender/1.0'
+}
+
+def default_dataset():
+    """Captura por defecto: el NDJSON de phase1_generator o, si no existe, el JSON incluido en el repositorio"""
+    base = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locust_output_202201947")
+    return base + '.ndjson' if os.path.exists(base + '.ndjson') else base + '.json'
+
+# Captura de la fase 1 (mapeada en memoria, los registros se leen por índice)
+DEFAULT_DATASET = os.getenv('LOCUST_DATASET') or default_dataset()
+dataset = None
+
+# Configuración del muestreo (se reemplaza con las opciones de línea de comandos)
+# start/end: registros que le tocan a este proceso (todos, o la parte de un worker)
+dataset_options = {'sampling': 'random', 'seed': None, 'users': 1, 'start': 0, 'end': None}
+user_counter = itertools.count()
+
+
+@events.init_command_line_parser.add_listener
+def agregar_opciones(parser):
+    """Opciones de la captura a enviar"""
+    group = parser.add_argument_group('Captura de la fase 1')
+    group.add_argument('--dataset', type=str, default=DEFAULT_DATASET, env_var='LOCUST_DATASET',
+                       help='Captura a enviar: .ndjson, .bin, .ndjson.gz o el JSON anterior')
+    group.add_argument('--dataset-sampling', type=str, default='random', choices=SAMPLING_MODES,
+                       env_var='LOCUST_DATASET_SAMPLING',
+                       help='random: al azar; sequential: en orden; shard: un bloque contiguo por usuario')
+    group.add_argument('--dataset-seed', type=int, default=None, env_var='LOCUST_DATASET_SEED',
+                       help='Semilla del muestreo aleatorio (reproducible por usuario)')
+
+
+def load_dataset(path=DEFAULT_DATASET):
+    """Abrir la captura e indexar sus registros"""
+    global dataset
     
     try:
-        logger.info(f"Cargando datos desde: {json_file_path}")
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            json_data = json.load(file)
-        
-        monitoring_records = json_data['data']
+        logger.info(f"Cargando datos desde: {path}")
+        if dataset is not None:
+            dataset.close()
+        dataset = Dataset(path)
+        metadata = dataset.metadata
         
         logger.info(f"Datos cargados exitosamente:")
-        logger.info(f"- Total de registros: {json_data['metadata']['total_records']}")
-        logger.info(f"- Fase: {json_data['metadata']['phase']}")
-        logger.info(f"- Usuarios: {json_data['metadata']['users']}")
-        logger.info(f"- Duración: {json_data['metadata']['duration_minutes']} minutos")
-        logger.info(f"- Registros disponibles: {len(monitoring_records)}")
+        logger.info(f"- Total de registros: {metadata.get('total_records')}")
+        logger.info(f"- Fase: {metadata.get('phase')}")
+        logger.info(f"- Usuarios: {metadata.get('users')}")
+        logger.info(f"- Duración: {metadata.get('duration_minutes')} minutos")
+        logger.info(f"- Registros disponibles: {len(dataset)}")
         
         # Mostrar ejemplo de los primeros registros para debug
-        if monitoring_records:
-            logger.info(f"Ejemplo de registro: {monitoring_records[0]}")
-            logger.info(f"Campos disponibles: {list(monitoring_records[0].keys())}")
+        if len(dataset):
+            logger.info(f"Ejemplo de registro: {dataset.record(0)}")
+            logger.info(f"Campos disponibles: {list(dataset.record(0).keys())}")
         
-        return True
+        return len(dataset) > 0
         
     except Exception as e:
         logger.error(f"Error al cargar datos: {e}")
         return False
 
-class EnviadorDatosMonitoreo(HttpUser):
+class EnviadorDatosMonitoreo(FastHttpUser):
     """
     Usuario de Locust que envía datos de monitoreo al balanceador de carga
     """
     
     # Tiempo de espera entre tareas (en segundos)
-    wait_time = between(0.1, 0.5)  # Entre 100ms y 500ms
+    closed_loop_wait = between(0.1, 0.5)  # Entre 100ms y 500ms
+    
+    def wait_time(self):
+        # En lazo abierto el ritmo lo marca el programador de llegadas
+        return 0 if arrivals.enabled else self.closed_loop_wait()
     
     def on_start(self):
         """Se ejecuta cuando inicia cada usuario"""
-        self.record_index = 0
         self.user_id = id(self)
+        self.sampler = None
+        if dataset is not None and len(dataset):
+            self.sampler = dataset.sampler(
+                dataset_options['sampling'], next(user_counter),
+                dataset_options['users'], dataset_options['seed'],
+                dataset_options['start'], dataset_options['end']
+            )
+        if arrivals.enabled:
+            # A tasa fija solo se envían datos: las consultas alterarían la tasa medida
+            self.tasks = [EnviadorDatosMonitoreo.enviar_datos_monitoreo]
         logger.info(f"Usuario {self.user_id} iniciado")
     
     @task(10)  # Peso 10 - tarea principal
     def enviar_datos_monitoreo(self):
         """Enviar datos de monitoreo al endpoint correcto"""
-        global monitoring_records
-        
-        if not monitoring_records:
+        if self.sampler is None:
             logger.error("No hay datos disponibles para enviar")
             return
         
-        # Seleccionar un registro aleatorio
-        record = random.choice(monitoring_records)
+        scheduled = None
+        if arrivals.enabled:
+            # Esperar el siguiente envío programado (None: el perfil terminó)
+            scheduled = arrivals.next_arrival()
+            if scheduled is None:
+                return
+        
+        # Seleccionar el siguiente registro según el modo de muestreo.
+        # La captura guarda cada registro como JSON compacto: esos bytes son el
+        # cuerpo de la petición, sin decodificar ni volver a serializar
+        payload = dataset.raw(self.sampler.next_index())
         
         # Debug: mostrar qué datos estamos enviando
         if random.random() < 0.01:  # Solo 1% de las veces para no saturar logs
-            logger.info(f"Enviando registro: {record}")
-        
-        # Enviar el registro directamente como viene del JSON
-        # Sin wrapper, tal como está en el archivo original
-        payload = record
+            logger.info(f"Enviando registro: {payload.decode('utf-8', 'replace')}")
         
+        sent_at = time.perf_counter()
         # USAR LA RUTA CORRECTA SEGÚN TU INGRESS
         with self.client.post(
             "/monitoring-data",  # Cambiado de /metricas a /monitoring-data
-            json=payload,
-            headers={
-                'Content-Type': 'application/json',
-                'User-Agent': 'Locust-Phase2-Sender/1.0'
-            },
+            data=payload,
+            headers=POST_HEADERS,
             catch_response=True,
             name="enviar_datos_monitoreo"
         ) as response:
+            if scheduled is not None:
+                # Latencia desde el instante programado (incluye la espera por un usuario libre)
+                arrivals.measure_from_schedule(response, scheduled, sent_at)
             if response.status_code == 200:
                 response.success()
             elif response.status_code == 201:  # Algunos APIs devuelven 201 para creación
                 response.success()
+            elif response.status_code == 202:  # API Python en modo de ingesta diferida
+                response.success()
             else:
                 response.failure(f"Código de estado: {response.status_code}")
                 # Debug: mostrar respuesta de error
@@ -135,13 +201,26 @@ def al_iniciar_test(environment, **kwargs):
     logger.info("INICIANDO TEST DE FASE 2")
     logger.info("="*50)
     
-    # Cargar datos del JSON
-    if not load_json_data():
+    options = getattr(environment, 'parsed_options', None)
+    if options is not None:
+        dataset_options['sampling'] = getattr(options, 'dataset_sampling', 'random')
+        dataset_options['seed'] = getattr(options, 'dataset_seed', None)
+        # Usuarios de este proceso: en modo distribuido se reparten entre los workers
+        dataset_options['users'] = math.ceil((getattr(options, 'num_users', None) or 1) / cluster.count)
+    
+    # Cargar la captura
+    if not load_dataset(getattr(options, 'dataset', DEFAULT_DATASET)):
         logger.error("No se pudieron cargar los datos. Abortando test.")
         environment.process_exit_code = 1
         environment.runner.quit()
         return
     
+    # Cada worker envía solo su bloque contiguo de la captura
+    dataset_options['start'], dataset_options['end'] = cluster.partition(len(dataset))
+    if cluster.is_worker:
+        logger.info(f"Worker {cluster.index}/{cluster.count}: registros "
+                    f"[{dataset_options['start']}, {dataset_options['end']})")
+    
     logger.info(f"Objetivo: {environment.host}/monitoring-data")  # Actualizado
     
     # Obtener configuración
@@ -176,40 +255,30 @@ def al_finalizar_test(environment, **kwargs):
     logger.info(f"Requests exitosos: {total_requests - total_failures}")
     logger.info(f"Requests fallidos: {total_failures}")
     logger.info(f"Tasa de éxito: {tasa_exito:.2f}%")
-    logger.info(f"RPS promedio: {stats.total.current_rps:.2f}")
+    # total_rps es el promedio de toda la prueba; current_rps solo cubre los últimos segundos
+    logger.info(f"RPS promedio: {stats.total.total_rps:.2f}")
+    if report.endpoints:
+        total = report.summary()['Total']
+        logger.info(f"Latencia p50/p99/p99.9: {total['p50_ms']:.1f} / {total['p99_ms']:.1f} / {total['p99.9_ms']:.1f} ms")
+
+@events.quitting.add_listener
+def al_salir(environment, **kwargs):
+    """Liberar el mapeo de la captura (y el NDJSON temporal si se descomprimió)"""
+    if dataset is not None:
+        dataset.close()
 
 # Configuración para ejecución directa
 if __name__ == "__main__":
-    # Configuración del entorno
-    env = Environment(user_classes=[EnviadorDatosMonitoreo])
-    env.create_local_runner()
-    
-    # Configurar host - usando la IP externa del ingress
-    env.host = "http://34.70.154.124"  # Tu IP actual
-    
-    # Cargar datos antes de iniciar
-    if not load_json_data():
-        logger.error("No se pudieron cargar los datos. Abortando.")
-        exit(1)
-    
-    # Iniciar el test
-    logger.info("Iniciando test con 10 usuarios durante 60 segundos...")
-    env.runner.start(user_count=10, spawn_rate=2)
-    
-    # Ejecutar por 60 segundos
-    gevent.spawn_later(60, lambda: env.runner.quit())
-    
-    # Mantener el test corriendo
-    env.runner.greenlet.join()
-    
-    # Mostrar estadísticas finales
-    logger.info("¡Test completado!")
-    stats = env.stats
-    print("\nEstadísticas finales:")
-    print(f"Total requests: {stats.total.num_requests}")
-    print(f"Fallos: {stats.total.num_failures}")
-    print(f"RPS promedio: {stats.total.current_rps:.2f}")
-    print(f"Tiempo promedio respuesta: {stats.total.avg_response_time:.2f}ms")
+    # Ejecutar con la CLI de Locust en modo distribuido: un master y un worker
+    # por núcleo (--processes -1, o LOCUST_PROCESSES). Los argumentos extra se
+    # agregan al final, p. ej. python phase2_sender.py -u 150 -t 120s
+    command = [
+        sys.executable, '-m', 'locust', '-f', os.path.abspath(__file__),
+        '--host', 'http://34.70.154.124',  # Tu IP actual
+        '-u', '10', '-r', '2', '-t', '60s', '--headless',
+        '--processes', os.getenv('LOCUST_PROCESSES', '-1'),
+    ] + sys.argv[1:]
+    os.execv(sys.executable, command)
 
 # COMANDOS ACTUALIZADOS:
 # locust -f phase2_sender_fixed.py --host=http://34.70.154.124 -u 150 -r 1 -t 10s --headless
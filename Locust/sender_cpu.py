@@ -0,0 +1,129 @@
+"""
+CPU del generador de carga por petición
+
+Con --sender-cpu se mide el CPU del proceso de Locust (usuario + sistema, con
+time.process_time) y se divide entre las peticiones completadas, cada
+--sender-cpu-interval segundos y al terminar la prueba. Un worker de Locust
+usa un solo núcleo (gevent): si se acerca al 100% las latencias medidas
+incluyen la espera del propio generador y el objetivo deja de ser el cuello
+de botella; en ese caso hay que agregar workers (--processes). En modo
+distribuido cada worker reporta su propio CPU.
+"""
+
+import time
+
+from distributed import MASTER, WORKER, runner_role
+
+# Fracción de un núcleo a partir de la cual se advierte saturación
+SATURATION = 0.9
+
+
+class SenderCPUMonitor:
+    """CPU por petición y uso de núcleo del proceso generador"""
+
+    def __init__(self, interval=5.0, saturation=SATURATION):
+        self.interval = interval
+        self.saturation = saturation
+        self.enabled = False
+        self.process_label = ''
+        self.requests = 0
+        self.summary = None
+        self._started = None
+        self._greenlet = None
+
+    def record(self):
+        self.requests += 1
+
+    def _snapshot(self):
+        return time.process_time(), time.monotonic(), self.requests
+
+    @staticmethod
+    def _measure(previous, current):
+        cpu = current[0] - previous[0]
+        wall = current[1] - previous[1]
+        requests = current[2] - previous[2]
+        return {
+            'requests': requests,
+            'cpu_seconds': round(cpu, 3),
+            'cpu_ms_per_request': round(cpu * 1000 / requests, 4) if requests else None,
+            'core_percent': round(cpu / wall * 100, 1) if wall > 0 else None,
+            'rps': round(requests / wall, 1) if wall > 0 else None,
+        }
+
+    def _print(self, label, sample):
+        per_request = sample['cpu_ms_per_request']
+        per_request = f"{per_request:.3f} ms/petición" if per_request is not None else "sin peticiones"
+        print(f"🖥️  CPU del generador ({self.process_label}{label}): {per_request}, "
+              f"{sample['core_percent']}% de un núcleo, {sample['rps']} peticiones/s")
+        if sample['core_percent'] is not None and sample['core_percent'] >= self.saturation * 100:
+            print("⚠️  El generador está saturado: las latencias incluyen su propia espera")
+
+    def _loop(self):
+        import gevent
+
+        previous = self._started
+        while True:
+            gevent.sleep(self.interval)
+            current = self._snapshot()
+            self._print(f"últimos {self.interval:g}s", self._measure(previous, current))
+            previous = current
+
+    def start(self, periodic=True):
+        self.requests = 0
+        self.summary = None
+        self._started = self._snapshot()
+        if periodic and self.interval > 0:
+            import gevent
+
+            self._greenlet = gevent.spawn(self._loop)
+
+    def stop(self):
+        """Detener el muestreo periódico e imprimir el total de la prueba"""
+        if self._greenlet is not None:
+            self._greenlet.kill(block=False)
+            self._greenlet = None
+        if self._started is None:
+            return None
+        self.summary = self._measure(self._started, self._snapshot())
+        self._started = None
+        self._print('total', self.summary)
+        return self.summary
+
+
+def install(locust_events=None):
+    """Registrar la opción --sender-cpu y sus listeners; devuelve el monitor"""
+    if locust_events is None:
+        from locust import events as locust_events
+
+    monitor = SenderCPUMonitor()
+
+    @locust_events.init_command_line_parser.add_listener
+    def _add_arguments(parser):
+        group = parser.add_argument_group('CPU del generador')
+        group.add_argument('--sender-cpu', action='store_true', default=False, env_var='LOCUST_SENDER_CPU',
+                           help='Reportar el CPU del generador por petición')
+        group.add_argument('--sender-cpu-interval', type=float, default=5.0, env_var='LOCUST_SENDER_CPU_INTERVAL',
+                           help='Segundos entre reportes parciales (0 solo reporta al final)')
+
+    @locust_events.test_start.add_listener
+    def _on_test_start(environment, **kwargs):
+        options = getattr(environment, 'parsed_options', None)
+        role = runner_role(environment.runner)
+        # El master no envía peticiones
+        monitor.enabled = getattr(options, 'sender_cpu', False) and role != MASTER
+        if monitor.enabled:
+            monitor.process_label = f"worker {environment.runner.worker_index}, " if role == WORKER else ''
+            monitor.interval = getattr(options, 'sender_cpu_interval', 5.0)
+            monitor.start()
+
+    @locust_events.request.add_listener
+    def _on_request(**kwargs):
+        if monitor.enabled:
+            monitor.record()
+
+    @locust_events.test_stop.add_listener
+    def _on_test_stop(environment, **kwargs):
+        if monitor.enabled:
+            monitor.stop()
+
+    return monitor
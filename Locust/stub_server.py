@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Servidor simulado para probar las fases 1 y 2 sin infraestructura
+
+Responde como la API Go de recolección (/metrics, /cpu, /ram, /procesos,
+/health) con métricas sintéticas y como las APIs de persistencia
+(POST/GET /monitoring-data, GET /), con latencia y tasa de errores
+configurables. Solo usa la biblioteca estándar: un servidor HTTP/1.1 con
+keep-alive sobre asyncio; con --workers N se levantan N procesos en el mismo
+puerto (SO_REUSEPORT) para usar varios núcleos.
+
+GET /stub-stats devuelve las peticiones atendidas por ruta, los errores
+simulados y los registros recibidos (del proceso que atiende la petición).
+
+Uso:
+    python stub_server.py --port 8080 --latency 5 --jitter 2 --error-rate 0.01
+    locust -f phase1_generator.py --host=http://localhost:8080 -u 300 -r 50 -t 60s --headless
+    locust -f phase2_sender.py --host=http://localhost:8080 -u 150 -r 50 -t 60s --headless
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from collections import deque
+from datetime import datetime
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+MAX_BODY = 50 * 1024 * 1024
+# Registros recientes devueltos por GET /monitoring-data
+RECENT_RECORDS = 100
+
+
+class SyntheticSystem:
+    """Métricas sintéticas con la forma de los módulos /proc y de la API Go
+
+    Como los módulos del kernel: RAM en MB y porcentajes enteros."""
+
+    # 16 GB expresados en MB, como ram_202201947.c
+    TOTAL_RAM = 16 * 1024
+
+    def __init__(self, seed=None):
+        self._random = random.Random(seed)
+        self.cpu = 25.0
+        self.ram = 45.0
+        self.total_procesos = 320
+
+    def _step(self):
+        # Caminata aleatoria acotada para que las series parezcan reales
+        self.cpu = min(100.0, max(0.0, self.cpu + self._random.uniform(-5, 5)))
+        self.ram = min(100.0, max(1.0, self.ram + self._random.uniform(-1, 1)))
+        self.total_procesos = max(50, self.total_procesos + self._random.randint(-3, 3))
+
+    def cpu_data(self):
+        self._step()
+        return {'porcentajeUso': int(self.cpu)}
+
+    def ram_data(self):
+        self._step()
+        uso = int(self.TOTAL_RAM * self.ram / 100)
+        return {'total': self.TOTAL_RAM, 'libre': self.TOTAL_RAM - uso, 'uso': uso,
+                'porcentajeUso': uso * 100 // self.TOTAL_RAM}
+
+    def procesos_data(self):
+        self._step()
+        corriendo = self._random.randint(1, 8)
+        zombie = self._random.randint(0, 2)
+        parados = self._random.randint(0, 2)
+        return {'procesos_corriendo': corriendo, 'total_procesos': self.total_procesos,
+                'procesos_durmiendo': self.total_procesos - corriendo - zombie - parados,
+                'procesos_zombie': zombie, 'procesos_parados': parados}
+
+    def metrics(self):
+        """Mismas claves y orden que CombinedMetrics de la API Go"""
+        cpu = self.cpu_data()['porcentajeUso']
+        ram = self.ram_data()
+        procesos = self.procesos_data()
+        return {
+            'total_ram': ram['total'],
+            'ram_libre': ram['libre'],
+            'uso_ram': ram['uso'],
+            'porcentaje_ram': ram['porcentajeUso'],
+            'porcentaje_cpu_uso': cpu,
+            'porcentaje_cpu_libre': 100 - cpu,
+            **procesos,
+            'hora': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+
+class StubState:
+    """Configuración y contadores de un proceso del servidor"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, api='Stub', seed=None):
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.api = api
+        self.system = SyntheticSystem(seed)
+        self._random = random.Random(seed)
+        self.requests = {}
+        self.injected_errors = 0
+        self.records_received = 0
+        self.next_id = 1
+        self.recent = deque(maxlen=RECENT_RECORDS)
+        self.started_at = time.time()
+
+    def delay(self):
+        if not self.latency and not self.jitter:
+            return 0.0
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def inject_error(self):
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.injected_errors += 1
+            return True
+        return False
+
+
+def _json(status, payload):
+    return status, 'application/json', json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def handle(state, method, path, body):
+    """Resolver una petición; devuelve (estado, content-type, cuerpo)"""
+    path = path.split('?', 1)[0]
+    key = f"{method} {path}"
+    state.requests[key] = state.requests.get(key, 0) + 1
+
+    if path == '/stub-stats':
+        return _json(200, {
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - state.started_at, 1),
+            'requests': state.requests,
+            'injected_errors': state.injected_errors,
+            'records_received': state.records_received,
+        })
+    if path != '/health' and state.inject_error():
+        return _json(state.error_status, {'error': 'Error simulado por el servidor de prueba'})
+
+    if method == 'GET':
+        if path == '/metrics':
+            return _json(200, state.system.metrics())
+        if path == '/cpu':
+            return _json(200, state.system.cpu_data())
+        if path == '/ram':
+            return _json(200, state.system.ram_data())
+        if path == '/procesos':
+            return _json(200, state.system.procesos_data())
+        if path == '/health':
+            return 200, 'text/plain', b'OK'
+        if path == '/monitoring-data':
+            return 200, 'application/json', b'[' + b','.join(state.recent) + b']'
+        if path == '/':
+            return _json(200, {'message': 'Monitoring Data API - Stub', 'version': '1.0.0',
+                               'api_type': state.api, 'schema': 'fase2'})
+        return _json(404, {'error': 'Endpoint no encontrado'})
+
+    if method == 'POST' and path == '/monitoring-data':
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return _json(400, {'error': 'Datos inválidos: se esperaba un objeto JSON'})
+        records = data if isinstance(data, list) else [data]
+        if not records or not all(isinstance(record, dict) for record in records):
+            return _json(400, {'error': 'Datos inválidos: se esperaba un objeto JSON'})
+
+        ids = list(range(state.next_id, state.next_id + len(records)))
+        state.next_id += len(records)
+        state.records_received += len(records)
+        if isinstance(data, list):
+            state.recent.extend(json.dumps(record).encode('utf-8') for record in records)
+        else:
+            state.recent.append(body)
+        response = {'message': 'Datos de monitoreo guardados exitosamente',
+                    'timestamp': datetime.now().isoformat(), 'api': state.api, 'schema': 'fase2'}
+        if isinstance(data, list):
+            response['ids'] = ids
+        else:
+            response['id'] = ids[0]
+        return _json(201, response)
+
+    if path in ('/metrics', '/cpu', '/ram', '/procesos', '/health', '/monitoring-data', '/'):
+        return _json(405, {'error': 'Método no permitido'})
+    return _json(404, {'error': 'Endpoint no encontrado'})
+
+
+class HTTPProtocol(asyncio.Protocol):
+    """HTTP/1.1 mínimo con keep-alive; las peticiones de una conexión se responden en orden"""
+
+    def __init__(self, state):
+        self.state = state
+        self.loop = asyncio.get_event_loop()
+        self.transport = None
+        self.buffer = b''
+        self.busy = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def data_received(self, data):
+        self.buffer += data
+        self._process()
+
+    def _process(self):
+        while not self.busy and self.transport is not None:
+            end = self.buffer.find(b'\r\n\r\n')
+            if end == -1:
+                if len(self.buffer) > 65536:
+                    self._send(431, 'text/plain', b'Request Header Fields Too Large', False)
+                return
+            head = self.buffer[:end].decode('latin-1')
+            lines = head.split('\r\n')
+            try:
+                method, target, version = lines[0].split(' ', 2)
+            except ValueError:
+                self._send(400, 'text/plain', b'Bad Request', False)
+                return
+
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if 'chunked' in headers.get('transfer-encoding', '').lower():
+                self._send(411, 'text/plain', b'Length Required', False)
+                return
+            length = int(headers.get('content-length') or 0)
+            if length > MAX_BODY:
+                self._send(413, 'text/plain', b'Payload Too Large', False)
+                return
+            if len(self.buffer) < end + 4 + length:
+                return
+            body = self.buffer[end + 4:end + 4 + length]
+            self.buffer = self.buffer[end + 4 + length:]
+
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+            status, content_type, payload = handle(self.state, method, target, body)
+
+            delay = self.state.delay()
+            if delay:
+                # Latencia simulada sin bloquear el resto de conexiones
+                self.busy = True
+                self.loop.call_later(delay, self._delayed_send, status, content_type, payload, keep_alive)
+                return
+            self._send(status, content_type, payload, keep_alive)
+
+    def _delayed_send(self, status, content_type, payload, keep_alive):
+        self.busy = False
+        self._send(status, content_type, payload, keep_alive)
+        self._process()
+
+    def _send(self, status, content_type, payload, keep_alive):
+        if self.transport is None:
+            return
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        self.transport.write(head.encode('latin-1') + payload)
+        if not keep_alive:
+            self.transport.close()
+            self.transport = None
+
+
+def _listen_socket(host, port, reuse_port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+def serve(host, port, state, reuse_port=False):
+    """Atender peticiones en este proceso hasta recibir SIGINT/SIGTERM"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(
+        loop.create_server(lambda: HTTPProtocol(state), sock=_listen_socket(host, port, reuse_port))
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, loop.stop)
+    try:
+        loop.run_forever()
+    finally:
+        server.close()
+        loop.close()
+
+
+def _serve_worker(host, port, options, seed):
+    state = StubState(options['latency'], options['jitter'], options['error_rate'],
+                      options['error_status'], options['api'], seed)
+    serve(host, port, state, reuse_port=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor simulado de las APIs de monitoreo')
+    parser.add_argument('--host', default=os.getenv('STUB_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('STUB_PORT', 8080)))
+    parser.add_argument('--latency', type=float, default=float(os.getenv('STUB_LATENCY_MS', 0)),
+                        help='Latencia agregada a cada respuesta, en ms')
+    parser.add_argument('--jitter', type=float, default=float(os.getenv('STUB_JITTER_MS', 0)),
+                        help='Variación uniforme (±) de la latencia, en ms')
+    parser.add_argument('--error-rate', type=float, default=float(os.getenv('STUB_ERROR_RATE', 0)),
+                        help='Fracción de peticiones que responden con error (0-1)')
+    parser.add_argument('--error-status', type=int, default=int(os.getenv('STUB_ERROR_STATUS', 500)),
+                        help='Código de estado de los errores simulados')
+    parser.add_argument('--api', default=os.getenv('STUB_API', 'Stub'),
+                        help='Valor del campo api en las respuestas de /monitoring-data')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('STUB_WORKERS', 1)),
+                        help='Procesos que atienden el mismo puerto (0 = uno por núcleo)')
+    parser.add_argument('--seed', type=int, default=None, help='Semilla de las métricas y errores simulados')
+    args = parser.parse_args()
+
+    workers = args.workers if args.workers > 0 else os.cpu_count() or 1
+    options = {'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+               'error_status': args.error_status, 'api': args.api}
+
+    print(f"🧪 Servidor simulado en http://{args.host}:{args.port} ({workers} procesos)")
+    print(f"⏱️  Latencia: {args.latency:g} ± {args.jitter:g} ms | ❌ Errores: {args.error_rate:.1%} "
+          f"(HTTP {args.error_status})")
+    print("📊 Rutas: /metrics /cpu /ram /procesos /health /monitoring-data / /stub-stats")
+
+    if workers == 1:
+        serve(args.host, args.port, StubState(seed=args.seed, **options))
+        return
+
+    processes = []
+    for index in range(workers):
+        seed = None if args.seed is None else args.seed + index
+        process = multiprocessing.Process(target=_serve_worker, args=(args.host, args.port, options, seed))
+        process.start()
+        processes.append(process)
+
+    def _stop(signum, frame):
+        for process in processes:
+            process.terminate()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, _stop)
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""Configuración de pytest: los scripts de Locust se importan como módulos planos"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
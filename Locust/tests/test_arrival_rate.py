@@ -0,0 +1,89 @@
+"""Perfiles de llegadas: cantidad de envíos, orden y forma de constant, ramp y step"""
+
+import math
+import random
+
+import pytest
+
+from arrival_rate import ArrivalProfile
+
+# Tasas y duraciones sorteadas con semilla fija: los casos son reproducibles
+CASES = [(round(rng.uniform(0.5, 200), 3), round(rng.uniform(1, 60), 3))
+         for rng in [random.Random(20240101)] for _ in range(20)]
+
+
+def arrivals(*args, **kwargs):
+    return list(ArrivalProfile(*args, **kwargs).arrivals())
+
+
+def count_between(times, start, end):
+    return sum(1 for t in times if start < t <= end)
+
+
+@pytest.mark.parametrize('rate,duration', CASES)
+@pytest.mark.parametrize('shape', ['constant', 'ramp', 'step'])
+def test_total_is_the_integral_of_the_rate(shape, rate, duration):
+    profile = ArrivalProfile(shape, rate, duration, steps=4)
+    times = list(profile.arrivals())
+    # Un envío por cada unidad entera de la integral (con tolerancia de redondeo en el último)
+    assert abs(len(times) - math.floor(profile.expected_total())) <= 1
+    if shape == 'constant':
+        assert profile.expected_total() == pytest.approx(rate * duration)
+
+
+@pytest.mark.parametrize('rate,duration', CASES)
+@pytest.mark.parametrize('shape', ['constant', 'ramp', 'step'])
+def test_timestamps_are_monotonic_and_within_the_profile(shape, rate, duration):
+    times = arrivals(shape, rate, duration, start_rate=rate / 3, steps=3)
+    assert times == sorted(times)
+    assert all(0 < t <= duration for t in times)
+
+
+def test_constant_is_evenly_spaced():
+    times = arrivals('constant', 4, 10)
+    assert len(times) == 40
+    assert times == pytest.approx([(k + 1) / 4 for k in range(40)])
+
+
+def test_ramp_from_zero_follows_the_square_root():
+    # Integral de la tasa R·t/D hasta t: R·t²/(2D) = k  =>  t = sqrt(2·D·k/R)
+    rate, duration = 10, 10
+    times = arrivals('ramp', rate, duration)
+    assert len(times) == 50
+    assert times == pytest.approx([math.sqrt(2 * duration * k / rate) for k in range(1, 51)])
+    # La mitad final de la duración concentra tres cuartos de la integral (37.5 de 50)
+    assert [count_between(times, 0, 5), count_between(times, 5, 10)] == [12, 38]
+
+
+def test_ramp_with_start_rate_is_denser_at_the_end():
+    times = arrivals('ramp', 20, 10, start_rate=5)
+    assert len(times) == 125
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert all(later <= earlier + 1e-9 for earlier, later in zip(gaps, gaps[1:]))
+    assert times[0] == pytest.approx(1 / 5, rel=0.05)
+    assert gaps[-1] == pytest.approx(1 / 20, rel=0.05)
+
+
+def test_step_levels_and_counts_per_step():
+    profile = ArrivalProfile('step', 10, 10, steps=5)
+    assert [segment[2] for segment in profile.segments] == [2, 4, 6, 8, 10]
+    times = list(profile.arrivals())
+    assert [count_between(times, 2 * step, 2 * (step + 1)) for step in range(5)] == [4, 8, 12, 16, 20]
+    # Dentro de cada escalón el espaciado es constante
+    in_third_step = [t for t in times if 4 < t <= 6]
+    assert [b - a for a, b in zip(in_third_step, in_third_step[1:])] == pytest.approx([1 / 6] * 11)
+
+
+def test_rate_at():
+    ramp = ArrivalProfile('ramp', 10, 10, start_rate=2)
+    assert ramp.rate_at(0) == 2
+    assert ramp.rate_at(5) == pytest.approx(6)
+    assert ramp.rate_at(10) == 0.0
+    step = ArrivalProfile('step', 9, 9, start_rate=3, steps=3)
+    assert [step.rate_at(t) for t in (0, 2.9, 3, 6.5, 8.99)] == [3, 3, 6, 9, 9]
+
+
+@pytest.mark.parametrize('args', [('sine', 10, 10), ('constant', 0, 10), ('ramp', 10, 0), ('step', -1, 10)])
+def test_invalid_profiles(args):
+    with pytest.raises(ValueError):
+        ArrivalProfile(*args)
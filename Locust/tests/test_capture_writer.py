@@ -0,0 +1,156 @@
+"""Captura NDJSON en segundo plano: flush al cerrar, metadata y combinación de capturas"""
+
+import gzip
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from capture_writer import (CaptureWriter, merge_captures, metadata_path, read_capture, read_metadata,
+                            worker_capture_path)
+
+LOCUST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def record(second, **changes):
+    return {'timestamp_received': f'2024-01-01T10:00:{second:02d}', 'porcentaje_cpu_uso': second, **changes}
+
+
+def lines(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_close_flushes_a_partial_batch(tmp_path, compress):
+    # Lote y flush_interval grandes: sin close nada llegaría al archivo
+    writer = CaptureWriter(str(tmp_path / 'captura.ndjson'), compress=compress, batch_size=1000,
+                           flush_interval=60).start()
+    for second in range(5):
+        writer.write(record(second))
+    writer.close({'phase': 1})
+
+    assert writer.path.endswith('.gz') == compress
+    assert lines(writer.path) == [record(second) for second in range(5)]
+    assert read_metadata(writer.path) == {'phase': 1}
+    assert (writer.count, writer.first_timestamp, writer.last_timestamp) == (
+        5, '2024-01-01T10:00:00', '2024-01-01T10:00:04')
+
+
+def test_periodic_flush_makes_records_readable_before_close(tmp_path):
+    writer = CaptureWriter(str(tmp_path / 'captura.ndjson'), batch_size=1000, flush_interval=0.05).start()
+    try:
+        writer.write(record(1))
+        deadline = time.monotonic() + 5
+        while not os.path.getsize(writer.path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert list(read_capture(writer.path)) == [record(1)]
+    finally:
+        writer.close()
+
+
+def test_start_removes_metadata_of_a_previous_run(tmp_path):
+    path = str(tmp_path / 'captura.ndjson')
+    with open(metadata_path(path), 'w', encoding='utf-8') as f:
+        json.dump({'phase': 'anterior'}, f)
+    writer = CaptureWriter(path).start()
+    assert not os.path.exists(metadata_path(path))
+    writer.close()
+    assert read_metadata(path) == {}
+
+
+def test_write_error_is_raised_on_close(tmp_path):
+    writer = CaptureWriter(str(tmp_path / 'captura.ndjson'), batch_size=1).start()
+
+    def fail(batch):
+        raise OSError('disco lleno')
+
+    writer._write_batch = fail
+    writer.write(record(0))
+    with pytest.raises(OSError, match='disco lleno'):
+        writer.close()
+
+
+def test_merge_orders_by_timestamp_received(tmp_path):
+    sources = []
+    for index, seconds in enumerate([[0, 3, 6, 9], [1, 4, 7], [2, 5, 8, 10, 11]]):
+        path = str(tmp_path / f'captura.worker{index}.ndjson')
+        writer = CaptureWriter(path).start()
+        for second in seconds:
+            writer.write(record(second, worker=index))
+        writer.close()
+        sources.append(path)
+    destination = str(tmp_path / 'captura.ndjson')
+
+    count, first, last = merge_captures(sources, destination)
+
+    merged = lines(destination)
+    assert [item['porcentaje_cpu_uso'] for item in merged] == list(range(12))
+    assert (count, first, last) == (12, '2024-01-01T10:00:00', '2024-01-01T10:00:11')
+
+
+def test_merge_keeps_source_order_on_ties_and_missing_timestamps(tmp_path):
+    first, second = str(tmp_path / 'a.ndjson'), str(tmp_path / 'b.ndjson')
+    for path, worker in ((first, 'a'), (second, 'b')):
+        writer = CaptureWriter(path).start()
+        writer.write({'worker': worker})
+        writer.write(record(1, worker=worker))
+        writer.close()
+    destination = str(tmp_path / 'captura.ndjson.gz')
+
+    assert merge_captures([first, second], destination)[0] == 4
+    # Sin timestamp_received se ordena primero; en un empate, en el orden de las capturas
+    assert [item['worker'] for item in lines(destination)] == ['a', 'b', 'a', 'b']
+
+
+def test_worker_capture_path():
+    assert worker_capture_path('captura.ndjson', 2) == 'captura.worker2.ndjson'
+    assert worker_capture_path('out/captura.ndjson.gz', 0) == 'out/captura.worker0.ndjson.gz'
+    assert worker_capture_path('captura.json', 1) == 'captura.json.worker1'
+
+
+def test_writes_do_not_block_the_gevent_loop(tmp_path):
+    pytest.importorskip('gevent')
+    # En un proceso aparte: monkey.patch_all afecta a todo el intérprete, como dentro de Locust
+    script = textwrap.dedent(f"""
+        from gevent import monkey
+        monkey.patch_all()
+
+        import sys
+        sys.path.insert(0, {LOCUST_DIR!r})
+        import gevent
+        from capture_writer import CaptureWriter
+
+        real_sleep = monkey.get_original('time', 'sleep')
+        writer = CaptureWriter({str(tmp_path / 'captura.ndjson')!r}, batch_size=1)
+
+        def slow_write(batch, write=writer._write_batch):
+            real_sleep(0.5)  # E/S que bloquea el hilo del sistema operativo
+            write(batch)
+
+        writer._write_batch = slow_write
+        writer.start()
+        ticks = []
+
+        def ticker():
+            for _ in range(20):
+                ticks.append(1)
+                gevent.sleep(0.02)
+
+        greenlet = gevent.spawn(ticker)
+        writer.write({{'timestamp_received': 'x'}})
+        gevent.sleep(0.3)
+        # Con la escritura en el threadpool el ticker sigue corriendo mientras dura
+        print(len(ticks))
+        greenlet.join()
+        writer.close()
+    """)
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert int(result.stdout.strip()) >= 5
+    assert lines(str(tmp_path / 'captura.ndjson')) == [{'timestamp_received': 'x'}]
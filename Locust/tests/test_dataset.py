@@ -0,0 +1,133 @@
+"""Captura mapeada en memoria: índice de líneas, formato binario y selectores de índices"""
+
+import gzip
+import json
+
+import pytest
+
+from dataset import Dataset, RandomSampler, write_binary
+
+RECORDS = [{'id': index, 'hora': f'2024-01-01 10:00:{index:02d}', 'texto': 'café'} for index in range(10)]
+
+
+def ndjson(records, newline='\n'):
+    return ''.join(json.dumps(record, ensure_ascii=False) + newline for record in records).encode('utf-8')
+
+
+@pytest.fixture
+def capture(tmp_path):
+    def write(content, name='captura.ndjson'):
+        path = tmp_path / name
+        path.write_bytes(content)
+        return str(path)
+    return write
+
+
+def read_all(path):
+    dataset = Dataset(path)
+    try:
+        return [dataset.record(index) for index in range(len(dataset))]
+    finally:
+        dataset.close()
+
+
+def test_line_offsets(capture):
+    dataset = Dataset(capture(ndjson(RECORDS)))
+    try:
+        assert len(dataset) == 10
+        assert list(dataset._offsets) == [sum(len(ndjson([r])) for r in RECORDS[:i]) for i in range(10)]
+        assert dataset.raw(3) == json.dumps(RECORDS[3], ensure_ascii=False).encode('utf-8')
+        assert dataset[9] == RECORDS[9]
+    finally:
+        dataset.close()
+
+
+def test_crlf_and_blank_lines(capture):
+    content = b'\r\n' + ndjson(RECORDS[:5], '\r\n') + b'\r\n  \n' + ndjson(RECORDS[5:], '\r\n')
+    assert read_all(capture(content)) == RECORDS
+
+
+def test_missing_final_newline_keeps_a_complete_last_record(capture):
+    assert read_all(capture(ndjson(RECORDS).rstrip(b'\n'))) == RECORDS
+
+
+def test_truncated_last_line_is_dropped(capture):
+    content = ndjson(RECORDS) + json.dumps(RECORDS[0]).encode('utf-8')[:-5]
+    assert read_all(capture(content)) == RECORDS
+
+
+def test_binary_and_compressed_formats_match_ndjson(capture, tmp_path):
+    source = capture(ndjson(RECORDS))
+    binary = str(tmp_path / 'captura.bin')
+    assert write_binary(source, binary) == 10
+    assert read_all(binary) == RECORDS
+    assert read_all(capture(gzip.compress(ndjson(RECORDS)), 'captura.ndjson.gz')) == RECORDS
+
+
+def test_empty_file_has_no_records_and_no_sampler(capture):
+    dataset = Dataset(capture(b''))
+    try:
+        assert len(dataset) == 0
+        for mode in ('random', 'sequential', 'shard'):
+            with pytest.raises(ValueError, match='no tiene registros'):
+                dataset.sampler(mode)
+    finally:
+        dataset.close()
+
+
+def test_unknown_sampling_mode(capture):
+    dataset = Dataset(capture(ndjson(RECORDS)))
+    try:
+        with pytest.raises(ValueError, match='Modo de muestreo no soportado'):
+            dataset.sampler('weighted')
+    finally:
+        dataset.close()
+
+
+def test_sequential_sampler_is_shared_by_the_users_of_a_process(capture):
+    dataset = Dataset(capture(ndjson(RECORDS)))
+    try:
+        first, second = dataset.sampler('sequential', 0, 2), dataset.sampler('sequential', 1, 2)
+        indexes = [sampler.next_index() for _ in range(6) for sampler in (first, second)]
+        assert indexes == [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 0, 1]
+
+        # Parte de un worker, [start, end): el contador compartido sigue en 12
+        part = dataset.sampler('sequential', start=4, end=7)
+        assert [part.next_index() for _ in range(4)] == [4 + (12 + k) % 3 for k in range(4)]
+    finally:
+        dataset.close()
+
+
+def test_random_sampler_with_seed_is_reproducible_per_user(capture):
+    dataset = Dataset(capture(ndjson(RECORDS)))
+    try:
+        def draw(user_index, seed=42):
+            sampler = dataset.sampler('random', user_index, seed=seed, start=2, end=8)
+            return [sampler.next_index() for _ in range(200)]
+
+        assert draw(0) == draw(0)
+        assert draw(0) != draw(1)
+        # La semilla de cada usuario es seed + user_index
+        assert draw(1) == draw(0, seed=43)
+        assert set(draw(0)) == set(range(2, 8))
+        sampler = RandomSampler(2, 8, 42)
+        assert draw(0) == [sampler.next_index() for _ in range(200)]
+    finally:
+        dataset.close()
+
+
+def test_shard_sampler_gives_each_user_its_own_block(capture):
+    dataset = Dataset(capture(ndjson(RECORDS)))
+    try:
+        blocks = []
+        for user_index in range(3):
+            sampler = dataset.sampler('shard', user_index, 3)
+            blocks.append([sampler.next_index() for _ in range(5)])
+        assert blocks == [[0, 1, 2, 0, 1], [3, 4, 5, 3, 4], [6, 7, 8, 9, 6]]
+
+        # Más usuarios que registros: cada usuario repite un solo registro y se cubren todos
+        samplers = [dataset.sampler('shard', user_index, 25) for user_index in range(25)]
+        assert all(sampler.end - sampler.start == 1 for sampler in samplers)
+        assert {sampler.next_index() for sampler in samplers} == set(range(10))
+    finally:
+        dataset.close()
@@ -0,0 +1,109 @@
+"""Histograma de latencias (índices HDR, percentiles, combinación) y comparación con la línea base"""
+
+import json
+import random
+
+import pytest
+
+from load_report import LatencyHistogram, compare, MIN_SAMPLES_TO_COMPARE
+
+H = LatencyHistogram
+
+
+def test_small_values_are_exact():
+    for value in (0, 1, 999, H.SUB_BUCKET_COUNT - 1):
+        assert H._index(value) == value
+        assert H._highest_equivalent(value) == value
+
+
+@pytest.mark.parametrize('power', range(11, 40))
+def test_index_boundaries_at_powers_of_two(power):
+    value = 1 << power
+    index = H._index(value)
+    # Primer valor de una potencia de dos: abre un bucket nuevo
+    assert H._highest_equivalent(index - 1) == value - 1
+    assert H._index(value - 1) == index - 1
+    assert H._highest_equivalent(index) >= value
+
+
+def test_index_is_monotonic_and_bucket_contains_value():
+    rng = random.Random(7)
+    values = sorted({rng.randrange(1 << rng.randrange(1, 36)) for _ in range(20000)})
+    indexes = [H._index(value) for value in values]
+    assert indexes == sorted(indexes)
+    for value, index in zip(values, indexes):
+        highest = H._highest_equivalent(index)
+        lowest = H._highest_equivalent(index - 1) + 1 if index else 0
+        assert lowest <= value <= highest
+        # 3 dígitos significativos: el ancho del bucket es a lo sumo ~0.1% del valor
+        assert highest - lowest <= max(0, value) / 1000 + 1
+
+
+def test_percentiles_exact_below_sub_bucket_count():
+    histogram = LatencyHistogram()
+    for value in range(1, 1001):
+        histogram.record(value)
+    assert histogram.value_at_percentile(50) == 500
+    assert histogram.value_at_percentile(90) == 900
+    assert histogram.value_at_percentile(99.9) == 999
+    assert histogram.value_at_percentile(100) == 1000
+    assert histogram.mean() == pytest.approx(500.5)
+    assert (histogram.min, histogram.max, histogram.total) == (1, 1000, 1000)
+
+
+def test_percentiles_of_large_values_within_relative_error():
+    rng = random.Random(3)
+    values = sorted(rng.randint(10000, 5000000) for _ in range(5000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for percentile in (50, 90, 99, 99.9):
+        exact = values[max(1, round(len(values) * percentile / 100)) - 1]
+        assert histogram.value_at_percentile(percentile) == pytest.approx(exact, rel=1e-3)
+    assert histogram.value_at_percentile(100) == values[-1]
+
+
+def test_empty_and_negative_values():
+    histogram = LatencyHistogram()
+    assert histogram.value_at_percentile(99) == 0
+    assert histogram.mean() == 0.0
+    histogram.record(-5)
+    assert histogram.min == 0 and histogram.counts == {0: 1}
+
+
+def test_merge_and_serialization_match_single_histogram():
+    rng = random.Random(11)
+    values = [rng.randint(0, 2000000) for _ in range(3000)]
+    whole, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for position, value in enumerate(values):
+        whole.record(value)
+        (left if position % 2 else right).record(value)
+    left.merge(LatencyHistogram.from_dict(json.loads(json.dumps(right.to_dict()))))
+    assert left.to_dict() == whole.to_dict()
+    for percentile in (50, 99, 99.9):
+        assert left.value_at_percentile(percentile) == whole.value_at_percentile(percentile)
+
+
+def summary_row(requests, p99=10.0, rps=100.0, failure_ratio=0.0):
+    row = {f'p{p:g}_ms': p99 for p in (50.0, 90.0, 99.0, 99.9)}
+    row.update({'requests': requests, 'rps': rps, 'failure_ratio': failure_ratio})
+    return row
+
+
+def test_compare_flags_regressions_over_threshold():
+    baseline = {'POST /monitoring-data': summary_row(1000)}
+    assert compare({'POST /monitoring-data': summary_row(1000, p99=10.9)}, baseline, 10) == []
+    regressions = compare(
+        {'POST /monitoring-data': summary_row(1000, p99=12.0, rps=80.0, failure_ratio=0.2)}, baseline, 10
+    )
+    assert {regression['metric'] for regression in regressions} == {
+        'p50_ms', 'p90_ms', 'p99_ms', 'p99.9_ms', 'rps', 'failure_ratio'
+    }
+    assert regressions[0]['change_percent'] == 20.0
+
+
+def test_compare_skips_endpoints_with_few_samples():
+    few = MIN_SAMPLES_TO_COMPARE - 1
+    baseline = {'GET /stats': summary_row(1000), 'GET /nuevo': summary_row(1000)}
+    current = {'GET /stats': summary_row(few, p99=100.0), 'GET /otro': summary_row(1000, p99=100.0)}
+    assert compare(current, baseline, 10) == []
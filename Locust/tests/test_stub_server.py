@@ -0,0 +1,37 @@
+"""El servidor simulado produce registros que la API de persistencia acepta"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'FrontEnd', 'apiPython'))
+
+from stub_server import SyntheticSystem, StubState, handle  # noqa: E402
+from validation import MONITORING_SAMPLE_SCHEMA  # noqa: E402
+
+
+def test_metrics_pass_the_api_schema():
+    system = SyntheticSystem(seed=1)
+    for _ in range(500):
+        record = system.metrics()
+        row = MONITORING_SAMPLE_SCHEMA(record)
+        # Sin coerción: los valores ya tienen el tipo y rango de las columnas INTEGER
+        assert row[:11] == tuple(record[column] for column in list(record)[:11])
+
+
+def test_units_match_kernel_modules():
+    system = SyntheticSystem(seed=2)
+    ram = system.ram_data()
+    assert ram['total'] == 16 * 1024
+    assert ram['libre'] + ram['uso'] == ram['total']
+    assert all(isinstance(value, int) for value in ram.values())
+    assert isinstance(system.cpu_data()['porcentajeUso'], int)
+    record = system.metrics()
+    assert record['porcentaje_cpu_uso'] + record['porcentaje_cpu_libre'] == 100
+    assert 0 <= record['porcentaje_ram'] <= 100
+
+
+def test_get_metrics_route():
+    status, content_type, body = handle(StubState(seed=3), 'GET', '/metrics', b'')
+    assert (status, content_type) == (200, 'application/json')
+    MONITORING_SAMPLE_SCHEMA(json.loads(body))